@@ -9,7 +9,7 @@ from dotenv import load_dotenv
 # Add parent directory to path
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
-from app.database import Base
+from app.database import Base, DATABASE_URL
 from app.models import *  # Import all models
 
 load_dotenv()
@@ -17,18 +17,27 @@ load_dotenv()
 # this is the Alembic Config object
 config = context.config
 
-# Override sqlalchemy.url with environment variable
-database_url = os.getenv("DATABASE_URL")
-if database_url:
-    config.set_main_option("sqlalchemy.url", database_url)
+# Same URL as the app (DATABASE_URL, normalized; SQLite by default)
+config.set_main_option("sqlalchemy.url", DATABASE_URL.replace("%", "%%"))
 
-# Interpret the config file for Python logging.
-if config.config_file_name is not None:
+# Interpret the config file for Python logging (not when the app runs migrations
+# on startup, which would replace its logging setup)
+if config.config_file_name is not None and "connection" not in config.attributes:
     fileConfig(config.config_file_name)
 
 # add your model's MetaData object here
 target_metadata = Base.metadata
 
+def include_name(name, type_, parent_names) -> bool:
+    """Leave the full-text search objects from 0005 (raw SQL, trigger-maintained) out of autogenerate"""
+    if type_ == "table":
+        return not (name == "tracks_fts" or name.startswith("tracks_fts_"))
+    if type_ == "column":
+        return not (parent_names.get("table_name") == "tracks" and name == "search_vector")
+    if type_ == "index":
+        return name != "ix_tracks_search_vector"
+    return True
+
 def run_migrations_offline() -> None:
     """Run migrations in 'offline' mode."""
     url = config.get_main_option("sqlalchemy.url")
@@ -37,6 +46,8 @@ def run_migrations_offline() -> None:
         target_metadata=target_metadata,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
+        render_as_batch=url.startswith("sqlite"),
+        include_name=include_name,
     )
 
     with context.begin_transaction():
@@ -44,6 +55,12 @@ def run_migrations_offline() -> None:
 
 def run_migrations_online() -> None:
     """Run migrations in 'online' mode."""
+    # run_migrations() on startup passes in its own connection
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        do_run_migrations(connection)
+        return
+
     connectable = engine_from_config(
         config.get_section(config.config_ini_section, {}),
         prefix="sqlalchemy.",
@@ -51,20 +68,21 @@ def run_migrations_online() -> None:
     )
 
     with connectable.connect() as connection:
-        context.configure(
-            connection=connection, target_metadata=target_metadata
-        )
+        do_run_migrations(connection)
 
-        with context.begin_transaction():
-            context.run_migrations()
+def do_run_migrations(connection) -> None:
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        # SQLite can't ALTER most things; batch mode rebuilds the table instead
+        render_as_batch=connection.dialect.name == "sqlite",
+        include_name=include_name,
+    )
+
+    with context.begin_transaction():
+        context.run_migrations()
 
 if context.is_offline_mode():
     run_migrations_offline()
 else:
     run_migrations_online()
-
-
-
-
-
-
@@ -0,0 +1,305 @@
+"""Initial schema
+
+The tables as create_all built them before migrations were introduced.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19 04:43:47.595470
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('dj_personas',
+    sa.Column('id', sa.String(), nullable=False),
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('voice_settings', sa.JSON(), nullable=True),
+    sa.Column('tone', sa.String(), nullable=True),
+    sa.Column('accent', sa.String(), nullable=True),
+    sa.Column('gender', sa.String(), nullable=True),
+    sa.Column('autotune_level', sa.Float(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    op.create_index(op.f('ix_dj_personas_id'), 'dj_personas', ['id'], unique=False)
+
+    op.create_table('event_types',
+    sa.Column('id', sa.String(), nullable=False),
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('min_bpm', sa.Float(), nullable=False),
+    sa.Column('max_bpm', sa.Float(), nullable=False),
+    sa.Column('energy_curve', sa.JSON(), nullable=True),
+    sa.Column('genre_weighting', sa.JSON(), nullable=True),
+    sa.Column('vocal_frequency', sa.Float(), nullable=False),
+    sa.Column('drop_intensity', sa.Float(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    op.create_index(op.f('ix_event_types_id'), 'event_types', ['id'], unique=False)
+
+    op.create_table('playlists',
+    sa.Column('id', sa.String(), nullable=False),
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('cover_art', sa.String(), nullable=True),
+    sa.Column('is_public', sa.Boolean(), nullable=False),
+    sa.Column('user_id', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sqlite_autoincrement=False
+    )
+    op.create_index(op.f('ix_playlists_id'), 'playlists', ['id'], unique=False)
+
+    op.create_table('smart_crates',
+    sa.Column('id', sa.String(), nullable=False),
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('rules', sa.JSON(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_smart_crates_id'), 'smart_crates', ['id'], unique=False)
+
+    op.create_table('tracks',
+    sa.Column('id', sa.String(), nullable=False),
+    sa.Column('title', sa.String(), nullable=False),
+    sa.Column('artist', sa.String(), nullable=False),
+    sa.Column('duration', sa.Integer(), nullable=False),
+    sa.Column('bpm', sa.Float(), nullable=True),
+    sa.Column('key', sa.String(), nullable=True),
+    sa.Column('key_code', sa.Integer(), nullable=True),
+    sa.Column('energy', sa.Float(), nullable=True),
+    sa.Column('energy_envelope', sa.JSON(), nullable=True),
+    sa.Column('genre', sa.String(), nullable=True),
+    sa.Column('mood', sa.String(), nullable=True),
+    sa.Column('file_path', sa.String(), nullable=True),
+    sa.Column('cover_art', sa.String(), nullable=True),
+    sa.Column('preview_url', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_tracks_id'), 'tracks', ['id'], unique=False)
+    op.create_index(op.f('ix_tracks_key_code'), 'tracks', ['key_code'], unique=False)
+
+    op.create_table('ai_voice_assets',
+    sa.Column('id', sa.String(), nullable=False),
+    sa.Column('persona_id', sa.String(), nullable=True),
+    sa.Column('text', sa.Text(), nullable=False),
+    sa.Column('audio_url', sa.String(), nullable=False),
+    sa.Column('voice_type', sa.String(), nullable=False),
+    sa.Column('bpm', sa.Float(), nullable=True),
+    sa.Column('key', sa.String(), nullable=True),
+    sa.Column('autotune', sa.Boolean(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.ForeignKeyConstraint(['persona_id'], ['dj_personas.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_ai_voice_assets_id'), 'ai_voice_assets', ['id'], unique=False)
+
+    op.create_table('event_candidates',
+    sa.Column('event_type_id', sa.String(), nullable=False),
+    sa.Column('track_id', sa.String(), nullable=False),
+    sa.Column('score', sa.Float(), nullable=False),
+    sa.Column('reasons', sa.String(), nullable=True),
+    sa.ForeignKeyConstraint(['event_type_id'], ['event_types.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['track_id'], ['tracks.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('event_type_id', 'track_id')
+    )
+    op.create_index('ix_event_candidates_event_score', 'event_candidates', ['event_type_id', 'score'], unique=False)
+    op.create_index('ix_event_candidates_track', 'event_candidates', ['track_id'], unique=False)
+
+    op.create_table('playlist_tracks',
+    sa.Column('id', sa.String(), nullable=False),
+    sa.Column('playlist_id', sa.String(), nullable=False),
+    sa.Column('track_id', sa.String(), nullable=False),
+    sa.Column('position', sa.Integer(), nullable=False),
+    sa.Column('added_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.Column('notes', sa.Text(), nullable=True),
+    sa.Column('spotify_uri', sa.String(), nullable=True),
+    sa.ForeignKeyConstraint(['playlist_id'], ['playlists.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['track_id'], ['tracks.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('playlist_id', 'position', name='uq_playlist_position')
+    )
+    op.create_index(op.f('ix_playlist_tracks_id'), 'playlist_tracks', ['id'], unique=False)
+
+    op.create_table('scoring_profiles',
+    sa.Column('id', sa.String(), nullable=False),
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('user_id', sa.String(), nullable=True),
+    sa.Column('event_type_id', sa.String(), nullable=True),
+    sa.Column('weights', sa.JSON(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['event_type_id'], ['event_types.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'event_type_id', name='uq_scoring_profiles_scope')
+    )
+    op.create_index('ix_scoring_profiles_event_type', 'scoring_profiles', ['event_type_id'], unique=False)
+    op.create_index(op.f('ix_scoring_profiles_id'), 'scoring_profiles', ['id'], unique=False)
+    op.create_index('ix_scoring_profiles_user', 'scoring_profiles', ['user_id'], unique=False)
+
+    op.create_table('sets',
+    sa.Column('id', sa.String(), nullable=False),
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('event_type_id', sa.String(), nullable=True),
+    sa.Column('duration', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['event_type_id'], ['event_types.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_sets_id'), 'sets', ['id'], unique=False)
+
+    op.create_table('smart_crate_tracks',
+    sa.Column('crate_id', sa.String(), nullable=False),
+    sa.Column('track_id', sa.String(), nullable=False),
+    sa.ForeignKeyConstraint(['crate_id'], ['smart_crates.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['track_id'], ['tracks.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('crate_id', 'track_id')
+    )
+    op.create_index('ix_smart_crate_tracks_track', 'smart_crate_tracks', ['track_id'], unique=False)
+
+    op.create_table('track_analyses',
+    sa.Column('id', sa.String(), nullable=False),
+    sa.Column('track_id', sa.String(), nullable=False),
+    sa.Column('analysis_type', sa.String(), nullable=False),
+    sa.Column('result', sa.JSON(), nullable=False),
+    sa.Column('confidence', sa.Float(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.ForeignKeyConstraint(['track_id'], ['tracks.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_track_analyses_id'), 'track_analyses', ['id'], unique=False)
+
+    op.create_table('track_transitions',
+    sa.Column('from_track_id', sa.String(), nullable=False),
+    sa.Column('to_track_id', sa.String(), nullable=False),
+    sa.Column('score', sa.Float(), nullable=False),
+    sa.Column('key_score', sa.Float(), nullable=False),
+    sa.Column('bpm_difference', sa.Float(), nullable=True),
+    sa.Column('reasons', sa.String(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.ForeignKeyConstraint(['from_track_id'], ['tracks.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['to_track_id'], ['tracks.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('from_track_id', 'to_track_id')
+    )
+    op.create_index('ix_track_transitions_from_score', 'track_transitions', ['from_track_id', 'score'], unique=False)
+    op.create_index('ix_track_transitions_to', 'track_transitions', ['to_track_id'], unique=False)
+
+    op.create_table('track_variants',
+    sa.Column('track_id', sa.String(), nullable=False),
+    sa.Column('kind', sa.String(), nullable=False),
+    sa.Column('bpm', sa.Float(), nullable=True),
+    sa.Column('key_code', sa.Integer(), nullable=True),
+    sa.Column('pitch_shift', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['track_id'], ['tracks.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('track_id', 'kind')
+    )
+    op.create_index('ix_track_variants_bpm', 'track_variants', ['bpm'], unique=False)
+    op.create_index('ix_track_variants_key_bpm', 'track_variants', ['key_code', 'bpm'], unique=False)
+
+    op.create_table('performances',
+    sa.Column('id', sa.String(), nullable=False),
+    sa.Column('set_id', sa.String(), nullable=False),
+    sa.Column('start_time', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('end_time', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('energy_levels', sa.JSON(), nullable=True),
+    sa.Column('crowd_vibe', sa.String(), nullable=True),
+    sa.Column('notes', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.ForeignKeyConstraint(['set_id'], ['sets.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_performances_id'), 'performances', ['id'], unique=False)
+
+    op.create_table('set_tracks',
+    sa.Column('id', sa.String(), nullable=False),
+    sa.Column('set_id', sa.String(), nullable=False),
+    sa.Column('track_id', sa.String(), nullable=False),
+    sa.Column('position', sa.Integer(), nullable=False),
+    sa.Column('transition_bpm', sa.Float(), nullable=True),
+    sa.Column('transition_key', sa.String(), nullable=True),
+    sa.Column('notes', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.ForeignKeyConstraint(['set_id'], ['sets.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['track_id'], ['tracks.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_set_tracks_id'), 'set_tracks', ['id'], unique=False)
+
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_set_tracks_id'), table_name='set_tracks')
+    op.drop_table('set_tracks')
+
+    op.drop_index(op.f('ix_performances_id'), table_name='performances')
+    op.drop_table('performances')
+
+    op.drop_index('ix_track_variants_key_bpm', table_name='track_variants')
+    op.drop_index('ix_track_variants_bpm', table_name='track_variants')
+    op.drop_table('track_variants')
+
+    op.drop_index('ix_track_transitions_to', table_name='track_transitions')
+    op.drop_index('ix_track_transitions_from_score', table_name='track_transitions')
+    op.drop_table('track_transitions')
+
+    op.drop_index(op.f('ix_track_analyses_id'), table_name='track_analyses')
+    op.drop_table('track_analyses')
+
+    op.drop_index('ix_smart_crate_tracks_track', table_name='smart_crate_tracks')
+    op.drop_table('smart_crate_tracks')
+
+    op.drop_index(op.f('ix_sets_id'), table_name='sets')
+    op.drop_table('sets')
+
+    op.drop_index('ix_scoring_profiles_user', table_name='scoring_profiles')
+    op.drop_index(op.f('ix_scoring_profiles_id'), table_name='scoring_profiles')
+    op.drop_index('ix_scoring_profiles_event_type', table_name='scoring_profiles')
+    op.drop_table('scoring_profiles')
+
+    op.drop_index(op.f('ix_playlist_tracks_id'), table_name='playlist_tracks')
+    op.drop_table('playlist_tracks')
+
+    op.drop_index('ix_event_candidates_track', table_name='event_candidates')
+    op.drop_index('ix_event_candidates_event_score', table_name='event_candidates')
+    op.drop_table('event_candidates')
+
+    op.drop_index(op.f('ix_ai_voice_assets_id'), table_name='ai_voice_assets')
+    op.drop_table('ai_voice_assets')
+
+    op.drop_index(op.f('ix_tracks_key_code'), table_name='tracks')
+    op.drop_index(op.f('ix_tracks_id'), table_name='tracks')
+    op.drop_table('tracks')
+
+    op.drop_index(op.f('ix_smart_crates_id'), table_name='smart_crates')
+    op.drop_table('smart_crates')
+
+    op.drop_index(op.f('ix_playlists_id'), table_name='playlists')
+    op.drop_table('playlists')
+
+    op.drop_index(op.f('ix_event_types_id'), table_name='event_types')
+    op.drop_table('event_types')
+
+    op.drop_index(op.f('ix_dj_personas_id'), table_name='dj_personas')
+    op.drop_table('dj_personas')
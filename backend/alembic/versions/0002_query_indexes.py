@@ -0,0 +1,49 @@
+"""Indexes for the library filters and ordered set/playlist reads
+
+Tracks are filtered by genre, BPM range and key; set and playlist entries
+are read by their parent in position order and looked up by track. The
+(key_code, bpm) index replaces the single-column key_code one.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19 04:44:13.935781
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_tracks_genre_bpm', 'tracks', ['genre', 'bpm'], unique=False)
+    op.create_index('ix_tracks_bpm', 'tracks', ['bpm'], unique=False)
+    op.create_index('ix_tracks_key_code_bpm', 'tracks', ['key_code', 'bpm'], unique=False)
+    op.create_index('ix_tracks_key', 'tracks', ['key'], unique=False)
+    op.drop_index('ix_tracks_key_code', table_name='tracks')
+
+    op.create_index('ix_set_tracks_set_position', 'set_tracks', ['set_id', 'position'], unique=False)
+    op.create_index('ix_set_tracks_track', 'set_tracks', ['track_id'], unique=False)
+
+    # (playlist_id, position) is already indexed by uq_playlist_position
+    op.create_index('ix_playlist_tracks_playlist_track', 'playlist_tracks', ['playlist_id', 'track_id'], unique=False)
+    op.create_index('ix_playlist_tracks_track', 'playlist_tracks', ['track_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_playlist_tracks_track', table_name='playlist_tracks')
+    op.drop_index('ix_playlist_tracks_playlist_track', table_name='playlist_tracks')
+
+    op.drop_index('ix_set_tracks_track', table_name='set_tracks')
+    op.drop_index('ix_set_tracks_set_position', table_name='set_tracks')
+
+    op.create_index('ix_tracks_key_code', 'tracks', ['key_code'], unique=False)
+    op.drop_index('ix_tracks_key', table_name='tracks')
+    op.drop_index('ix_tracks_key_code_bpm', table_name='tracks')
+    op.drop_index('ix_tracks_bpm', table_name='tracks')
+    op.drop_index('ix_tracks_genre_bpm', table_name='tracks')
@@ -0,0 +1,36 @@
+"""Indexes for keyset pages of the track library
+
+Each sort key of GET /api/tracks/ (bpm, energy, created_at, title) is
+indexed together with the id tie-breaker so a page starts with an index
+seek. (bpm, id) replaces the single-column bpm index.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19 09:12:40.518337
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_tracks_bpm_id', 'tracks', ['bpm', 'id'], unique=False)
+    op.create_index('ix_tracks_energy_id', 'tracks', ['energy', 'id'], unique=False)
+    op.create_index('ix_tracks_created_at_id', 'tracks', ['created_at', 'id'], unique=False)
+    op.create_index('ix_tracks_title_id', 'tracks', ['title', 'id'], unique=False)
+    op.drop_index('ix_tracks_bpm', table_name='tracks')
+
+
+def downgrade() -> None:
+    op.create_index('ix_tracks_bpm', 'tracks', ['bpm'], unique=False)
+    op.drop_index('ix_tracks_title_id', table_name='tracks')
+    op.drop_index('ix_tracks_created_at_id', table_name='tracks')
+    op.drop_index('ix_tracks_energy_id', table_name='tracks')
+    op.drop_index('ix_tracks_bpm_id', table_name='tracks')
@@ -0,0 +1,33 @@
+"""Store album_image_url on tracks
+
+Responses used to derive it from cover_art for every track on every read;
+it is now set whenever cover_art is (Track.spotify_album_art) and backfilled
+here with the same rule.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19 10:02:51.204817
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('tracks', sa.Column('album_image_url', sa.String(), nullable=True))
+    op.execute(
+        "UPDATE tracks SET album_image_url = cover_art "
+        "WHERE lower(cover_art) LIKE '%scdn.co%' OR lower(cover_art) LIKE '%spotify%'"
+    )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('tracks') as batch_op:
+        batch_op.drop_column('album_image_url')
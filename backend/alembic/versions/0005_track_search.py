@@ -0,0 +1,109 @@
+"""Full-text index over track title, artist, genre and mood
+
+SQLite: an external-content FTS5 table, tracks_fts, keyed by the tracks
+rowid, with unicode61 diacritic folding and prefix indexes for typeahead.
+PostgreSQL: a tsvector column on tracks (unaccented, title weighted A,
+artist B, genre and mood C) with a GIN index. Triggers keep both in step
+with every insert, update and delete; neither is part of the SQLAlchemy
+models, so alembic/env.py leaves them out of autogenerate.
+
+A later migration that rebuilds the tracks table on SQLite (batch mode)
+drops these triggers with it and may renumber rowids: it must recreate the
+triggers and run INSERT INTO tracks_fts(tracks_fts) VALUES('rebuild').
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19 13:40:07.861204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+
+SQLITE_UPGRADE = [
+    """
+    CREATE VIRTUAL TABLE tracks_fts USING fts5(
+        title, artist, genre, mood,
+        content='tracks', content_rowid='rowid',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER tracks_fts_insert AFTER INSERT ON tracks BEGIN
+        INSERT INTO tracks_fts(rowid, title, artist, genre, mood)
+        VALUES (new.rowid, new.title, new.artist, new.genre, new.mood);
+    END
+    """,
+    """
+    CREATE TRIGGER tracks_fts_delete AFTER DELETE ON tracks BEGIN
+        INSERT INTO tracks_fts(tracks_fts, rowid, title, artist, genre, mood)
+        VALUES ('delete', old.rowid, old.title, old.artist, old.genre, old.mood);
+    END
+    """,
+    """
+    CREATE TRIGGER tracks_fts_update AFTER UPDATE OF title, artist, genre, mood ON tracks BEGIN
+        INSERT INTO tracks_fts(tracks_fts, rowid, title, artist, genre, mood)
+        VALUES ('delete', old.rowid, old.title, old.artist, old.genre, old.mood);
+        INSERT INTO tracks_fts(rowid, title, artist, genre, mood)
+        VALUES (new.rowid, new.title, new.artist, new.genre, new.mood);
+    END
+    """,
+    "INSERT INTO tracks_fts(tracks_fts) VALUES ('rebuild')",
+]
+
+SQLITE_DOWNGRADE = [
+    "DROP TRIGGER IF EXISTS tracks_fts_update",
+    "DROP TRIGGER IF EXISTS tracks_fts_delete",
+    "DROP TRIGGER IF EXISTS tracks_fts_insert",
+    "DROP TABLE IF EXISTS tracks_fts",
+]
+
+POSTGRESQL_UPGRADE = [
+    "CREATE EXTENSION IF NOT EXISTS unaccent",
+    "ALTER TABLE tracks ADD COLUMN search_vector tsvector",
+    """
+    CREATE FUNCTION tracks_search_vector() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('simple', unaccent(coalesce(NEW.title, ''))), 'A') ||
+            setweight(to_tsvector('simple', unaccent(coalesce(NEW.artist, ''))), 'B') ||
+            setweight(to_tsvector('simple', unaccent(coalesce(NEW.genre, '') || ' ' || coalesce(NEW.mood, ''))), 'C');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER tracks_search_vector
+    BEFORE INSERT OR UPDATE OF title, artist, genre, mood ON tracks
+    FOR EACH ROW EXECUTE FUNCTION tracks_search_vector()
+    """,
+    # Fires the trigger for every existing row
+    "UPDATE tracks SET title = title",
+    "CREATE INDEX ix_tracks_search_vector ON tracks USING gin (search_vector)",
+]
+
+POSTGRESQL_DOWNGRADE = [
+    "DROP INDEX IF EXISTS ix_tracks_search_vector",
+    "DROP TRIGGER IF EXISTS tracks_search_vector ON tracks",
+    "DROP FUNCTION IF EXISTS tracks_search_vector()",
+    "ALTER TABLE tracks DROP COLUMN IF EXISTS search_vector",
+]
+
+
+def upgrade() -> None:
+    statements = POSTGRESQL_UPGRADE if op.get_bind().dialect.name == "postgresql" else SQLITE_UPGRADE
+    for statement in statements:
+        op.execute(statement)
+
+
+def downgrade() -> None:
+    statements = POSTGRESQL_DOWNGRADE if op.get_bind().dialect.name == "postgresql" else SQLITE_DOWNGRADE
+    for statement in statements:
+        op.execute(statement)
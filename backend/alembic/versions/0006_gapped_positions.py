@@ -0,0 +1,46 @@
+"""Space set and playlist positions 1024 apart
+
+Positions become sort keys with room between them (Positions.GAP), so a
+move or insert writes one row instead of renumbering the rest. Existing
+0..n-1 positions p become (p + 1) * 1024, keeping their order. The keys go
+negative first so no row is written onto a position another row still
+holds (uq_playlist_position is checked row by row).
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19 16:22:31.047915
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+
+GAP = 1024
+
+
+def upgrade() -> None:
+    for table in ('set_tracks', 'playlist_tracks'):
+        op.execute(f"UPDATE {table} SET position = -position - 1")
+        op.execute(f"UPDATE {table} SET position = -position * {GAP}")
+
+
+def downgrade() -> None:
+    # Dense 0..n-1 again, per parent, in the same order
+    bind = op.get_bind()
+    for table, parent in (('set_tracks', 'set_id'), ('playlist_tracks', 'playlist_id')):
+        rows = bind.execute(sa.text(f"SELECT id, {parent} FROM {table} ORDER BY {parent}, position")).all()
+        ranks, index, previous = [], 0, None
+        for entry_id, parent_id in rows:
+            index = index + 1 if parent_id == previous else 0
+            previous = parent_id
+            ranks.append({"id": entry_id, "position": index})
+        op.execute(f"UPDATE {table} SET position = -position - 1")
+        if ranks:
+            bind.execute(sa.text(f"UPDATE {table} SET position = :position WHERE id = :id"), ranks)
@@ -0,0 +1,42 @@
+"""Shared versions for the caches worker processes keep in memory
+
+cache_versions holds one counter per derived dataset (library, transition
+cache, crate membership) and sets.version one per set's track order. Writers
+bump them in the same transaction as their change; every process compares
+its cached copy against them, so an edit made on one uvicorn worker is seen
+by the others.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-19 18:05:12.631420
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    cache_versions = op.create_table('cache_versions',
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('version', sa.Integer(), server_default='0', nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    op.bulk_insert(cache_versions, [
+        {'name': 'library', 'version': 0},
+        {'name': 'transitions', 'version': 0},
+        {'name': 'crates', 'version': 0},
+    ])
+    op.add_column('sets', sa.Column('version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('sets') as batch_op:
+        batch_op.drop_column('version')
+    op.drop_table('cache_versions')
@@ -1,4 +1,6 @@
-from sqlalchemy import create_engine
+from sqlalchemy import MetaData, create_engine, event, inspect, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
@@ -6,20 +8,138 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
-# Use SQLite by default for easier setup (no PostgreSQL required)
-# Can override with DATABASE_URL env var for PostgreSQL
-# For now, force SQLite to avoid PostgreSQL dependency
-env_db_url = os.getenv("DATABASE_URL")
-if env_db_url and env_db_url.startswith("postgresql"):
-    print("Note: PostgreSQL URL found in .env, but using SQLite for easier setup.")
-    print("To use PostgreSQL, ensure it's running and remove this override.")
-DATABASE_URL = "sqlite:///./dj_arsenal.db"
-
-# SQLite requires check_same_thread=False for async operations
-connect_args = {"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {}
-engine = create_engine(DATABASE_URL, echo=True, connect_args=connect_args)
+# SQLite by default (no server needed); set DATABASE_URL for PostgreSQL
+DEFAULT_DATABASE_URL = "sqlite:///./dj_arsenal.db"
+
+def env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value else default
+
+def env_flag(name: str, default: bool = False) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+def database_url() -> str:
+    url = os.getenv("DATABASE_URL") or DEFAULT_DATABASE_URL
+    # Railway/Heroku hand out postgres://, which SQLAlchemy no longer accepts; without
+    # an explicit driver, use psycopg2 (the one in requirements.txt)
+    for prefix in ("postgres://", "postgresql://"):
+        if url.startswith(prefix):
+            url = "postgresql+psycopg2://" + url[len(prefix):]
+    return url
+
+def create_postgres_engine(url: str) -> Engine:
+    """Pooled Postgres engine: connections are health-checked and recycled, queries time out"""
+    statement_timeout = env_int("DB_STATEMENT_TIMEOUT_MS", 30000)
+    return create_engine(
+        url,
+        echo=env_flag("SQL_ECHO"),
+        pool_size=env_int("DB_POOL_SIZE", 10),
+        max_overflow=env_int("DB_MAX_OVERFLOW", 20),
+        pool_timeout=env_int("DB_POOL_TIMEOUT", 30),
+        pool_recycle=env_int("DB_POOL_RECYCLE", 1800),
+        pool_pre_ping=True,
+        connect_args={
+            "options": f"-c statement_timeout={statement_timeout}",
+            "application_name": os.getenv("DB_APPLICATION_NAME", "dj-arsenal"),
+        },
+    )
+
+def create_sqlite_engine(url: str) -> Engine:
+    """SQLite tuned for several processes: WAL readers never block the writer,
+    and writers wait on a busy timeout instead of failing with "database is locked"
+    """
+    busy_timeout = env_int("SQLITE_BUSY_TIMEOUT_MS", 30000)
+    engine = create_engine(
+        url,
+        echo=env_flag("SQL_ECHO"),
+        # Sessions are shared across FastAPI's threadpool
+        connect_args={"check_same_thread": False, "timeout": busy_timeout / 1000},
+    )
+    apply_sqlite_pragmas(engine, url, busy_timeout)
+    return engine
+
+def apply_sqlite_pragmas(engine: Engine, url: str, busy_timeout: int) -> None:
+    """Set the connection PRAGMAs on every new connection (sync or aiosqlite)"""
+    pragmas = {
+        "busy_timeout": busy_timeout,
+        "synchronous": "NORMAL",
+        "temp_store": "MEMORY",
+        "mmap_size": env_int("SQLITE_MMAP_SIZE", 256 * 1024 * 1024),
+        # Negative = KiB
+        "cache_size": -env_int("SQLITE_CACHE_KB", 64 * 1024),
+    }
+    in_memory = url.split("///")[-1] in ("", ":memory:")
+
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        if not in_memory:
+            cursor.execute("PRAGMA journal_mode=WAL")
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+def create_storage_engine(url: str) -> Engine:
+    if url.startswith("sqlite"):
+        return create_sqlite_engine(url)
+    if url.startswith("postgresql"):
+        return create_postgres_engine(url)
+    return create_engine(url, echo=env_flag("SQL_ECHO"), pool_pre_ping=True)
+
+DATABASE_URL = database_url()
+IS_SQLITE = DATABASE_URL.startswith("sqlite")
+engine = create_storage_engine(DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async twin of the engine above for async route handlers; scripts and
+# background threads keep using SessionLocal
+
+def async_database_url(url: str) -> str:
+    override = os.getenv("ASYNC_DATABASE_URL")
+    if override:
+        return override
+    if url.startswith("sqlite:"):
+        return "sqlite+aiosqlite:" + url[len("sqlite:"):]
+    if url.startswith("postgresql+psycopg2://"):
+        return "postgresql+asyncpg://" + url[len("postgresql+psycopg2://"):]
+    return url
+
+def create_async_storage_engine(url: str) -> AsyncEngine:
+    if url.startswith("sqlite"):
+        busy_timeout = env_int("SQLITE_BUSY_TIMEOUT_MS", 30000)
+        async_engine = create_async_engine(
+            url,
+            echo=env_flag("SQL_ECHO"),
+            connect_args={"check_same_thread": False, "timeout": busy_timeout / 1000},
+        )
+        apply_sqlite_pragmas(async_engine.sync_engine, url, busy_timeout)
+        return async_engine
+    if url.startswith("postgresql+asyncpg"):
+        return create_async_engine(
+            url,
+            echo=env_flag("SQL_ECHO"),
+            pool_size=env_int("DB_POOL_SIZE", 10),
+            max_overflow=env_int("DB_MAX_OVERFLOW", 20),
+            pool_timeout=env_int("DB_POOL_TIMEOUT", 30),
+            pool_recycle=env_int("DB_POOL_RECYCLE", 1800),
+            pool_pre_ping=True,
+            connect_args={
+                "server_settings": {
+                    "statement_timeout": str(env_int("DB_STATEMENT_TIMEOUT_MS", 30000)),
+                    "application_name": os.getenv("DB_APPLICATION_NAME", "dj-arsenal"),
+                },
+            },
+        )
+    return create_async_engine(url, echo=env_flag("SQL_ECHO"), pool_pre_ping=True)
+
+ASYNC_DATABASE_URL = async_database_url(DATABASE_URL)
+async_engine = create_async_storage_engine(ASYNC_DATABASE_URL)
+# Objects stay readable after commit: async sessions cannot lazy-load expired attributes
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
 def get_db():
@@ -29,4 +149,87 @@ def get_db():
     finally:
         db.close()
 
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+# Schema changes are Alembic migrations in alembic/versions
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_REVISION = "0001"
+
+def alembic_config():
+    from alembic.config import Config
+
+    config = Config(os.path.join(BACKEND_DIR, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(BACKEND_DIR, "alembic"))
+    return config
+
+def baseline_metadata() -> MetaData:
+    """The schema the baseline migration creates, reflected from a scratch SQLite database
+
+    Column types are taken from the models where they still match by name, so
+    tables created from it get this dialect's types rather than SQLite's.
+    """
+    import app.models  # noqa: F401 (registers the tables on Base.metadata)
+    from alembic import command
+
+    scratch = create_engine("sqlite://")
+    config = alembic_config()
+    metadata = MetaData()
+    with scratch.begin() as connection:
+        config.attributes["connection"] = connection
+        command.upgrade(config, BASELINE_REVISION)
+        metadata.reflect(bind=connection)
+    scratch.dispose()
+    metadata.remove(metadata.tables["alembic_version"])
+
+    for table in metadata.tables.values():
+        model = Base.metadata.tables.get(table.name)
+        for column in table.columns:
+            if model is not None and column.name in model.columns:
+                column.type = model.columns[column.name].type
+    return metadata
+
+def adopt_legacy_schema(connection) -> None:
+    """Bring an older create_all database up to the baseline schema
+
+    Creates the baseline tables, nullable columns and indexes it lacks -
+    only those, so the migrations after the baseline can add (or drop)
+    theirs as usual.
+    """
+    baseline = baseline_metadata()
+    inspector = inspect(connection)
+    tables = set(inspector.get_table_names())
+    for table in baseline.sorted_tables:
+        if table.name not in tables:
+            table.create(bind=connection)
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing and column.nullable:
+                column_type = column.type.compile(dialect=connection.dialect)
+                connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+                existing.add(column.name)
+        indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in indexes and all(column.name in existing for column in index.columns):
+                index.create(bind=connection)
+
+def run_migrations():
+    """Upgrade the database to the latest migration
+
+    Databases built by create_all before migrations existed have tables but
+    no alembic_version: they are stamped at the baseline revision (after
+    adding any tables or columns an older release never created) and
+    upgraded from there.
+    """
+    from alembic import command
 
+    config = alembic_config()
+    with engine.begin() as connection:
+        config.attributes["connection"] = connection
+        tables = set(inspect(connection).get_table_names())
+        if "tracks" in tables and "alembic_version" not in tables:
+            adopt_legacy_schema(connection)
+            command.stamp(config, BASELINE_REVISION)
+        command.upgrade(config, "head")
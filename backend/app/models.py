@@ -1,7 +1,9 @@
-from sqlalchemy import Column, String, Integer, Float, Boolean, DateTime, ForeignKey, JSON, Text, UniqueConstraint
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, String, Integer, Float, Boolean, DateTime, ForeignKey, JSON, Text, UniqueConstraint, Index
+from sqlalchemy.orm import relationship, validates
 from sqlalchemy.sql import func
+from typing import Optional
 from app.database import Base
+from app.services.harmonic_mixing import HarmonicMixingEngine
 
 class Track(Base):
     __tablename__ = "tracks"
@@ -12,11 +14,14 @@ class Track(Base):
     duration = Column(Integer, nullable=False)
     bpm = Column(Float, nullable=True)
     key = Column(String, nullable=True)
+    key_code = Column(Integer, nullable=True)  # Camelot key as 0-23, kept in sync with key (indexed with bpm)
     energy = Column(Float, nullable=True)
+    energy_envelope = Column(JSON, nullable=True)  # Energy over the track's length, AudioAnalyzer.ENVELOPE_POINTS samples
     genre = Column(String, nullable=True)
     mood = Column(String, nullable=True)
     file_path = Column(String, nullable=True)
     cover_art = Column(String, nullable=True)
+    album_image_url = Column(String, nullable=True)  # cover_art when it is Spotify album art, kept in sync with cover_art
     preview_url = Column(String, nullable=True)  # Spotify preview URL for playback
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
@@ -24,6 +29,81 @@ class Track(Base):
     set_tracks = relationship("SetTrack", back_populates="track")
     analyses = relationship("TrackAnalysis", back_populates="track")
     playlist_tracks = relationship("PlaylistTrack", back_populates="track")
+    
+    __table_args__ = (
+        # Library filters: genre with a BPM range, BPM range alone, key (by name or code) with BPM
+        Index("ix_tracks_genre_bpm", "genre", "bpm"),
+        Index("ix_tracks_key_code_bpm", "key_code", "bpm"),
+        Index("ix_tracks_key", "key"),
+        # Keyset pages: each sort key with the id tie-breaker (bpm_id also serves BPM ranges)
+        Index("ix_tracks_bpm_id", "bpm", "id"),
+        Index("ix_tracks_energy_id", "energy", "id"),
+        Index("ix_tracks_created_at_id", "created_at", "id"),
+        Index("ix_tracks_title_id", "title", "id"),
+    )
+    
+    @validates("key")
+    def _sync_key_code(self, _, key):
+        self.key_code = HarmonicMixingEngine.key_code(key)
+        return key
+    
+    @validates("cover_art")
+    def _sync_album_image_url(self, _, cover_art):
+        self.album_image_url = Track.spotify_album_art(cover_art)
+        return cover_art
+    
+    @staticmethod
+    def spotify_album_art(cover_art: Optional[str]) -> Optional[str]:
+        """cover_art if it is a Spotify album image URL, else None"""
+        if cover_art and ("scdn.co" in cover_art.lower() or "spotify" in cover_art.lower()):
+            return cover_art
+        return None
+
+class TrackTransition(Base):
+    """Cached score for one of a track's k best outgoing transitions"""
+    __tablename__ = "track_transitions"
+    
+    from_track_id = Column(String, ForeignKey("tracks.id", ondelete="CASCADE"), primary_key=True)
+    to_track_id = Column(String, ForeignKey("tracks.id", ondelete="CASCADE"), primary_key=True)
+    score = Column(Float, nullable=False)  # FlowEngine.score_transition (energy "maintain")
+    key_score = Column(Float, nullable=False, default=0.0)  # HarmonicMixingEngine compatibility
+    bpm_difference = Column(Float, nullable=True)
+    reasons = Column(String, nullable=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    
+    __table_args__ = (
+        Index("ix_track_transitions_from_score", "from_track_id", "score"),
+        Index("ix_track_transitions_to", "to_track_id"),
+    )
+
+class EventCandidate(Base):
+    """A track in an event type's precomputed, ranked candidate pool"""
+    __tablename__ = "event_candidates"
+    
+    event_type_id = Column(String, ForeignKey("event_types.id", ondelete="CASCADE"), primary_key=True)
+    track_id = Column(String, ForeignKey("tracks.id", ondelete="CASCADE"), primary_key=True)
+    score = Column(Float, nullable=False)  # EventPools.score_track
+    reasons = Column(String, nullable=True)
+    
+    __table_args__ = (
+        Index("ix_event_candidates_event_score", "event_type_id", "score"),
+        Index("ix_event_candidates_track", "track_id"),
+    )
+
+class TrackVariant(Base):
+    """One way a track can be played: native, half/double time or pitched a semitone"""
+    __tablename__ = "track_variants"
+    
+    track_id = Column(String, ForeignKey("tracks.id", ondelete="CASCADE"), primary_key=True)
+    kind = Column(String, primary_key=True)  # native, half_time, double_time, pitch_up, pitch_down
+    bpm = Column(Float, nullable=True)
+    key_code = Column(Integer, nullable=True)
+    pitch_shift = Column(Integer, nullable=False, default=0)  # Semitones (key lock off)
+    
+    __table_args__ = (
+        Index("ix_track_variants_key_bpm", "key_code", "bpm"),
+        Index("ix_track_variants_bpm", "bpm"),
+    )
 
 class Set(Base):
     __tablename__ = "sets"
@@ -33,6 +113,7 @@ class Set(Base):
     description = Column(Text, nullable=True)
     event_type_id = Column(String, ForeignKey("event_types.id"), nullable=True)
     duration = Column(Integer, nullable=False)
+    version = Column(Integer, nullable=False, default=0, server_default="0")  # Bumped with every change to the track order (SetCurves)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
@@ -54,6 +135,12 @@ class SetTrack(Base):
     
     set = relationship("Set", back_populates="set_tracks")
     track = relationship("Track", back_populates="set_tracks")
+    
+    __table_args__ = (
+        # A set's tracks are always read in order
+        Index("ix_set_tracks_set_position", "set_id", "position"),
+        Index("ix_set_tracks_track", "track_id"),
+    )
 
 class EventType(Base):
     __tablename__ = "event_types"
@@ -164,8 +251,57 @@ class PlaylistTrack(Base):
     track = relationship("Track", back_populates="playlist_tracks")
     
     __table_args__ = (
+        # Also the (playlist_id, position) index for reading a playlist in order
         UniqueConstraint('playlist_id', 'position', name='uq_playlist_position'),
+        Index("ix_playlist_tracks_playlist_track", "playlist_id", "track_id"),
+        Index("ix_playlist_tracks_track", "track_id"),
+    )
+
+class SmartCrate(Base):
+    """A saved track filter whose membership is materialized in smart_crate_tracks"""
+    __tablename__ = "smart_crates"
+    
+    id = Column(String, primary_key=True, index=True)
+    name = Column(String, nullable=False)
+    description = Column(Text, nullable=True)
+    rules = Column(JSON, nullable=False)  # SmartCrateRules
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+class SmartCrateTrack(Base):
+    __tablename__ = "smart_crate_tracks"
+    
+    crate_id = Column(String, ForeignKey("smart_crates.id", ondelete="CASCADE"), primary_key=True)
+    track_id = Column(String, ForeignKey("tracks.id", ondelete="CASCADE"), primary_key=True)
+    
+    __table_args__ = (
+        Index("ix_smart_crate_tracks_track", "track_id"),
+    )
+
+class ScoringProfile(Base):
+    """Per-user and/or per-event-type weight overrides for ScoringPipeline"""
+    __tablename__ = "scoring_profiles"
+    
+    id = Column(String, primary_key=True, index=True)
+    name = Column(String, nullable=False)
+    user_id = Column(String, nullable=True)
+    event_type_id = Column(String, ForeignKey("event_types.id", ondelete="CASCADE"), nullable=True)
+    weights = Column(JSON, nullable=False)  # term name -> weight
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    
+    __table_args__ = (
+        UniqueConstraint("user_id", "event_type_id", name="uq_scoring_profiles_scope"),
+        Index("ix_scoring_profiles_user", "user_id"),
+        Index("ix_scoring_profiles_event_type", "event_type_id"),
     )
 
+class CacheVersion(Base):
+    """Shared change counter for data that worker processes mirror in memory (CacheVersions)"""
+    __tablename__ = "cache_versions"
+    
+    name = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0, server_default="0")
+
 
 
@@ -0,0 +1,35 @@
+import json
+from typing import Any
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+# Optional: orjson serializes large lists of dicts several times faster
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    orjson = None
+    ORJSON_AVAILABLE = False
+
+
+def json_bytes(content: Any) -> bytes:
+    """Compact JSON for plain dicts and lists (datetimes as ISO 8601, UTC as Z)"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(content, option=orjson.OPT_UTC_Z | orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(
+        jsonable_encoder(content), ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response for content that is already plain dicts and lists
+
+    Returning one from an endpoint skips response_model validation, so the
+    content must already have the response model's shape (TrackSerializer
+    builds it). Rendered with orjson when installed; datetimes come out as
+    Pydantic writes them.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return json_bytes(content)
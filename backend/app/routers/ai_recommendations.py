@@ -4,9 +4,10 @@ from typing import List, Optional
 from pydantic import BaseModel
 
 from app.database import get_db
-from app.models import Track
+from app.models import Track, EventType
 from app.services.ai_recommendations import AIRecommendationEngine
 from app.services.ai_set_generator import AISetGenerator
+from app.services.event_pools import EventPools
 
 router = APIRouter()
 
@@ -93,8 +94,11 @@ async def generate_set(
     db: Session = Depends(get_db)
 ):
     """Generate AI-powered set plan"""
-    # Get all tracks
-    all_tracks = db.query(Track).all()
+    # Start from the event's ranked candidate pool when the event type is known
+    event_type = db.query(EventType).filter(EventType.name == request.event_type).first()
+    all_tracks = [track for track, _, _ in EventPools.get_pool(db, event_type)] if event_type else []
+    if len(all_tracks) < 5:
+        all_tracks = db.query(Track).all()
     
     if len(all_tracks) < 5:
         raise HTTPException(status_code=400, detail="Need at least 5 tracks to generate a set")
@@ -3,6 +3,7 @@ from sqlalchemy.orm import Session
 
 from app.database import get_db
 from app.models import Track
+from app.services.library_events import LibraryEvents
 
 # Optional import for audio analysis
 try:
@@ -36,6 +37,7 @@ async def analyze_bpm(track_id: str, db: Session = Depends(get_db)):
     if result.get("bpm"):
         track.bpm = result["bpm"]
         db.commit()
+        LibraryEvents.track_updated(db, track)
     
     return result
 
@@ -61,6 +63,7 @@ async def analyze_key(track_id: str, db: Session = Depends(get_db)):
     if result.get("key"):
         track.key = result["key"]
         db.commit()
+        LibraryEvents.track_updated(db, track)
     
     return result
 
@@ -85,7 +88,10 @@ async def analyze_energy(track_id: str, db: Session = Depends(get_db)):
     # Update track
     if result.get("energy"):
         track.energy = result["energy"]
+        if result.get("energy_envelope"):
+            track.energy_envelope = result["energy_envelope"]
         db.commit()
+        LibraryEvents.track_updated(db, track)
     
     return result
 
@@ -114,8 +120,11 @@ async def full_analysis(track_id: str, db: Session = Depends(get_db)):
         track.key = result["key"]
     if result.get("energy"):
         track.energy = result["energy"]
+    if result.get("energy_envelope"):
+        track.energy_envelope = result["energy_envelope"]
     
     db.commit()
+    LibraryEvents.track_updated(db, track)
     
     return result
 
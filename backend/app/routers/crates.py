@@ -0,0 +1,139 @@
+"""
+Smart Crate Router - Saved rule-based track filters with materialized membership
+"""
+
+from fastapi import APIRouter, HTTPException, Depends
+from sqlalchemy.orm import Session
+from typing import List
+import uuid
+from datetime import datetime
+
+from app.database import get_db
+from app.models import SmartCrate, Track
+from app.responses import FastJSONResponse
+from app.schemas import SmartCrateCreate, SmartCrateUpdate, SmartCrateResponse, TrackResponse
+from app.services.smart_crates import SmartCrates
+from app.services.track_serializer import TrackSerializer
+
+router = APIRouter()
+
+def crate_response(db: Session, crate: SmartCrate) -> SmartCrateResponse:
+    return SmartCrateResponse(
+        id=crate.id,
+        name=crate.name,
+        description=crate.description,
+        rules=crate.rules,
+        track_count=len(SmartCrates.members(db, crate.id)),
+        created_at=crate.created_at,
+        updated_at=crate.updated_at
+    )
+
+def get_crate_or_404(db: Session, crate_id: str) -> SmartCrate:
+    crate = db.query(SmartCrate).filter(SmartCrate.id == crate_id).first()
+    if not crate:
+        raise HTTPException(status_code=404, detail="Smart crate not found")
+    return crate
+
+def evaluate_or_400(db: Session, crate: SmartCrate) -> None:
+    try:
+        SmartCrates.evaluate(db, crate)
+    except ValueError as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("", response_model=SmartCrateResponse)
+async def create_crate(crate_data: SmartCrateCreate, db: Session = Depends(get_db)):
+    """Create a smart crate and fill it from the library"""
+    try:
+        SmartCrates.compile(crate_data.rules.dict())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    crate = SmartCrate(
+        id=str(uuid.uuid4()),
+        name=crate_data.name,
+        description=crate_data.description,
+        rules=crate_data.rules.dict()
+    )
+    db.add(crate)
+    db.commit()
+    db.refresh(crate)
+    evaluate_or_400(db, crate)
+    return crate_response(db, crate)
+
+@router.get("", response_model=List[SmartCrateResponse])
+async def get_crates(db: Session = Depends(get_db)):
+    """Get all smart crates with their track counts"""
+    crates = db.query(SmartCrate).order_by(SmartCrate.created_at.desc()).all()
+    return [crate_response(db, crate) for crate in crates]
+
+@router.get("/{crate_id}")
+async def get_crate(crate_id: str, db: Session = Depends(get_db)):
+    """Get a smart crate and its member track IDs"""
+    crate = get_crate_or_404(db, crate_id)
+    return {
+        **crate_response(db, crate).dict(),
+        "track_ids": sorted(SmartCrates.members(db, crate_id))
+    }
+
+@router.get("/{crate_id}/tracks", response_model=List[TrackResponse])
+async def get_crate_tracks(
+    crate_id: str,
+    skip: int = 0,
+    limit: int = 100,
+    db: Session = Depends(get_db)
+):
+    """Get the tracks in a smart crate, ordered by BPM"""
+    get_crate_or_404(db, crate_id)
+    track_ids = SmartCrates.members(db, crate_id)
+    if not track_ids:
+        return []
+    rows = db.query(*TrackSerializer.COLUMNS).filter(
+        Track.id.in_(list(track_ids))
+    ).order_by(Track.bpm, Track.title).offset(skip).limit(limit).all()
+    return FastJSONResponse(TrackSerializer.rows(rows))
+
+@router.get("/{crate_id}/contains/{track_id}")
+async def crate_contains_track(crate_id: str, track_id: str, db: Session = Depends(get_db)):
+    """Check whether a track is in a smart crate"""
+    get_crate_or_404(db, crate_id)
+    return {"crate_id": crate_id, "track_id": track_id, "member": SmartCrates.contains(db, crate_id, track_id)}
+
+@router.put("/{crate_id}", response_model=SmartCrateResponse)
+async def update_crate(crate_id: str, crate_data: SmartCrateUpdate, db: Session = Depends(get_db)):
+    """Rename a smart crate or change its rules"""
+    crate = get_crate_or_404(db, crate_id)
+
+    if crate_data.rules is not None:
+        try:
+            SmartCrates.compile(crate_data.rules.dict())
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        crate.rules = crate_data.rules.dict()
+    if crate_data.name is not None:
+        crate.name = crate_data.name
+    if crate_data.description is not None:
+        crate.description = crate_data.description
+    crate.updated_at = datetime.utcnow()
+    db.commit()
+    db.refresh(crate)
+
+    if crate_data.rules is not None:
+        evaluate_or_400(db, crate)
+    return crate_response(db, crate)
+
+@router.post("/{crate_id}/refresh", response_model=SmartCrateResponse)
+async def refresh_crate(crate_id: str, db: Session = Depends(get_db)):
+    """Re-run a smart crate's rules over the whole library"""
+    crate = get_crate_or_404(db, crate_id)
+    evaluate_or_400(db, crate)
+    return crate_response(db, crate)
+
+@router.delete("/{crate_id}")
+async def delete_crate(crate_id: str, db: Session = Depends(get_db)):
+    """Delete a smart crate"""
+    crate = get_crate_or_404(db, crate_id)
+    SmartCrates.forget(db, crate_id)
+    db.delete(crate)
+    db.commit()
+    return {"message": "Smart crate deleted"}
@@ -0,0 +1,30 @@
+"""
+Debug Router - request/query instrumentation collected by QueryMetrics
+"""
+
+from fastapi import APIRouter, HTTPException
+
+from app.services.query_metrics import QueryMetrics
+
+router = APIRouter()
+
+@router.get("/queries")
+async def get_query_stats(limit: int = 20, sort: str = "avg_queries"):
+    """Endpoints with the most SQL per request since startup (or the last reset)
+
+    sort is avg_queries, max_queries, avg_db_ms, total_db_ms or avg_ms.
+    """
+    try:
+        endpoints = QueryMetrics.worst_endpoints(limit=limit, sort=sort)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {
+        "slow_query_ms": QueryMetrics.SLOW_QUERY_MS,
+        "endpoints": endpoints
+    }
+
+@router.delete("/queries")
+async def reset_query_stats():
+    """Clear the per-endpoint totals"""
+    QueryMetrics.reset()
+    return {"message": "Query stats reset"}
@@ -1,4 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException
+from pydantic import ValidationError
 from sqlalchemy.orm import Session
 from typing import List
 import uuid
@@ -6,7 +7,8 @@ import json
 
 from app.database import get_db
 from app.models import EventType
-from app.schemas import EventTypeCreate, EventTypeResponse
+from app.schemas import EventTypeCreate, EventTypeUpdate, EventTypeResponse
+from app.services.event_pools import EventPools
 
 router = APIRouter()
 
@@ -89,9 +91,12 @@ async def initialize_event_types(db: Session = Depends(get_db)):
                 drop_intensity=data["drop_intensity"]
             )
             db.add(event_type)
-            created.append(name)
+            created.append(event_type)
     
     db.commit()
+    for event_type in created:
+        EventPools.rebuild(db, event_type)
+    created = [event_type.name for event_type in created]
     return {"message": f"Initialized {len(created)} event types", "created": created}
 
 @router.post("/", response_model=EventTypeResponse)
@@ -104,6 +109,7 @@ async def create_event_type(event: EventTypeCreate, db: Session = Depends(get_db
     db.add(db_event)
     db.commit()
     db.refresh(db_event)
+    EventPools.rebuild(db, db_event)
     return db_event
 
 @router.get("/", response_model=List[EventTypeResponse])
@@ -120,6 +126,64 @@ async def get_event_type(event_id: str, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Event type not found")
     return event
 
+@router.put("/{event_id}", response_model=EventTypeResponse)
+async def update_event_type(event_id: str, event: EventTypeUpdate, db: Session = Depends(get_db)):
+    """Edit an event profile and re-rank its candidate pool"""
+    db_event = db.query(EventType).filter(EventType.id == event_id).first()
+    if not db_event:
+        raise HTTPException(status_code=404, detail="Event type not found")
+    
+    for field, value in event.dict(exclude_unset=True).items():
+        setattr(db_event, field, value)
+    if db_event.min_bpm > db_event.max_bpm:
+        db.rollback()
+        raise HTTPException(status_code=400, detail="min_bpm must not exceed max_bpm")
+    
+    # Build the response before committing so a profile that cannot be
+    # returned is never half-applied
+    db.flush()
+    try:
+        response = EventTypeResponse.model_validate(db_event)
+    except ValidationError as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=f"Invalid event profile: {e.errors()[0]['msg']}")
+    db.commit()
+    EventPools.rebuild(db, db_event)
+    return response
+
+@router.get("/{event_id}/candidates")
+async def get_event_candidates(
+    event_id: str,
+    skip: int = 0,
+    limit: int = 50,
+    db: Session = Depends(get_db)
+):
+    """Get the ranked candidate pool for an event type"""
+    event = db.query(EventType).filter(EventType.id == event_id).first()
+    if not event:
+        raise HTTPException(status_code=404, detail="Event type not found")
+    
+    pool = EventPools.get_pool(db, event, limit=skip + limit)[skip:]
+    return {
+        "event_type_id": event_id,
+        "candidates": [
+            {
+                "track": {
+                    "id": track.id,
+                    "title": track.title,
+                    "artist": track.artist,
+                    "bpm": track.bpm,
+                    "key": track.key,
+                    "energy": track.energy,
+                    "genre": track.genre
+                },
+                "score": round(score, 3),
+                "reason": reasons
+            }
+            for track, score, reasons in pool
+        ]
+    }
+
 
 
 
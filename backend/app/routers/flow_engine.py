@@ -1,34 +1,62 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Dict, Optional
 
-from app.database import get_db
-from app.models import Track, Set, SetTrack
-from app.schemas import FlowSuggestionRequest, FlowSuggestionResponse
+from app.database import get_async_db
+from app.models import Track, Set, SetTrack, EventType
+from app.schemas import FlowSuggestionRequest, FlowSuggestionResponse, OptimizeJobRequest
+from app.services.event_pools import EventPools
 from app.services.flow_engine import FlowEngine
+from app.services.harmonic_mixing import HarmonicMixingEngine
+from app.services.optimization_jobs import OptimizationJobs
+from app.services.scoring_pipeline import ScoringPipeline
+from app.services.set_curves import SetCurves
+from app.services.tempo_variants import TempoVariants
+from app.services.transition_cache import TransitionCache
 
 router = APIRouter()
 
 @router.post("/suggest-next")
 async def suggest_next_track(
     request: FlowSuggestionRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get flow suggestions for next track"""
-    current_track = db.query(Track).filter(Track.id == request.current_track_id).first()
+    current_track = await db.get(Track, request.current_track_id)
     if not current_track:
         raise HTTPException(status_code=404, detail="Current track not found")
     
-    # Get all available tracks
-    all_tracks = db.query(Track).filter(Track.id != request.current_track_id).all()
+    event_type = None
+    if request.event_type_id:
+        event_type = await db.get(EventType, request.event_type_id)
+        if not event_type:
+            raise HTTPException(status_code=404, detail="Event type not found")
     
-    # Get suggestions
-    suggestions = FlowEngine.suggest_next_track(
-        current_track=current_track,
-        available_tracks=all_tracks,
-        target_energy=request.target_energy,
-        target_bpm=request.target_bpm
-    )
+    # Scoring weights: defaults, overridden by the user's / event type's profile
+    weights = await db.run_sync(ScoringPipeline.resolve_weights, request.user_id, request.event_type_id)
+    
+    if event_type:
+        # Start from the event's precomputed candidate pool
+        pool = await db.run_sync(EventPools.get_pool, event_type, exclude_ids=[current_track.id])
+        suggestions = FlowEngine.suggest_next_track(
+            current_track,
+            [track for track, _, _ in pool],
+            target_energy=request.target_energy,
+            target_bpm=request.target_bpm,
+            energy_direction=request.energy_direction,
+            weights=weights
+        )
+    else:
+        # Rank the cached best transitions instead of rescoring the library
+        suggestions = await db.run_sync(
+            TransitionCache.suggest_next,
+            current_track,
+            target_energy=request.target_energy,
+            target_bpm=request.target_bpm,
+            energy_direction=request.energy_direction,
+            weights=weights
+        )
     
     # Format response
     result = []
@@ -48,51 +76,169 @@ async def calculate_bpm_transition(from_bpm: float, to_bpm: float):
     return FlowEngine.calculate_bpm_transition(from_bpm, to_bpm)
 
 @router.get("/energy-curve/{set_id}")
-async def get_energy_curve(set_id: str, db: Session = Depends(get_db)):
-    """Get energy curve for a set"""
-    db_set = db.query(Set).filter(Set.id == set_id).first()
+async def get_energy_curve(set_id: str, db: AsyncSession = Depends(get_async_db)):
+    """Get energy curve for a set (cached, patched as tracks are added, removed or moved)"""
+    db_set = await db.get(Set, set_id)
     if not db_set:
         raise HTTPException(status_code=404, detail="Set not found")
     
-    set_tracks = db.query(SetTrack).filter(SetTrack.set_id == set_id).order_by(SetTrack.position).all()
-    tracks = [db.query(Track).filter(Track.id == st.track_id).first() for st in set_tracks]
-    tracks = [t for t in tracks if t]
-    
-    curve = FlowEngine.build_energy_curve(tracks)
-    drops = FlowEngine.detect_energy_drops(curve)
+    curve = await db.run_sync(SetCurves.get, set_id)
+    return curve.to_dict()
+
+@router.get("/energy-curve/{set_id}/timeline")
+async def get_energy_timeline(set_id: str, points: int = 200, db: AsyncSession = Depends(get_async_db)):
+    """Get a set's energy over time from per-track envelopes, downsampled to `points`"""
+    db_set = await db.get(Set, set_id)
+    if not db_set:
+        raise HTTPException(status_code=404, detail="Set not found")
     
+    curve = await db.run_sync(SetCurves.get, set_id)
     return {
-        "curve": curve,
-        "drops": drops,
-        "total_duration": sum(t.duration for t in tracks if t.duration)
+        "timeline": curve.timeline(max(1, min(points, 2000))),
+        "total_duration": curve.total_duration,
+        "version": curve.version
     }
 
 @router.post("/optimize-set/{set_id}")
-async def optimize_set_order(set_id: str, db: Session = Depends(get_db)):
-    """Optimize track order in a set"""
-    db_set = db.query(Set).filter(Set.id == set_id).first()
+async def optimize_set_order(set_id: str, db: AsyncSession = Depends(get_async_db)):
+    """Optimize track order in a set (greedy, in the request; see /optimize-jobs for larger sets)"""
+    db_set = await db.get(Set, set_id)
     if not db_set:
         raise HTTPException(status_code=404, detail="Set not found")
     
-    set_tracks = db.query(SetTrack).filter(SetTrack.set_id == set_id).order_by(SetTrack.position).all()
-    tracks = [db.query(Track).filter(Track.id == st.track_id).first() for st in set_tracks]
-    tracks = [t for t in tracks if t]
+    rows = (await db.execute(
+        select(SetTrack.id, Track).join(
+            Track, Track.id == SetTrack.track_id
+        ).where(SetTrack.set_id == set_id).order_by(SetTrack.position)
+    )).all()
+    tracks = [track for _, track in rows]
     
-    optimized = FlowEngine.optimize_set_order(tracks)
+    pair_scores = await db.run_sync(TransitionCache.get_pair_scores, [t.id for t in tracks])
+    optimized = FlowEngine.optimize_set_order(tracks, pair_scores=pair_scores)
     
-    # Update positions
-    for idx, track in enumerate(optimized):
-        set_track = db.query(SetTrack).filter(
-            SetTrack.set_id == set_id,
-            SetTrack.track_id == track.id
-        ).first()
-        if set_track:
-            set_track.position = idx
-    
-    db.commit()
+    # Map back to set entries (a track may appear more than once)
+    entries: Dict[str, List[str]] = {}
+    for set_track_id, track in rows:
+        entries.setdefault(track.id, []).append(set_track_id)
+    await db.run_sync(OptimizationJobs.apply_order, set_id, [entries[track.id].pop(0) for track in optimized])
     
     return {"message": "Set optimized", "track_count": len(optimized)}
 
+@router.post("/optimize-jobs")
+async def start_optimize_job(request: OptimizeJobRequest, db: AsyncSession = Depends(get_async_db)):
+    """Start optimizing a set's order in the background"""
+    db_set = await db.get(Set, request.set_id)
+    if not db_set:
+        raise HTTPException(status_code=404, detail="Set not found")
+    
+    job = await db.run_sync(OptimizationJobs.start, request.set_id, max_seconds=request.max_seconds)
+    return OptimizationJobs.state(job)
+
+@router.get("/optimize-jobs")
+async def list_optimize_jobs(set_id: Optional[str] = None):
+    """List optimization jobs, optionally for one set"""
+    return [OptimizationJobs.state(job) for job in OptimizationJobs.for_set(set_id)]
+
+@router.get("/optimize-jobs/{job_id}")
+async def get_optimize_job(job_id: str):
+    """Get a job's status and its best order so far"""
+    job = OptimizationJobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Optimization job not found")
+    return OptimizationJobs.state(job)
+
+@router.delete("/optimize-jobs/{job_id}")
+async def cancel_optimize_job(job_id: str):
+    """Cancel a job; the set keeps its current order"""
+    job = OptimizationJobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Optimization job not found")
+    OptimizationJobs.cancel(job)
+    return OptimizationJobs.state(job)
+
+@router.post("/transitions/rebuild")
+async def rebuild_transition_cache(
+    k: Optional[int] = None,
+    workers: Optional[int] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Rebuild the transition cache from scratch (parallel for large libraries)"""
+    rows = await db.run_sync(TransitionCache.rebuild, k=k, workers=workers)
+    return {"message": "Transition cache rebuilt", "transitions": rows}
+
+@router.get("/transitions/{track_id}")
+async def get_cached_transitions(
+    track_id: str,
+    limit: int = 25,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get a track's cached best outgoing transitions"""
+    track = await db.get(Track, track_id)
+    if not track:
+        raise HTTPException(status_code=404, detail="Track not found")
+    
+    transitions = await db.run_sync(TransitionCache.get_transitions, track, limit=limit)
+    return [
+        {
+            "to_track_id": t.to_track_id,
+            "score": t.score,
+            "key_score": t.key_score,
+            "bpm_difference": t.bpm_difference,
+            "reasons": t.reasons
+        }
+        for t in transitions
+    ]
+
+@router.get("/playable-as")
+async def find_playable_tracks(
+    bpm: Optional[float] = None,
+    key: Optional[str] = None,
+    track_id: Optional[str] = None,
+    bpm_tolerance: float = 2.0,
+    harmonic: bool = True,
+    limit: int = 50,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Find tracks playable at a BPM/key, including half/double time and pitched variants"""
+    key_code = HarmonicMixingEngine.key_code(key) if key else None
+    if track_id:
+        track = await db.get(Track, track_id)
+        if not track:
+            raise HTTPException(status_code=404, detail="Track not found")
+        bpm = bpm or track.bpm
+        key_code = key_code if key else track.key_code
+    
+    if not bpm:
+        raise HTTPException(status_code=400, detail="A BPM or a track with a BPM is required")
+    
+    matches = await db.run_sync(
+        TempoVariants.find_playable,
+        bpm,
+        key_code=key_code,
+        bpm_tolerance=bpm_tolerance,
+        harmonic=harmonic,
+        exclude_id=track_id,
+        limit=limit
+    )
+    return [
+        {
+            "track": {
+                "id": track.id,
+                "title": track.title,
+                "artist": track.artist,
+                "bpm": track.bpm,
+                "key": track.key,
+                "energy": track.energy
+            },
+            "played_as": variant.kind,
+            "effective_bpm": variant.bpm,
+            "effective_key": HarmonicMixingEngine.key_from_code(variant.key_code),
+            "pitch_shift": variant.pitch_shift,
+            "key_score": key_score
+        }
+        for track, variant, key_score in matches
+    ]
+
 
 
 
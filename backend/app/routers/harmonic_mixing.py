@@ -1,10 +1,16 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
+from sqlalchemy import case, func
+import numpy as np
 
 from app.database import get_db
 from app.models import Track
-from app.schemas import HarmonicCompatibilityRequest, HarmonicCompatibilityResponse
+from app.schemas import (
+    HarmonicCompatibilityRequest, HarmonicCompatibilityResponse, HarmonicTrackMatch,
+    KeyPathRequest, KeyMatrixRequest
+)
 from app.services.harmonic_mixing import HarmonicMixingEngine
+from app.services.key_index import KeyIndex
 
 router = APIRouter()
 
@@ -29,9 +35,35 @@ async def get_compatibility_score(from_key: str, to_key: str):
         "transition_type": HarmonicMixingEngine.get_transition_type(from_key, to_key)
     }
 
+@router.post("/compatibility-matrix")
+async def get_compatibility_matrix(request: KeyMatrixRequest):
+    """Score every from/to key pair in one table lookup"""
+    to_keys = request.to_keys if request.to_keys is not None else request.from_keys
+    from_codes = [HarmonicMixingEngine.key_code(k) for k in request.from_keys]
+    to_codes = [HarmonicMixingEngine.key_code(k) for k in to_keys]
+    
+    from_array = np.array([-1 if c is None else c for c in from_codes], dtype=np.int64)
+    to_array = np.array([-1 if c is None else c for c in to_codes], dtype=np.int64)
+    scores = HarmonicMixingEngine.score_matrix(from_array, to_array)
+    types = HarmonicMixingEngine.TRANSITION_TYPE_TABLE[np.ix_(np.clip(from_array, 0, 23), np.clip(to_array, 0, 23))]
+    
+    type_names = np.array(HarmonicMixingEngine.TRANSITION_TYPES, dtype=object)[types]
+    known = (from_array >= 0)[:, None] & (to_array >= 0)[None, :]
+    type_names[~known] = "unknown"
+    
+    return {
+        "from_keys": request.from_keys,
+        "to_keys": to_keys,
+        "scores": scores.astype(float).round(3).tolist(),
+        "transition_types": type_names.tolist()
+    }
+
 @router.get("/modal-interchange/{camelot_key}")
 async def get_modal_interchange(camelot_key: str):
     """Get modal interchange suggestions"""
+    if HarmonicMixingEngine.key_code(camelot_key) is None:
+        raise HTTPException(status_code=400, detail=f"Unknown key: {camelot_key}")
+    
     return {
         "suggestions": HarmonicMixingEngine.get_modal_interchange_suggestions(camelot_key)
     }
@@ -41,31 +73,133 @@ async def get_compatible_tracks(
     request: HarmonicCompatibilityRequest,
     db: Session = Depends(get_db)
 ):
-    """Get harmonically compatible tracks"""
+    """Get harmonically compatible tracks, ranked and paginated"""
     track = db.query(Track).filter(Track.id == request.track_id).first()
     if not track:
         raise HTTPException(status_code=404, detail="Track not found")
     
-    if not track.key:
+    if track.key_code is None:
         raise HTTPException(status_code=400, detail="Track key not available")
     
-    compat = HarmonicMixingEngine.get_compatible_keys(track.key)
+    camelot_key = HarmonicMixingEngine.key_from_code(track.key_code)
+    compat = HarmonicMixingEngine.get_compatible_keys(camelot_key)
     
-    # Get tracks with compatible keys
-    compatible_tracks = []
-    for key_list in [compat["perfect"], compat["safe"], compat["risky"]]:
-        for key in key_list:
-            tracks = db.query(Track).filter(Track.key == key).all()
-            compatible_tracks.extend(tracks)
+    # Compatible key codes and their scores straight from the 24x24 table
+    min_score = 0.5 if request.include_risky else 0.8
+    row = HarmonicMixingEngine.COMPATIBILITY_TABLE[track.key_code]
+    key_scores = {int(code): float(row[code]) for code in np.nonzero(row >= min_score)[0]}
+    key_score = case(key_scores, value=Track.key_code, else_=0.0)
+    
+    # One indexed IN query: ranking, BPM tolerance, total and page together
+    query = db.query(Track, func.count().over().label("total")).filter(
+        Track.key_code.in_(list(key_scores)),
+        Track.id != track.id
+    )
+    order_by = [key_score.desc()]
+    if track.bpm:
+        if request.bpm_tolerance is not None:
+            query = query.filter(Track.bpm.between(
+                track.bpm - request.bpm_tolerance,
+                track.bpm + request.bpm_tolerance
+            ))
+        order_by.append(func.abs(Track.bpm - track.bpm).is_(None))
+        order_by.append(func.abs(Track.bpm - track.bpm))
+    rows = query.order_by(*order_by, Track.id).offset(request.skip).limit(request.limit).all()
+    
+    matches = []
+    for match, _ in rows:
+        matches.append(HarmonicTrackMatch(
+            track=match,
+            transition_type=HarmonicMixingEngine.TRANSITION_TYPES[
+                HarmonicMixingEngine.TRANSITION_TYPE_TABLE[track.key_code, match.key_code]
+            ],
+            compatibility_score=key_scores[match.key_code],
+            bpm_difference=match.bpm - track.bpm if match.bpm and track.bpm else None
+        ))
     
     return HarmonicCompatibilityResponse(
         compatible_keys=compat["perfect"] + compat["safe"],
         safe_transitions=compat["safe"],
-        modal_interchange=HarmonicMixingEngine.get_modal_interchange_suggestions(track.key)
+        modal_interchange=HarmonicMixingEngine.get_modal_interchange_suggestions(camelot_key),
+        total=rows[0][1] if rows else 0,
+        tracks=matches
     )
 
-
-
-
-
-
+@router.post("/key-path")
+async def find_key_path(
+    request: KeyPathRequest,
+    db: Session = Depends(get_db)
+):
+    """Plan a multi-step key and energy journey filled with library tracks"""
+    from_key, to_key = request.from_key, request.to_key
+    start_energy, end_energy = request.start_energy, request.end_energy
+    anchors = {}
+    
+    for field, track_id in (("from", request.from_track_id), ("to", request.to_track_id)):
+        if not track_id:
+            continue
+        track = db.query(Track).filter(Track.id == track_id).first()
+        if not track:
+            raise HTTPException(status_code=404, detail="Track not found")
+        if not track.key:
+            raise HTTPException(status_code=400, detail="Track key not available")
+        anchors[field] = track
+        if field == "from":
+            from_key = track.key
+            start_energy = track.energy if start_energy is None else start_energy
+        else:
+            to_key = track.key
+            end_energy = track.energy if end_energy is None else end_energy
+    
+    if not from_key or not to_key:
+        raise HTTPException(status_code=400, detail="Both a start and an end key are required")
+    
+    route = HarmonicMixingEngine.find_key_path(from_key, to_key)
+    if route is None:
+        raise HTTPException(status_code=400, detail="Invalid Camelot key")
+    
+    start_energy = 0.5 if start_energy is None else start_energy
+    end_energy = start_energy if end_energy is None else end_energy
+    tracks_per_key = max(1, request.tracks_per_key)
+    slots = len(route["keys"]) * tracks_per_key
+    
+    index = KeyIndex.get(db)
+    used = {t.id for t in anchors.values()}
+    steps = []
+    for i, key in enumerate(route["keys"]):
+        step_tracks = []
+        for j in range(tracks_per_key):
+            slot = i * tracks_per_key + j
+            target_energy = start_energy + (end_energy - start_energy) * (slot / max(1, slots - 1))
+            if slot == 0 and "from" in anchors:
+                track_id = anchors["from"].id
+            elif slot == slots - 1 and "to" in anchors:
+                track_id = anchors["to"].id
+            else:
+                matches = index.nearest(key, target_energy, exclude=used)
+                track_id = matches[0] if matches else None
+            used.add(track_id)
+            step_tracks.append({"track_id": track_id, "target_energy": round(target_energy, 3)})
+        steps.append({"key": key, "tracks": step_tracks})
+    
+    track_ids = [t["track_id"] for step in steps for t in step["tracks"] if t["track_id"]]
+    tracks = {t.id: t for t in db.query(Track).filter(Track.id.in_(track_ids)).all()} if track_ids else {}
+    for step in steps:
+        for slot in step["tracks"]:
+            track = tracks.get(slot["track_id"])
+            slot["track"] = {
+                "id": track.id,
+                "title": track.title,
+                "artist": track.artist,
+                "bpm": track.bpm,
+                "key": track.key,
+                "energy": track.energy
+            } if track else None
+    
+    return {
+        "keys": route["keys"],
+        "cost": route["cost"],
+        "transitions": route["transitions"],
+        "steps": steps,
+        "missing_keys": [step["key"] for step in steps if not all(t["track"] for t in step["tracks"])]
+    }
@@ -0,0 +1,54 @@
+"""
+Library Router - NDJSON export and bulk import for moving a library between instances
+"""
+
+import tempfile
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+
+from app.database import engine
+from app.services.library_transfer import LibraryTransfer
+
+router = APIRouter()
+
+# Request bodies above this size are spooled to disk while they upload
+SPOOL_MAX_BYTES = 16 * 1024 * 1024
+
+@router.get("/export")
+async def export_library(groups: Optional[str] = None):
+    """Stream the library as NDJSON
+    
+    groups is a comma-separated subset of tracks, track_analyses, sets and
+    playlists (default: all). Lines are in import order.
+    """
+    try:
+        tables = LibraryTransfer.parse_groups(groups)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return StreamingResponse(
+        LibraryTransfer.export_lines(engine, tables),
+        media_type=LibraryTransfer.MEDIA_TYPE,
+        headers={"Content-Disposition": 'attachment; filename="dj_arsenal_library.ndjson"'}
+    )
+
+@router.post("/import")
+async def import_library(request: Request, batch_size: Optional[int] = None):
+    """Upsert an NDJSON export sent as the request body
+    
+    Rows are matched by id, so importing the same file twice is harmless.
+    On a malformed line the batches before it stay imported.
+    """
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES) as body:
+        async for chunk in request.stream():
+            body.write(chunk)
+        body.seek(0)
+        try:
+            counts = await run_in_threadpool(LibraryTransfer.import_lines, engine, body, batch_size)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    
+    return {"imported": counts, "total": sum(counts.values())}
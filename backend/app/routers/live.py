@@ -0,0 +1,170 @@
+"""
+Live Set Router - Stateful live sessions with suggestions pushed over WebSocket
+"""
+
+import json
+
+from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect
+from pydantic import ValidationError
+from sqlalchemy.orm import Session
+
+from app.database import get_db, SessionLocal
+from app.models import Set, Track
+from app.services.live_session import LiveSession, LiveSessionManager
+from app.services.scoring_pipeline import ScoringPipeline
+from app.schemas import LiveSessionCreate, LivePlayRequest, LiveSessionSettings, LiveExcludeRequest
+
+router = APIRouter()
+
+def get_session_or_404(session_id: str) -> LiveSession:
+    session = LiveSessionManager.get(session_id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Live session not found")
+    return session
+
+def play_track(db: Session, session: LiveSession, track_id: str) -> None:
+    track = db.query(Track).filter(Track.id == track_id).first()
+    if not track:
+        raise HTTPException(status_code=404, detail="Track not found")
+    session.play(db, track)
+
+@router.post("/sessions")
+async def create_live_session(
+    request: LiveSessionCreate,
+    db: Session = Depends(get_db)
+):
+    """Start a live session, optionally from a set and the track that is already playing"""
+    if request.set_id and not db.query(Set.id).filter(Set.id == request.set_id).first():
+        raise HTTPException(status_code=404, detail="Set not found")
+    
+    session = LiveSessionManager.create(
+        set_id=request.set_id,
+        energy_direction=request.energy_direction,
+        target_energy=request.target_energy,
+        target_bpm=request.target_bpm,
+        excluded_track_ids=request.excluded_track_ids,
+        weights=ScoringPipeline.resolve_weights(db, request.user_id, request.event_type_id)
+    )
+    if request.set_id:
+        session.load_set(db)
+    if request.current_track_id:
+        try:
+            play_track(db, session, request.current_track_id)
+        except HTTPException:
+            LiveSessionManager.close(session.id)
+            raise
+    return session.state()
+
+@router.get("/sessions/{session_id}")
+async def get_live_session(session_id: str):
+    """Get a live session's history and current suggestions"""
+    return get_session_or_404(session_id).state()
+
+@router.post("/sessions/{session_id}/play")
+async def play_live_track(
+    session_id: str,
+    request: LivePlayRequest,
+    db: Session = Depends(get_db)
+):
+    """Mark a track as started and push the updated suggestions"""
+    session = get_session_or_404(session_id)
+    play_track(db, session, request.track_id)
+    await session.broadcast()
+    return session.state()
+
+@router.post("/sessions/{session_id}/settings")
+async def update_live_settings(session_id: str, request: LiveSessionSettings):
+    """Change energy direction or targets and re-rank the pool"""
+    session = get_session_or_404(session_id)
+    session.update_settings(
+        energy_direction=request.energy_direction,
+        target_energy=request.target_energy,
+        target_bpm=request.target_bpm
+    )
+    await session.broadcast()
+    return session.state()
+
+@router.post("/sessions/{session_id}/exclude")
+async def exclude_live_tracks(session_id: str, request: LiveExcludeRequest):
+    """Keep tracks out of this session's suggestions"""
+    session = get_session_or_404(session_id)
+    session.exclude(request.track_ids)
+    await session.broadcast()
+    return session.state()
+
+@router.delete("/sessions/{session_id}")
+async def close_live_session(session_id: str):
+    """End a live session and disconnect its listeners"""
+    session = get_session_or_404(session_id)
+    LiveSessionManager.close(session_id)
+    for websocket in list(session.subscribers):
+        try:
+            await websocket.close()
+        except Exception:
+            pass
+    return {"message": "Live session closed"}
+
+@router.websocket("/sessions/{session_id}/ws")
+async def live_session_socket(websocket: WebSocket, session_id: str):
+    """Receive state on connect and after every change
+
+    Clients may also send {"type": "play", "track_id": ...},
+    {"type": "exclude", "track_ids": [...]} or
+    {"type": "settings", "energy_direction": ..., ...}; anything else gets
+    an {"type": "error"} frame and the connection stays open.
+    """
+    session = LiveSessionManager.get(session_id)
+    if not session:
+        await websocket.close(code=4404)
+        return
+
+    await websocket.accept()
+    session.subscribers.add(websocket)
+    try:
+        await websocket.send_json({"type": "state", **session.state()})
+        while True:
+            try:
+                message = json.loads(await websocket.receive_text())
+            except (KeyError, ValueError):  # A binary frame has no text
+                message = None
+            if not isinstance(message, dict):
+                await websocket.send_json({"type": "error", "detail": "Messages must be JSON objects"})
+                continue
+            
+            session.touch()
+            kind = message.get("type")
+            try:
+                if kind == "play":
+                    request = LivePlayRequest.model_validate(message)
+                    db = SessionLocal()
+                    try:
+                        play_track(db, session, request.track_id)
+                    finally:
+                        db.close()
+                elif kind == "exclude":
+                    session.exclude(LiveExcludeRequest.model_validate(message).track_ids)
+                elif kind == "settings":
+                    settings = LiveSessionSettings.model_validate(message)
+                    session.update_settings(
+                        energy_direction=settings.energy_direction,
+                        target_energy=settings.target_energy,
+                        target_bpm=settings.target_bpm
+                    )
+                else:
+                    await websocket.send_json({"type": "error", "detail": f"Unknown message type: {kind}"})
+                    continue
+            except HTTPException as e:
+                await websocket.send_json({"type": "error", "detail": e.detail})
+                continue
+            except ValidationError as e:
+                await websocket.send_json({
+                    "type": "error",
+                    "detail": [{"loc": list(err["loc"]), "msg": err["msg"]} for err in e.errors()]
+                })
+                continue
+            await session.broadcast()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        session.subscribers.discard(websocket)
+        session.touch()  # The idle clock starts when the last listener leaves
@@ -1,39 +1,81 @@
 from fastapi import APIRouter, HTTPException, Depends
-from sqlalchemy.orm import Session
-from sqlalchemy import func
-from typing import List, Optional
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Dict, Optional, Any
 import uuid
 from datetime import datetime
 
-from app.database import get_db
+from app.database import get_async_db
 from app.models import Playlist, PlaylistTrack, Track
+from app.responses import FastJSONResponse
 from app.schemas import (
     PlaylistCreate, PlaylistUpdate, PlaylistResponse, PlaylistWithTracks,
     PlaylistTrackCreate, PlaylistTrackResponse,
     AddTracksToLocalPlaylistRequest, RemoveTracksFromLocalPlaylistRequest,
     ReorderLocalPlaylistRequest, DuplicatePlaylistRequest
 )
+from app.services.positions import Positions
+from app.services.track_serializer import TrackSerializer
 
 router = APIRouter()
 
-def get_playlist_track_count(db: Session, playlist_id: str) -> int:
+async def get_playlist_track_count(db: AsyncSession, playlist_id: str) -> int:
     """Get the count of tracks in a playlist"""
-    return db.query(PlaylistTrack).filter(PlaylistTrack.playlist_id == playlist_id).count()
+    return await db.scalar(
+        select(func.count()).select_from(PlaylistTrack).where(PlaylistTrack.playlist_id == playlist_id)
+    )
+
+ENTRY_FIELDS = ("id", "playlist_id", "track_id", "position", "added_at", "notes", "spotify_uri")
 
-def get_max_position(db: Session, playlist_id: str) -> int:
-    """Get the maximum position in a playlist"""
-    result = db.query(func.max(PlaylistTrack.position)).filter(
-        PlaylistTrack.playlist_id == playlist_id
-    ).scalar()
-    return result if result is not None else -1
+def playlist_track_response(pt: PlaylistTrack, track: Track, index: int) -> Dict[str, Any]:
+    """Response for a playlist entry at an index and its already-loaded track"""
+    entry = {name: getattr(pt, name) for name in ENTRY_FIELDS}
+    entry["position"] = index  # The stored position is only a sort key (see Positions)
+    entry["track"] = TrackSerializer.from_track(track)
+    return entry
+
+async def load_playlist_tracks(db: AsyncSession, playlist_id: str) -> List[Dict[str, Any]]:
+    """A playlist's entries in order with their tracks, in one query of plain columns"""
+    rows = (await db.execute(
+        select(
+            *[getattr(PlaylistTrack, name) for name in ENTRY_FIELDS],
+            *TrackSerializer.COLUMNS
+        ).join(
+            Track, Track.id == PlaylistTrack.track_id
+        ).where(
+            PlaylistTrack.playlist_id == playlist_id
+        ).order_by(PlaylistTrack.position)
+    )).all()
+    offset = len(ENTRY_FIELDS)
+    entries = []
+    for idx, row in enumerate(rows):
+        entry = dict(zip(ENTRY_FIELDS, row))
+        entry["position"] = idx
+        entry["track"] = TrackSerializer.row(row, offset=offset)
+        entries.append(entry)
+    return entries
+
+async def get_max_position(db: AsyncSession, playlist_id: str) -> Optional[int]:
+    """Get the largest stored position in a playlist (None when it is empty)"""
+    return await db.scalar(
+        select(func.max(PlaylistTrack.position)).where(PlaylistTrack.playlist_id == playlist_id)
+    )
 
 @router.get("", response_model=List[PlaylistResponse])
-async def get_all_playlists(db: Session = Depends(get_db)):
+async def get_all_playlists(db: AsyncSession = Depends(get_async_db)):
     """Get all local playlists"""
-    playlists = db.query(Playlist).order_by(Playlist.created_at.desc()).all()
+    # Track counts come from one grouped subquery rather than a COUNT per playlist
+    track_counts = select(
+        PlaylistTrack.playlist_id,
+        func.count().label("track_count")
+    ).group_by(PlaylistTrack.playlist_id).subquery()
+    rows = (await db.execute(
+        select(Playlist, func.coalesce(track_counts.c.track_count, 0)).outerjoin(
+            track_counts, track_counts.c.playlist_id == Playlist.id
+        ).order_by(Playlist.created_at.desc())
+    )).all()
     result = []
-    for playlist in playlists:
-        track_count = get_playlist_track_count(db, playlist.id)
+    for playlist, track_count in rows:
         playlist_dict = {
             "id": playlist.id,
             "name": playlist.name,
@@ -51,7 +93,7 @@ async def get_all_playlists(db: Session = Depends(get_db)):
 @router.post("", response_model=PlaylistResponse, status_code=201)
 async def create_playlist(
     playlist_data: PlaylistCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Create a new local playlist"""
     playlist = Playlist(
@@ -63,8 +105,8 @@ async def create_playlist(
         user_id=None  # For future multi-user support
     )
     db.add(playlist)
-    db.commit()
-    db.refresh(playlist)
+    await db.commit()
+    await db.refresh(playlist)
     
     return PlaylistResponse(
         id=playlist.id,
@@ -81,72 +123,37 @@ async def create_playlist(
 @router.get("/{playlist_id}", response_model=PlaylistWithTracks)
 async def get_playlist(
     playlist_id: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get a specific playlist with its tracks"""
-    playlist = db.query(Playlist).filter(Playlist.id == playlist_id).first()
+    playlist = await db.get(Playlist, playlist_id)
     if not playlist:
         raise HTTPException(status_code=404, detail="Playlist not found")
     
-    playlist_tracks = db.query(PlaylistTrack).filter(
-        PlaylistTrack.playlist_id == playlist_id
-    ).order_by(PlaylistTrack.position).all()
-    
-    track_responses = []
-    for pt in playlist_tracks:
-        track = db.query(Track).filter(Track.id == pt.track_id).first()
-        if track:
-            # Convert track to TrackResponse format
-            from app.schemas import TrackResponse
-            track_dict = {
-                "id": track.id,
-                "title": track.title,
-                "artist": track.artist,
-                "duration": track.duration,
-                "bpm": track.bpm,
-                "key": track.key,
-                "energy": track.energy,
-                "genre": track.genre,
-                "mood": track.mood,
-                "file_path": track.file_path,
-                "cover_art": track.cover_art,
-                "created_at": track.created_at,
-                "updated_at": track.updated_at,
-                "album_image_url": track.cover_art if track.cover_art and ("spotify" in track.cover_art.lower() or "scdn.co" in track.cover_art) else None,
-                "preview_url": None  # Would need to be stored separately
-            }
-            track_responses.append(PlaylistTrackResponse(
-                id=pt.id,
-                playlist_id=pt.playlist_id,
-                track_id=pt.track_id,
-                position=pt.position,
-                added_at=pt.added_at,
-                notes=pt.notes,
-                spotify_uri=pt.spotify_uri,
-                track=TrackResponse(**track_dict)
-            ))
-    
-    return PlaylistWithTracks(
-        id=playlist.id,
-        name=playlist.name,
-        description=playlist.description,
-        cover_art=playlist.cover_art,
-        is_public=playlist.is_public,
-        user_id=playlist.user_id,
-        track_count=len(track_responses),
-        created_at=playlist.created_at,
-        updated_at=playlist.updated_at,
-        playlist_tracks=track_responses
-    )
+    track_responses = await load_playlist_tracks(db, playlist_id)
+    
+    # Shaped like PlaylistWithTracks already, so it skips response validation
+    return FastJSONResponse({
+        "id": playlist.id,
+        "name": playlist.name,
+        "description": playlist.description,
+        "cover_art": playlist.cover_art,
+        "is_public": playlist.is_public,
+        "user_id": playlist.user_id,
+        "track_count": len(track_responses),
+        "created_at": playlist.created_at,
+        "updated_at": playlist.updated_at,
+        "playlist_tracks": track_responses
+    })
 
 @router.put("/{playlist_id}", response_model=PlaylistResponse)
 async def update_playlist(
     playlist_id: str,
     update_data: PlaylistUpdate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Update playlist metadata"""
-    playlist = db.query(Playlist).filter(Playlist.id == playlist_id).first()
+    playlist = await db.get(Playlist, playlist_id)
     if not playlist:
         raise HTTPException(status_code=404, detail="Playlist not found")
     
@@ -160,10 +167,10 @@ async def update_playlist(
         playlist.is_public = update_data.is_public
     
     playlist.updated_at = datetime.utcnow()
-    db.commit()
-    db.refresh(playlist)
+    await db.commit()
+    await db.refresh(playlist)
     
-    track_count = get_playlist_track_count(db, playlist.id)
+    track_count = await get_playlist_track_count(db, playlist.id)
     return PlaylistResponse(
         id=playlist.id,
         name=playlist.name,
@@ -179,99 +186,81 @@ async def update_playlist(
 @router.delete("/{playlist_id}", status_code=204)
 async def delete_playlist(
     playlist_id: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Delete a playlist"""
-    playlist = db.query(Playlist).filter(Playlist.id == playlist_id).first()
+    playlist = await db.get(Playlist, playlist_id)
     if not playlist:
         raise HTTPException(status_code=404, detail="Playlist not found")
     
-    db.delete(playlist)
-    db.commit()
+    await db.delete(playlist)
+    await db.commit()
     return None
 
 @router.get("/{playlist_id}/tracks", response_model=List[PlaylistTrackResponse])
 async def get_playlist_tracks(
     playlist_id: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get all tracks in a playlist"""
-    playlist = db.query(Playlist).filter(Playlist.id == playlist_id).first()
+    playlist = await db.get(Playlist, playlist_id)
     if not playlist:
         raise HTTPException(status_code=404, detail="Playlist not found")
     
-    playlist_tracks = db.query(PlaylistTrack).filter(
-        PlaylistTrack.playlist_id == playlist_id
-    ).order_by(PlaylistTrack.position).all()
-    
-    result = []
-    for pt in playlist_tracks:
-        track = db.query(Track).filter(Track.id == pt.track_id).first()
-        if track:
-            from app.schemas import TrackResponse
-            track_dict = {
-                "id": track.id,
-                "title": track.title,
-                "artist": track.artist,
-                "duration": track.duration,
-                "bpm": track.bpm,
-                "key": track.key,
-                "energy": track.energy,
-                "genre": track.genre,
-                "mood": track.mood,
-                "file_path": track.file_path,
-                "cover_art": track.cover_art,
-                "created_at": track.created_at,
-                "updated_at": track.updated_at,
-                "album_image_url": track.cover_art if track.cover_art and ("spotify" in track.cover_art.lower() or "scdn.co" in track.cover_art) else None,
-                "preview_url": None
-            }
-            result.append(PlaylistTrackResponse(
-                id=pt.id,
-                playlist_id=pt.playlist_id,
-                track_id=pt.track_id,
-                position=pt.position,
-                added_at=pt.added_at,
-                notes=pt.notes,
-                spotify_uri=pt.spotify_uri,
-                track=TrackResponse(**track_dict)
-            ))
-    
-    return result
+    return FastJSONResponse(await load_playlist_tracks(db, playlist_id))
 
 @router.post("/{playlist_id}/tracks", response_model=List[PlaylistTrackResponse])
 async def add_tracks_to_playlist(
     playlist_id: str,
     request: AddTracksToLocalPlaylistRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Add tracks to a playlist"""
-    playlist = db.query(Playlist).filter(Playlist.id == playlist_id).first()
+    """Add tracks to a playlist, at an index or (by default) the end"""
+    playlist = await db.get(Playlist, playlist_id)
     if not playlist:
         raise HTTPException(status_code=404, detail="Playlist not found")
     
-    # Get current max position
-    max_pos = get_max_position(db, playlist_id)
-    start_position = request.position if request.position is not None else max_pos + 1
+    # Requested tracks and the ones already in the playlist, one query each
+    tracks = {
+        track.id: track for track in await db.scalars(
+            select(Track).where(Track.id.in_(request.track_ids))
+        )
+    }
+    existing = set(await db.scalars(
+        select(PlaylistTrack.track_id).where(
+            PlaylistTrack.playlist_id == playlist_id,
+            PlaylistTrack.track_id.in_(list(tracks))
+        )
+    ))
     
-    added_tracks = []
-    for idx, track_id in enumerate(request.track_ids):
-        # Check if track exists
-        track = db.query(Track).filter(Track.id == track_id).first()
-        if not track:
+    to_add = []
+    for track_id in request.track_ids:
+        if track_id not in tracks:
             continue  # Skip non-existent tracks
         
-        # Check if track is already in playlist
-        existing = db.query(PlaylistTrack).filter(
-            PlaylistTrack.playlist_id == playlist_id,
-            PlaylistTrack.track_id == track_id
-        ).first()
-        if existing:
+        if track_id in existing:
             continue  # Skip duplicates
-        
+        existing.add(track_id)
+        to_add.append(tracks[track_id])
+    
+    # Keys between the new neighbours, so no existing entry is renumbered
+    # (unless they are out of room) and uq_playlist_position never collides
+    count = await get_playlist_track_count(db, playlist_id)
+    if request.position is None or request.position >= count:
+        start_index = count
+        positions = Positions.between(await get_max_position(db, playlist_id), None, len(to_add))
+    else:
+        start_index = max(request.position, 0)
+        positions, _ = await db.run_sync(
+            Positions.slots, PlaylistTrack.playlist_id, playlist_id, start_index, len(to_add)
+        )
+    
+    added_tracks = []
+    for track, position in zip(to_add, positions):
+        track_id = track.id
         # Get Spotify URI if available (check track metadata)
         spotify_uri = None
-        if track.cover_art and ("spotify" in track.cover_art.lower() or "scdn.co" in track.cover_art):
+        if track.album_image_url:
             # Try to construct Spotify URI from track ID if it looks like a Spotify ID
             if track.id and len(track.id) == 22 and track.id.replace('-', '').isalnum():
                 spotify_uri = f"spotify:track:{track.id}"
@@ -280,7 +269,7 @@ async def add_tracks_to_playlist(
             id=str(uuid.uuid4()),
             playlist_id=playlist_id,
             track_id=track_id,
-            position=start_position + idx,
+            position=position,
             notes=None,
             spotify_uri=spotify_uri
         )
@@ -288,123 +277,66 @@ async def add_tracks_to_playlist(
         added_tracks.append(playlist_track)
     
     playlist.updated_at = datetime.utcnow()
-    db.commit()
+    await db.commit()
     
     # Return the added tracks
-    result = []
-    for pt in added_tracks:
-        track = db.query(Track).filter(Track.id == pt.track_id).first()
-        if track:
-            from app.schemas import TrackResponse
-            track_dict = {
-                "id": track.id,
-                "title": track.title,
-                "artist": track.artist,
-                "duration": track.duration,
-                "bpm": track.bpm,
-                "key": track.key,
-                "energy": track.energy,
-                "genre": track.genre,
-                "mood": track.mood,
-                "file_path": track.file_path,
-                "cover_art": track.cover_art,
-                "created_at": track.created_at,
-                "updated_at": track.updated_at,
-                "album_image_url": track.cover_art if track.cover_art and ("spotify" in track.cover_art.lower() or "scdn.co" in track.cover_art) else None,
-                "preview_url": None
-            }
-            result.append(PlaylistTrackResponse(
-                id=pt.id,
-                playlist_id=pt.playlist_id,
-                track_id=pt.track_id,
-                position=pt.position,
-                added_at=pt.added_at,
-                notes=pt.notes,
-                spotify_uri=pt.spotify_uri,
-                track=TrackResponse(**track_dict)
-            ))
-    
-    return result
+    return [
+        playlist_track_response(pt, tracks[pt.track_id], start_index + idx)
+        for idx, pt in enumerate(added_tracks)
+    ]
 
 @router.delete("/{playlist_id}/tracks", status_code=204)
 async def remove_tracks_from_playlist(
     playlist_id: str,
     request: RemoveTracksFromLocalPlaylistRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Remove tracks from a playlist"""
-    playlist = db.query(Playlist).filter(Playlist.id == playlist_id).first()
+    playlist = await db.get(Playlist, playlist_id)
     if not playlist:
         raise HTTPException(status_code=404, detail="Playlist not found")
     
     # Remove tracks
-    for track_id in request.track_ids:
-        playlist_track = db.query(PlaylistTrack).filter(
+    to_remove = await db.scalars(
+        select(PlaylistTrack).where(
             PlaylistTrack.playlist_id == playlist_id,
-            PlaylistTrack.track_id == track_id
-        ).first()
-        if playlist_track:
-            db.delete(playlist_track)
-    
-    # Reorder remaining tracks
-    remaining_tracks = db.query(PlaylistTrack).filter(
-        PlaylistTrack.playlist_id == playlist_id
-    ).order_by(PlaylistTrack.position).all()
-    
-    for idx, pt in enumerate(remaining_tracks):
-        pt.position = idx
+            PlaylistTrack.track_id.in_(request.track_ids)
+        )
+    )
+    for playlist_track in to_remove:
+        await db.delete(playlist_track)
+    # The others keep their positions: gaps don't change the order
     
     playlist.updated_at = datetime.utcnow()
-    db.commit()
+    await db.commit()
     return None
 
 @router.put("/{playlist_id}/tracks/reorder", response_model=PlaylistWithTracks)
 async def reorder_playlist_tracks(
     playlist_id: str,
     request: ReorderLocalPlaylistRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Reorder tracks in a playlist"""
-    playlist = db.query(Playlist).filter(Playlist.id == playlist_id).first()
+    """Move a track to a new index in a playlist (one row updated)"""
+    playlist = await db.get(Playlist, playlist_id)
     if not playlist:
         raise HTTPException(status_code=404, detail="Playlist not found")
     
     # Find the track to move
-    track_to_move = db.query(PlaylistTrack).filter(
-        PlaylistTrack.playlist_id == playlist_id,
-        PlaylistTrack.track_id == request.track_id
-    ).first()
+    entry_id = await db.scalar(
+        select(PlaylistTrack.id).where(
+            PlaylistTrack.playlist_id == playlist_id,
+            PlaylistTrack.track_id == request.track_id
+        ).limit(1)
+    )
     
-    if not track_to_move:
+    if not entry_id:
         raise HTTPException(status_code=404, detail="Track not found in playlist")
     
-    old_position = track_to_move.position
-    new_position = request.new_position
-    
-    if old_position == new_position:
-        # No change needed
-        return await get_playlist(playlist_id, db)
-    
-    # Get all tracks
-    all_tracks = db.query(PlaylistTrack).filter(
-        PlaylistTrack.playlist_id == playlist_id
-    ).order_by(PlaylistTrack.position).all()
-    
-    # Reorder
-    if new_position < old_position:
-        # Moving up
-        for pt in all_tracks:
-            if pt.position >= new_position and pt.position < old_position:
-                pt.position += 1
-    else:
-        # Moving down
-        for pt in all_tracks:
-            if pt.position > old_position and pt.position <= new_position:
-                pt.position -= 1
-    
-    track_to_move.position = new_position
+    # A key between its new neighbours; the rest only move if they are out of room
+    await db.run_sync(Positions.move, PlaylistTrack.playlist_id, playlist_id, entry_id, request.new_position)
     playlist.updated_at = datetime.utcnow()
-    db.commit()
+    await db.commit()
     
     return await get_playlist(playlist_id, db)
 
@@ -412,10 +344,10 @@ async def reorder_playlist_tracks(
 async def duplicate_playlist(
     playlist_id: str,
     request: DuplicatePlaylistRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Duplicate a playlist"""
-    original = db.query(Playlist).filter(Playlist.id == playlist_id).first()
+    original = await db.get(Playlist, playlist_id)
     if not original:
         raise HTTPException(status_code=404, detail="Playlist not found")
     
@@ -430,28 +362,30 @@ async def duplicate_playlist(
         user_id=original.user_id
     )
     db.add(new_playlist)
-    db.flush()
+    await db.flush()
     
     # Copy tracks
-    original_tracks = db.query(PlaylistTrack).filter(
-        PlaylistTrack.playlist_id == playlist_id
-    ).order_by(PlaylistTrack.position).all()
+    original_tracks = (await db.scalars(
+        select(PlaylistTrack).where(
+            PlaylistTrack.playlist_id == playlist_id
+        ).order_by(PlaylistTrack.position)
+    )).all()
     
-    for idx, original_pt in enumerate(original_tracks):
+    for original_pt, position in zip(original_tracks, Positions.spaced(len(original_tracks))):
         new_pt = PlaylistTrack(
             id=str(uuid.uuid4()),
             playlist_id=new_playlist.id,
             track_id=original_pt.track_id,
-            position=idx,
+            position=position,
             notes=original_pt.notes,
             spotify_uri=original_pt.spotify_uri
         )
         db.add(new_pt)
     
-    db.commit()
-    db.refresh(new_playlist)
+    await db.commit()
+    await db.refresh(new_playlist)
     
-    track_count = get_playlist_track_count(db, new_playlist.id)
+    track_count = await get_playlist_track_count(db, new_playlist.id)
     return PlaylistResponse(
         id=new_playlist.id,
         name=new_playlist.name,
@@ -463,7 +397,3 @@ async def duplicate_playlist(
         created_at=new_playlist.created_at,
         updated_at=new_playlist.updated_at
     )
-
-
-
-
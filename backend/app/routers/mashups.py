@@ -0,0 +1,87 @@
+"""
+Mashup Router - 2- and 3-deck combinations that layer in tempo, key and energy
+"""
+
+from fastapi import APIRouter, HTTPException, Depends
+from sqlalchemy.orm import Session
+from typing import Optional
+
+from app.database import get_db
+from app.models import Track
+from app.services.mashups import MashupFinder
+from app.services.tempo_variants import TempoVariants
+
+router = APIRouter()
+
+def play_as(anchor: Track, track: Track) -> str:
+    """How a track is played against the first deck's tempo"""
+    effective = TempoVariants.effective_bpm(anchor.bpm, track.bpm)
+    if effective and track.bpm and effective > track.bpm:
+        return "double_time"
+    if effective and track.bpm and effective < track.bpm:
+        return "half_time"
+    return "native"
+
+@router.get("")
+async def find_mashups(
+    size: int = 2,
+    track_id: Optional[str] = None,
+    bpm_tolerance: Optional[float] = None,
+    energy_tolerance: Optional[float] = None,
+    skip: int = 0,
+    limit: int = 50,
+    db: Session = Depends(get_db)
+):
+    """Find tracks that can be layered together, best first
+
+    size is 2 or 3 decks; track_id restricts results to mashups containing
+    that track. bpm_tolerance is in percent (half/double time counts).
+    """
+    if track_id and not db.query(Track.id).filter(Track.id == track_id).first():
+        raise HTTPException(status_code=404, detail="Track not found")
+
+    try:
+        results, total = MashupFinder.search(
+            db,
+            size=size,
+            track_id=track_id,
+            bpm_tolerance=bpm_tolerance,
+            energy_tolerance=energy_tolerance
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    page = results[skip:skip + limit]
+    page_ids = {track_id for _, members in page for track_id in members}
+    tracks = {t.id: t for t in db.query(Track).filter(Track.id.in_(page_ids)).all()} if page_ids else {}
+
+    mashups = []
+    for score, members in page:
+        if not all(member in tracks for member in members):
+            continue
+        anchor = tracks[members[0]]
+        mashups.append({
+            "score": score,
+            "tracks": [
+                {
+                    "id": tracks[member].id,
+                    "title": tracks[member].title,
+                    "artist": tracks[member].artist,
+                    "bpm": tracks[member].bpm,
+                    "key": tracks[member].key,
+                    "energy": tracks[member].energy,
+                    "genre": tracks[member].genre,
+                    "play_as": play_as(anchor, tracks[member])
+                }
+                for member in members
+            ]
+        })
+
+    return {
+        "size": size,
+        "total": total,
+        "available": len(results),  # Ranked results kept (capped at MashupFinder.MAX_RESULTS)
+        "skip": skip,
+        "limit": limit,
+        "mashups": mashups
+    }
@@ -0,0 +1,99 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from typing import List, Dict
+
+from app.database import get_db
+from app.models import Track
+from app.services.mix_graph import MixGraph
+
+router = APIRouter()
+
+def get_track_summaries(db: Session, track_ids: List[str]) -> Dict[str, Dict]:
+    """Load display fields for a group of tracks in one query"""
+    tracks = db.query(Track).filter(Track.id.in_(track_ids)).all() if track_ids else []
+    return {
+        t.id: {
+            "id": t.id,
+            "title": t.title,
+            "artist": t.artist,
+            "bpm": t.bpm,
+            "key": t.key,
+            "energy": t.energy,
+            "genre": t.genre
+        }
+        for t in tracks
+    }
+
+@router.get("/stats")
+async def get_graph_stats(db: Session = Depends(get_db)):
+    """Get the size of the mixability graph"""
+    graph = MixGraph.get(db)
+    return {
+        "tracks": len(graph.track_ids),
+        "edges": graph.edge_count
+    }
+
+@router.get("/path")
+async def find_mix_path(
+    from_track_id: str,
+    to_track_id: str,
+    max_hops: int = 5,
+    min_score: float = 0.0,
+    min_key_score: float = 0.0,
+    db: Session = Depends(get_db)
+):
+    """Find a path from one track to another in at most max_hops transitions"""
+    graph = MixGraph.get(db)
+    if from_track_id not in graph.index or to_track_id not in graph.index:
+        raise HTTPException(status_code=404, detail="Track not found")
+    
+    path = graph.find_path(from_track_id, to_track_id, max_hops, min_score, min_key_score)
+    if path is None:
+        raise HTTPException(status_code=404, detail=f"No path within {max_hops} transitions")
+    
+    summaries = get_track_summaries(db, path)
+    return {
+        "transitions": len(path) - 1,
+        "path": [summaries[track_id] for track_id in path if track_id in summaries]
+    }
+
+@router.get("/reachable/{track_id}")
+async def get_reachable_tracks(
+    track_id: str,
+    max_hops: int = 3,
+    min_score: float = 0.4,
+    min_key_score: float = 0.8,
+    limit: int = 100,
+    db: Session = Depends(get_db)
+):
+    """Get all tracks reachable from a track with smooth transitions"""
+    graph = MixGraph.get(db)
+    if track_id not in graph.index:
+        raise HTTPException(status_code=404, detail="Track not found")
+    
+    reachable = graph.reachable(track_id, max_hops, min_score, min_key_score)
+    summaries = get_track_summaries(db, [t for t, _ in reachable[:limit]])
+    return {
+        "total": len(reachable),
+        "tracks": [
+            {**summaries[t], "hops": hops}
+            for t, hops in reachable[:limit] if t in summaries
+        ]
+    }
+
+@router.get("/bridges")
+async def get_bridge_tracks(
+    from_genre: str,
+    to_genre: str,
+    max_hops: int = 4,
+    limit: int = 20,
+    db: Session = Depends(get_db)
+):
+    """Get tracks that bridge a mix from one genre into another"""
+    graph = MixGraph.get(db)
+    bridges = graph.bridges(from_genre, to_genre, max_hops, limit)
+    summaries = get_track_summaries(db, [t for t, _ in bridges])
+    return [
+        {**summaries[t], "path_length": length}
+        for t, length in bridges if t in summaries
+    ]
@@ -0,0 +1,146 @@
+"""
+Scoring Router - Feature terms and per-user / per-event-type weight profiles
+"""
+
+from fastapi import APIRouter, HTTPException, Depends
+from sqlalchemy.orm import Session
+from typing import List, Optional
+import uuid
+from datetime import datetime
+
+from app.database import get_db
+from app.models import ScoringProfile, EventType
+from app.schemas import ScoringProfileCreate, ScoringProfileUpdate, ScoringProfileResponse
+from app.services.scoring_pipeline import ScoringPipeline
+from app.services.transition_training import TransitionTrainer
+
+router = APIRouter()
+
+def get_profile_or_404(db: Session, profile_id: str) -> ScoringProfile:
+    profile = db.query(ScoringProfile).filter(ScoringProfile.id == profile_id).first()
+    if not profile:
+        raise HTTPException(status_code=404, detail="Scoring profile not found")
+    return profile
+
+def validate_or_400(weights: dict) -> None:
+    try:
+        ScoringPipeline.validate(weights)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/terms")
+async def get_scoring_terms():
+    """List the feature terms, their default weights and the built-in presets"""
+    return {
+        "terms": ScoringPipeline.describe_terms(),
+        "presets": ScoringPipeline.PRESETS
+    }
+
+@router.get("/weights")
+async def get_effective_weights(
+    user_id: Optional[str] = None,
+    event_type_id: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """Get the weights suggestions would use for a user and/or event type"""
+    profile = ScoringPipeline.find_profile(db, user_id, event_type_id)
+    return {
+        "profile_id": profile.id if profile else None,
+        "weights": ScoringPipeline.resolve_weights(db, user_id, event_type_id)
+    }
+
+@router.post("/profiles", response_model=ScoringProfileResponse)
+async def create_profile(profile_data: ScoringProfileCreate, db: Session = Depends(get_db)):
+    """Create a weight profile for a user, an event type, both, or neither (global)"""
+    validate_or_400(profile_data.weights)
+
+    if profile_data.event_type_id:
+        if not db.query(EventType).filter(EventType.id == profile_data.event_type_id).first():
+            raise HTTPException(status_code=404, detail="Event type not found")
+
+    existing = db.query(ScoringProfile).filter(
+        ScoringProfile.user_id.is_(None) if profile_data.user_id is None
+        else ScoringProfile.user_id == profile_data.user_id,
+        ScoringProfile.event_type_id.is_(None) if profile_data.event_type_id is None
+        else ScoringProfile.event_type_id == profile_data.event_type_id
+    ).first()
+    if existing:
+        raise HTTPException(status_code=409, detail="A profile for this user and event type already exists")
+
+    profile = ScoringProfile(
+        id=str(uuid.uuid4()),
+        name=profile_data.name,
+        user_id=profile_data.user_id,
+        event_type_id=profile_data.event_type_id,
+        weights=profile_data.weights
+    )
+    db.add(profile)
+    db.commit()
+    db.refresh(profile)
+    return profile
+
+@router.post("/train")
+async def train_weights(
+    event_type_id: Optional[str] = None,
+    save: bool = False,
+    db: Session = Depends(get_db)
+):
+    """Learn pairwise weights from logged sets and performances
+
+    With save=true they replace the global profile (or the event type's),
+    but only if there are enough sets and they beat the default weights on
+    the held-out ones; otherwise not_saved_reason says why. Large histories
+    are better trained offline with `python -m app.services.transition_training`.
+    """
+    if event_type_id and not db.query(EventType).filter(EventType.id == event_type_id).first():
+        raise HTTPException(status_code=404, detail="Event type not found")
+
+    result = TransitionTrainer.train(db, event_type_id)
+    if not result["training_pairs"]:
+        raise HTTPException(status_code=400, detail="No logged set transitions to train on")
+    result["not_saved_reason"] = TransitionTrainer.save_rejection(result) if save else "save=false"
+    if result["not_saved_reason"] is None:
+        result["profile_id"] = TransitionTrainer.save(db, result).id
+    return result
+
+@router.get("/profiles", response_model=List[ScoringProfileResponse])
+async def get_profiles(
+    user_id: Optional[str] = None,
+    event_type_id: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """Get scoring profiles, optionally for one user or event type"""
+    query = db.query(ScoringProfile)
+    if user_id:
+        query = query.filter(ScoringProfile.user_id == user_id)
+    if event_type_id:
+        query = query.filter(ScoringProfile.event_type_id == event_type_id)
+    return query.order_by(ScoringProfile.created_at.desc()).all()
+
+@router.get("/profiles/{profile_id}", response_model=ScoringProfileResponse)
+async def get_profile(profile_id: str, db: Session = Depends(get_db)):
+    """Get a scoring profile"""
+    return get_profile_or_404(db, profile_id)
+
+@router.put("/profiles/{profile_id}", response_model=ScoringProfileResponse)
+async def update_profile(profile_id: str, profile_data: ScoringProfileUpdate, db: Session = Depends(get_db)):
+    """Rename a scoring profile or replace its weights"""
+    profile = get_profile_or_404(db, profile_id)
+
+    if profile_data.weights is not None:
+        validate_or_400(profile_data.weights)
+        profile.weights = profile_data.weights
+    if profile_data.name is not None:
+        profile.name = profile_data.name
+    profile.updated_at = datetime.utcnow()
+    db.commit()
+    db.refresh(profile)
+    return profile
+
+@router.delete("/profiles/{profile_id}")
+async def delete_profile(profile_id: str, db: Session = Depends(get_db)):
+    """Delete a scoring profile (its scope falls back to the default weights)"""
+    profile = get_profile_or_404(db, profile_id)
+    db.delete(profile)
+    db.commit()
+    return {"message": "Scoring profile deleted"}
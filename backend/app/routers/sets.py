@@ -1,16 +1,22 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 import uuid
 
-from app.database import get_db
+from app.database import get_async_db
 from app.models import Set, SetTrack, Track
-from app.schemas import SetCreate, SetResponse, SetWithTracks, SetTrackResponse
+from app.responses import FastJSONResponse
+from app.schemas import SetCreate, SetResponse, SetWithTracks, ReorderSetTrackRequest
+from app.services.positions import Positions
+from app.services.set_curves import SetCurves
+from app.services.set_report import SetReport
+from app.services.track_serializer import TrackSerializer
 
 router = APIRouter()
 
 @router.post("/", response_model=SetResponse)
-async def create_set(set_data: SetCreate, db: Session = Depends(get_db)):
+async def create_set(set_data: SetCreate, db: AsyncSession = Depends(get_async_db)):
     """Create a new DJ set"""
     db_set = Set(
         id=str(uuid.uuid4()),
@@ -20,92 +26,111 @@ async def create_set(set_data: SetCreate, db: Session = Depends(get_db)):
         duration=set_data.duration
     )
     db.add(db_set)
-    db.commit()
     
-    # Add tracks if provided
+    # Add tracks if provided (one lookup for all of them, one commit with the set)
     if set_data.track_ids:
-        for idx, track_id in enumerate(set_data.track_ids):
-            track = db.query(Track).filter(Track.id == track_id).first()
-            if track:
-                set_track = SetTrack(
-                    id=str(uuid.uuid4()),
-                    set_id=db_set.id,
-                    track_id=track_id,
-                    position=idx
-                )
-                db.add(set_track)
-        
-        db.commit()
+        found = set(await db.scalars(select(Track.id).where(Track.id.in_(set_data.track_ids))))
+        track_ids = [track_id for track_id in set_data.track_ids if track_id in found]
+        for track_id, position in zip(track_ids, Positions.spaced(len(track_ids))):
+            set_track = SetTrack(
+                id=str(uuid.uuid4()),
+                set_id=db_set.id,
+                track_id=track_id,
+                position=position
+            )
+            db.add(set_track)
     
-    db.refresh(db_set)
+    await db.commit()
+    await db.refresh(db_set)
     return db_set
 
 @router.get("/", response_model=List[SetResponse])
 async def get_sets(
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get all sets"""
-    sets = db.query(Set).offset(skip).limit(limit).all()
+    sets = (await db.scalars(select(Set).offset(skip).limit(limit))).all()
     return sets
 
 @router.get("/{set_id}", response_model=SetWithTracks)
-async def get_set(set_id: str, db: Session = Depends(get_db)):
+async def get_set(set_id: str, db: AsyncSession = Depends(get_async_db)):
     """Get a specific set with tracks"""
-    db_set = db.query(Set).filter(Set.id == set_id).first()
+    db_set = await db.get(Set, set_id)
     if not db_set:
         raise HTTPException(status_code=404, detail="Set not found")
     
-    set_tracks = db.query(SetTrack).filter(SetTrack.set_id == set_id).order_by(SetTrack.position).all()
+    # Entries and their tracks in one query of plain columns
+    entry_fields = ("id", "position", "transition_bpm", "transition_key", "notes")
+    rows = (await db.execute(
+        select(*[getattr(SetTrack, name) for name in entry_fields], *TrackSerializer.COLUMNS).join(
+            Track, Track.id == SetTrack.track_id
+        ).where(SetTrack.set_id == set_id).order_by(SetTrack.position)
+    )).all()
     
     tracks_data = []
-    for st in set_tracks:
-        track = db.query(Track).filter(Track.id == st.track_id).first()
-        if track:
-            tracks_data.append(SetTrackResponse(
-                id=st.id,
-                position=st.position,
-                track=track,
-                transition_bpm=st.transition_bpm,
-                transition_key=st.transition_key,
-                notes=st.notes
-            ))
+    for idx, row in enumerate(rows):
+        entry = dict(zip(entry_fields, row))
+        entry["position"] = idx  # The stored position is only a sort key
+        entry["track"] = TrackSerializer.row(row, offset=len(entry_fields))
+        tracks_data.append(entry)
     
-    return SetWithTracks(
-        **db_set.__dict__,
-        set_tracks=tracks_data
-    )
+    # Shaped like SetWithTracks already, so it skips response validation
+    return FastJSONResponse({
+        **{name: getattr(db_set, name) for name in SetResponse.model_fields},
+        "set_tracks": tracks_data
+    })
+
+@router.get("/{set_id}/report")
+async def get_set_report(set_id: str, db: AsyncSession = Depends(get_async_db)):
+    """Score every transition in a set and rank the problem ones"""
+    db_set = await db.get(Set, set_id)
+    if not db_set:
+        raise HTTPException(status_code=404, detail="Set not found")
+    
+    loaded = await db.run_sync(SetReport.load, set_id)
+    return {
+        "set_id": set_id,
+        **SetReport.build(loaded["rows"], loaded["target_curve"])
+    }
 
 @router.post("/{set_id}/tracks/{track_id}")
 async def add_track_to_set(
     set_id: str,
     track_id: str,
     position: int = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Add a track to a set"""
-    db_set = db.query(Set).filter(Set.id == set_id).first()
+    """Add a track to a set at an index (the end by default)"""
+    db_set = await db.get(Set, set_id)
     if not db_set:
         raise HTTPException(status_code=404, detail="Set not found")
     
-    track = db.query(Track).filter(Track.id == track_id).first()
+    track = await db.get(Track, track_id)
     if not track:
         raise HTTPException(status_code=404, detail="Track not found")
     
-    # If position not specified, add to end
+    # A key between the new neighbours; nothing else moves unless they are out of room
     if position is None:
-        max_position = db.query(SetTrack).filter(SetTrack.set_id == set_id).count()
-        position = max_position
+        last = await db.scalar(select(func.max(SetTrack.position)).where(SetTrack.set_id == set_id))
+        (key,), rebalanced = Positions.between(last, None), False
+    else:
+        (key,), rebalanced = await db.run_sync(Positions.slots, SetTrack.set_id, set_id, position)
     
     set_track = SetTrack(
         id=str(uuid.uuid4()),
         set_id=set_id,
         track_id=track_id,
-        position=position
+        position=key
     )
     db.add(set_track)
-    db.commit()
+    version = await db.run_sync(SetCurves.bump, set_id)
+    await db.commit()
+    if rebalanced:
+        SetCurves.invalidate(set_id)
+    else:
+        SetCurves.track_added(set_id, version, set_track, track)
     
     return {"message": "Track added to set", "set_track_id": set_track.id}
 
@@ -113,24 +138,51 @@ async def add_track_to_set(
 async def remove_track_from_set(
     set_id: str,
     track_id: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Remove a track from a set"""
-    set_track = db.query(SetTrack).filter(
-        SetTrack.set_id == set_id,
-        SetTrack.track_id == track_id
-    ).first()
+    set_track = await db.scalar(
+        select(SetTrack).where(
+            SetTrack.set_id == set_id,
+            SetTrack.track_id == track_id
+        ).limit(1)
+    )
     
     if not set_track:
         raise HTTPException(status_code=404, detail="Track not found in set")
     
-    db.delete(set_track)
-    db.commit()
+    set_track_id = set_track.id
+    await db.delete(set_track)
+    version = await db.run_sync(SetCurves.bump, set_id)
+    await db.commit()
+    SetCurves.track_removed(set_id, version, set_track_id)
     
     return {"message": "Track removed from set"}
 
-
-
-
-
-
+@router.put("/{set_id}/tracks/reorder")
+async def reorder_set_tracks(
+    set_id: str,
+    request: ReorderSetTrackRequest,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Move a track to a new index in a set (one row updated)"""
+    set_track_id = await db.scalar(
+        select(SetTrack.id).where(
+            SetTrack.set_id == set_id,
+            SetTrack.track_id == request.track_id
+        ).order_by(SetTrack.position).limit(1)
+    )
+    if not set_track_id:
+        raise HTTPException(status_code=404, detail="Track not found in set")
+    
+    count = await db.scalar(select(func.count()).select_from(SetTrack).where(SetTrack.set_id == set_id))
+    new_position = max(0, min(request.new_position, count - 1))
+    key, rebalanced = await db.run_sync(Positions.move, SetTrack.set_id, set_id, set_track_id, new_position)
+    version = await db.run_sync(SetCurves.bump, set_id)
+    await db.commit()
+    if rebalanced:
+        SetCurves.invalidate(set_id)
+    else:
+        SetCurves.track_moved(set_id, version, set_track_id, new_position, key)
+    
+    return {"message": "Track moved", "position": new_position}
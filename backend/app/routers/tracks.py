@@ -1,11 +1,19 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 import uuid
 
-from app.database import get_db
+from app.database import get_async_db
 from app.models import Track, TrackAnalysis
-from app.schemas import TrackCreate, TrackResponse, AnalysisRequest, AnalysisResponse
+from app.responses import FastJSONResponse
+from app.schemas import TrackCreate, TrackUpdate, TrackResponse, AnalysisRequest, AnalysisResponse
+from app.services.library_events import LibraryEvents
+from app.services.scoring_pipeline import ScoringPipeline
+from app.services.track_columns import TrackColumns
+from app.services.track_pages import TrackPages
+from app.services.track_search import TrackSearch
+from app.services.track_serializer import TrackSerializer
 
 # Optional import for audio analysis - only import if librosa is available
 try:
@@ -18,32 +26,28 @@ except ImportError:
 
 router = APIRouter()
 
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
 @router.post("/", response_model=TrackResponse)
-async def create_track(track: TrackCreate, db: Session = Depends(get_db)):
+async def create_track(track: TrackCreate, db: AsyncSession = Depends(get_async_db)):
     """Create a new track"""
     track_data = track.dict()
     # If album_image_url is provided but cover_art is not, use album_image_url as cover_art
     if track_data.get("album_image_url") and not track_data.get("cover_art"):
         track_data["cover_art"] = track_data["album_image_url"]
-    # Remove album_image_url from track_data as it's not a database field
+    # album_image_url itself is set from cover_art by the model
     track_data.pop("album_image_url", None)
-    # preview_url is now a database field, so keep it in track_data
     
     db_track = Track(
         id=str(uuid.uuid4()),
         **track_data
     )
     db.add(db_track)
-    db.commit()
-    db.refresh(db_track)
-    
-    # Add album_image_url to response if cover_art is from Spotify
-    track_dict = db_track.__dict__.copy()
-    track_dict.pop("_sa_instance_state", None)
-    if db_track.cover_art and ("i.scdn.co" in db_track.cover_art or "spotify" in db_track.cover_art.lower()):
-        track_dict["album_image_url"] = db_track.cover_art
-    # preview_url is now stored in the database, so it will be in track_dict automatically
-    return track_dict
+    await db.commit()
+    await db.refresh(db_track)
+    
+    await db.run_sync(LibraryEvents.track_created, db_track)
+    return TrackSerializer.from_track(db_track)
 
 @router.get("/", response_model=List[TrackResponse])
 async def get_tracks(
@@ -52,51 +56,81 @@ async def get_tracks(
     genre: str = None,
     min_bpm: float = None,
     max_bpm: float = None,
-    db: Session = Depends(get_db)
+    sort: Optional[str] = None,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get tracks with optional filters, a page at a time
+    
+    sort is bpm, energy, created_at (default) or title, prefixed with - for
+    descending. When there are more tracks the X-Next-Cursor header holds the
+    cursor for the next page. fields=id,title,bpm returns only those fields.
+    """
+    try:
+        tracks, next_cursor = await db.run_sync(
+            TrackPages.page, sort, cursor, limit, fields, skip, genre, min_bpm, max_bpm
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    # Already TrackResponse-shaped (or the requested subset of it): no per-row validation
+    headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else {}
+    return FastJSONResponse(tracks, headers=headers)
+
+@router.get("/search", response_model=List[TrackResponse])
+async def search_tracks(
+    q: str,
+    limit: int = TrackSearch.DEFAULT_LIMIT,
+    fields: Optional[str] = None,
+    min_bpm: Optional[float] = None,
+    max_bpm: Optional[float] = None,
+    key: Optional[str] = None,
+    min_energy: Optional[float] = None,
+    max_energy: Optional[float] = None,
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get all tracks with optional filters"""
-    query = db.query(Track)
-    
-    if genre:
-        query = query.filter(Track.genre == genre)
-    if min_bpm:
-        query = query.filter(Track.bpm >= min_bpm)
-    if max_bpm:
-        query = query.filter(Track.bpm <= max_bpm)
-    
-    tracks = query.offset(skip).limit(limit).all()
-    # Convert to dict and add album_image_url if cover_art is from Spotify
-    result = []
-    for track in tracks:
-        track_dict = track.__dict__.copy()
-        # Remove SQLAlchemy internal attributes
-        track_dict.pop("_sa_instance_state", None)
-        # If cover_art looks like a Spotify URL, also include it as album_image_url
-        if track.cover_art and ("i.scdn.co" in track.cover_art or "spotify" in track.cover_art.lower()):
-            track_dict["album_image_url"] = track.cover_art
-        result.append(track_dict)
-    return result
+    """Full-text search over title, artist, genre and mood, best matches first
+    
+    Every word matches as a prefix, accents ignored ("beyo" finds "Beyoncé").
+    key is a Camelot or musical key; fields as for GET /api/tracks/.
+    """
+    try:
+        tracks = await db.run_sync(
+            TrackSearch.search, q, limit, fields, min_bpm, max_bpm, key, min_energy, max_energy
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return FastJSONResponse(tracks)
 
 @router.get("/{track_id}", response_model=TrackResponse)
-async def get_track(track_id: str, db: Session = Depends(get_db)):
+async def get_track(track_id: str, db: AsyncSession = Depends(get_async_db)):
     """Get a specific track"""
-    track = db.query(Track).filter(Track.id == track_id).first()
+    row = (await db.execute(select(*TrackSerializer.COLUMNS).where(Track.id == track_id))).first()
+    if not row:
+        raise HTTPException(status_code=404, detail="Track not found")
+    return FastJSONResponse(TrackSerializer.row(row))
+
+@router.put("/{track_id}", response_model=TrackResponse)
+async def update_track(track_id: str, track_update: TrackUpdate, db: AsyncSession = Depends(get_async_db)):
+    """Update a track's metadata"""
+    track = await db.get(Track, track_id)
     if not track:
         raise HTTPException(status_code=404, detail="Track not found")
-    # Convert to dict and add album_image_url if cover_art is from Spotify
-    track_dict = track.__dict__.copy()
-    # Remove SQLAlchemy internal attributes
-    track_dict.pop("_sa_instance_state", None)
-    # If cover_art looks like a Spotify URL, also include it as album_image_url
-    if track.cover_art and ("i.scdn.co" in track.cover_art or "spotify" in track.cover_art.lower()):
-        track_dict["album_image_url"] = track.cover_art
-    return track_dict
+    
+    for field, value in track_update.dict(exclude_unset=True).items():
+        setattr(track, field, value)
+    await db.commit()
+    await db.refresh(track)
+    
+    await db.run_sync(LibraryEvents.track_updated, track)
+    return TrackSerializer.from_track(track)
 
 @router.post("/{track_id}/analyze", response_model=AnalysisResponse)
 async def analyze_track(
     track_id: str,
     analysis: AnalysisRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Analyze a track (BPM, key, energy)"""
     if not AUDIO_ANALYSIS_AVAILABLE:
@@ -105,7 +139,7 @@ async def analyze_track(
             detail="Audio analysis not available. Please install librosa and soundfile."
         )
     
-    track = db.query(Track).filter(Track.id == track_id).first()
+    track = await db.get(Track, track_id)
     if not track:
         raise HTTPException(status_code=404, detail="Track not found")
     
@@ -137,6 +171,8 @@ async def analyze_track(
         track.key = result.get("key")
     if "energy" in result:
         track.energy = result.get("energy")
+    if result.get("energy_envelope"):
+        track.energy_envelope = result["energy_envelope"]
     
     # Save analysis record
     db_analysis = TrackAnalysis(
@@ -147,8 +183,9 @@ async def analyze_track(
         confidence=result.get("confidence")
     )
     db.add(db_analysis)
-    db.commit()
-    db.refresh(db_analysis)
+    await db.commit()
+    await db.refresh(db_analysis)
+    await db.run_sync(LibraryEvents.track_updated, track)
     
     return AnalysisResponse(
         track_id=track_id,
@@ -160,55 +197,55 @@ async def analyze_track(
 @router.get("/{track_id}/compatible")
 async def get_compatible_tracks(
     track_id: str,
-    db: Session = Depends(get_db)
+    user_id: Optional[str] = None,
+    event_type_id: Optional[str] = None,
+    skip: int = 0,
+    limit: int = 50,
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get tracks compatible with current track"""
-    track = db.query(Track).filter(Track.id == track_id).first()
+    """Get tracks compatible with current track, best first, a page at a time
+    
+    Uses the "compatible" scoring preset (tight BPM and native key), or the
+    flow weights of a user's / event type's scoring profile if one is given.
+    """
+    track = await db.get(Track, track_id)
     if not track:
         raise HTTPException(status_code=404, detail="Track not found")
     
-    # Get all tracks
-    all_tracks = db.query(Track).filter(Track.id != track_id).all()
-    
-    compatible = []
-    for t in all_tracks:
-        score = 0.0
-        reasons = []
-        
-        # BPM compatibility
-        if track.bpm and t.bpm:
-            bpm_diff = abs(track.bpm - t.bpm)
-            if bpm_diff < 3:
-                score += 0.5
-                reasons.append("bpm_match")
-        
-        # Key compatibility
-        if track.key and t.key:
-            from app.services.harmonic_mixing import HarmonicMixingEngine
-            compat = HarmonicMixingEngine.get_compatible_keys(track.key)
-            if t.key in compat["perfect"] or t.key in compat["safe"]:
-                score += 0.5
-                reasons.append("key_compatible")
-        
-        if score > 0:
-            compatible.append({
-                "track": t,
-                "score": score,
-                "reasons": reasons
-            })
-    
-    compatible.sort(key=lambda x: x["score"], reverse=True)
-    return compatible
+    if user_id or event_type_id:
+        weights = await db.run_sync(ScoringPipeline.resolve_weights, user_id, event_type_id)
+    else:
+        weights = ScoringPipeline.PRESETS["compatible"]
+    
+    # Score the whole library at once from the columnar copy, then load only the page
+    skip, limit = max(skip, 0), max(limit, 0)
+    columns = await db.run_sync(TrackColumns.get)
+    ranked = ScoringPipeline.compile(weights).rank(track, columns, limit=skip + limit, min_score=0.0)[skip:]
+    rows = await db.execute(
+        select(*TrackSerializer.COLUMNS).where(Track.id.in_([columns.ids[i] for i, _, _ in ranked]))
+    )
+    tracks = {row.id: TrackSerializer.row(row) for row in rows}
+    
+    return FastJSONResponse([
+        {
+            "track": tracks[columns.ids[i]],
+            "score": score,
+            "reasons": reasons.split(", ") if reasons else []
+        }
+        for i, score, reasons in ranked
+        if columns.ids[i] in tracks
+    ])
 
 @router.delete("/{track_id}")
-async def delete_track(track_id: str, db: Session = Depends(get_db)):
+async def delete_track(track_id: str, db: AsyncSession = Depends(get_async_db)):
     """Delete a track"""
-    track = db.query(Track).filter(Track.id == track_id).first()
+    track = await db.get(Track, track_id)
     if not track:
         raise HTTPException(status_code=404, detail="Track not found")
     
-    db.delete(track)
-    db.commit()
+    await db.run_sync(LibraryEvents.track_deleted, track_id)
+    await db.delete(track)
+    await db.commit()
     return {"message": "Track deleted successfully"}
 
 
@@ -1,5 +1,6 @@
-from pydantic import BaseModel, Field
-from typing import Optional, List, Dict, Any
+from pydantic import BaseModel, Field, field_validator
+from typing import Optional, List, Dict, Any, Union
+import json
 from datetime import datetime
 
 class TrackBase(BaseModel):
@@ -18,6 +19,18 @@ class TrackBase(BaseModel):
 class TrackCreate(TrackBase):
     pass
 
+class TrackUpdate(BaseModel):
+    title: Optional[str] = None
+    artist: Optional[str] = None
+    duration: Optional[int] = None
+    bpm: Optional[float] = None
+    key: Optional[str] = None
+    energy: Optional[float] = None
+    genre: Optional[str] = None
+    mood: Optional[str] = None
+    cover_art: Optional[str] = None
+    preview_url: Optional[str] = None
+
 class TrackResponse(TrackBase):
     id: str
     created_at: datetime
@@ -59,12 +72,16 @@ class SetTrackResponse(BaseModel):
 class SetWithTracks(SetResponse):
     set_tracks: List[SetTrackResponse] = []
 
+class ReorderSetTrackRequest(BaseModel):
+    track_id: str
+    new_position: int
+
 class EventTypeBase(BaseModel):
     name: str
     description: Optional[str] = None
     min_bpm: float
     max_bpm: float
-    energy_curve: Optional[Dict[str, Any]] = None
+    energy_curve: Optional[Union[List[float], Dict[str, Any]]] = None
     genre_weighting: Optional[Dict[str, Any]] = None
     vocal_frequency: float = 0.5
     drop_intensity: float = 0.5
@@ -72,11 +89,32 @@ class EventTypeBase(BaseModel):
 class EventTypeCreate(EventTypeBase):
     pass
 
+class EventTypeUpdate(BaseModel):
+    name: Optional[str] = None
+    description: Optional[str] = None
+    min_bpm: Optional[float] = None
+    max_bpm: Optional[float] = None
+    energy_curve: Optional[Union[List[float], Dict[str, Any]]] = None
+    genre_weighting: Optional[Dict[str, Any]] = None
+    vocal_frequency: Optional[float] = None
+    drop_intensity: Optional[float] = None
+
 class EventTypeResponse(EventTypeBase):
     id: str
     created_at: datetime
     updated_at: Optional[datetime] = None
     
+    @field_validator("energy_curve", "genre_weighting", mode="before")
+    @classmethod
+    def parse_json_text(cls, value: Any) -> Any:
+        # The predefined event types store these JSON columns as JSON text
+        if isinstance(value, str):
+            try:
+                return json.loads(value)
+            except ValueError:
+                return None
+        return value
+    
     class Config:
         from_attributes = True
 
@@ -111,6 +149,8 @@ class FlowSuggestionRequest(BaseModel):
     target_energy: Optional[float] = None
     target_bpm: Optional[float] = None
     event_type_id: Optional[str] = None
+    energy_direction: str = "maintain"  # maintain, boost, drop
+    user_id: Optional[str] = None  # Picks up the user's scoring profile
 
 class FlowSuggestionResponse(BaseModel):
     track: TrackResponse
@@ -118,14 +158,64 @@ class FlowSuggestionResponse(BaseModel):
     reason: str
     transition_type: str
 
+class OptimizeJobRequest(BaseModel):
+    set_id: str
+    max_seconds: float = 10.0  # Search time budget, capped server-side
+
+class LiveSessionCreate(BaseModel):
+    set_id: Optional[str] = None
+    current_track_id: Optional[str] = None
+    energy_direction: str = "maintain"  # maintain, boost, drop
+    target_energy: Optional[float] = None
+    target_bpm: Optional[float] = None
+    excluded_track_ids: List[str] = []
+    user_id: Optional[str] = None
+    event_type_id: Optional[str] = None
+
+class LivePlayRequest(BaseModel):
+    track_id: str
+
+class LiveSessionSettings(BaseModel):
+    energy_direction: Optional[str] = None
+    target_energy: Optional[float] = None
+    target_bpm: Optional[float] = None
+
+class LiveExcludeRequest(BaseModel):
+    track_ids: List[str]
+
 class HarmonicCompatibilityRequest(BaseModel):
     track_id: str
     target_key: Optional[str] = None
+    include_risky: bool = True
+    bpm_tolerance: Optional[float] = None  # Only tracks within ± this many BPM
+    skip: int = 0
+    limit: int = 50
+
+class HarmonicTrackMatch(BaseModel):
+    track: TrackResponse
+    transition_type: str
+    compatibility_score: float
+    bpm_difference: Optional[float] = None
 
 class HarmonicCompatibilityResponse(BaseModel):
     compatible_keys: List[str]
     safe_transitions: List[str]
     modal_interchange: List[str]
+    total: int = 0
+    tracks: List[HarmonicTrackMatch] = []
+
+class KeyMatrixRequest(BaseModel):
+    from_keys: List[str]
+    to_keys: Optional[List[str]] = None  # Defaults to from_keys
+
+class KeyPathRequest(BaseModel):
+    from_key: Optional[str] = None
+    to_key: Optional[str] = None
+    from_track_id: Optional[str] = None  # Overrides from_key/start_energy
+    to_track_id: Optional[str] = None  # Overrides to_key/end_energy
+    start_energy: Optional[float] = None
+    end_energy: Optional[float] = None
+    tracks_per_key: int = 1
 
 # ============================================
 # DJ Intelligence Schemas
@@ -399,5 +489,67 @@ class ReorderLocalPlaylistRequest(BaseModel):
 class DuplicatePlaylistRequest(BaseModel):
     name: Optional[str] = None
 
+# ============================================
+# Smart Crate Schemas
+# ============================================
+
+class SmartCrateRules(BaseModel):
+    bpm_min: Optional[float] = None
+    bpm_max: Optional[float] = None
+    keys: List[str] = []  # Camelot or musical keys, e.g. ["8A", "9A"]
+    energy_min: Optional[float] = None
+    energy_max: Optional[float] = None
+    genres: List[str] = []  # Case-insensitive
+    moods: List[str] = []  # Case-insensitive
+    artists: List[str] = []  # Case-insensitive
+
+class SmartCrateCreate(BaseModel):
+    name: str
+    description: Optional[str] = None
+    rules: SmartCrateRules
+
+class SmartCrateUpdate(BaseModel):
+    name: Optional[str] = None
+    description: Optional[str] = None
+    rules: Optional[SmartCrateRules] = None
+
+class SmartCrateResponse(BaseModel):
+    id: str
+    name: str
+    description: Optional[str] = None
+    rules: SmartCrateRules
+    track_count: int = 0
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+    
+    class Config:
+        from_attributes = True
+
+# ============================================
+# Scoring Profile Schemas
+# ============================================
+
+class ScoringProfileCreate(BaseModel):
+    name: str
+    user_id: Optional[str] = None
+    event_type_id: Optional[str] = None
+    weights: Dict[str, float]  # Overrides on ScoringPipeline.DEFAULT_WEIGHTS
+
+class ScoringProfileUpdate(BaseModel):
+    name: Optional[str] = None
+    weights: Optional[Dict[str, float]] = None
+
+class ScoringProfileResponse(BaseModel):
+    id: str
+    name: str
+    user_id: Optional[str] = None
+    event_type_id: Optional[str] = None
+    weights: Dict[str, float]
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+    
+    class Config:
+        from_attributes = True
+
 
 
@@ -3,6 +3,11 @@ import openai
 from typing import List, Dict, Optional, Any
 from dotenv import load_dotenv
 
+from app.services.harmonic_mixing import HarmonicMixingEngine
+from app.services.scoring_pipeline import ScoringPipeline
+from app.services.track_columns import TrackColumns
+from app.services.transition_cache import TrackFeatures
+
 load_dotenv()
 
 class AIRecommendationEngine:
@@ -223,24 +228,21 @@ Return only the phrase, no quotes or explanation."""
         current_track: Dict[str, Any],
         available_tracks: List[Dict[str, Any]]
     ) -> List[Dict[str, Any]]:
-        """Fallback suggestion logic when AI fails"""
-        suggestions = []
-        current_bpm = current_track.get('bpm')
-        current_key = current_track.get('key')
-        
-        for track in available_tracks:
-            score = 0
-            if current_bpm and track.get('bpm'):
-                bpm_diff = abs(current_bpm - track.get('bpm', 0))
-                if bpm_diff < 5:
-                    score += 1
-            if current_key and track.get('key') == current_key:
-                score += 1
-            
-            if score > 0:
-                suggestions.append(track)
-        
-        return suggestions[:5]
+        """Fallback suggestion logic when AI fails (ScoringPipeline default weights)"""
+        current = TrackFeatures(
+            current_track.get('id'),
+            current_track.get('bpm'),
+            current_track.get('key_code', HarmonicMixingEngine.key_code(current_track.get('key'))),
+            current_track.get('energy'),
+            current_track.get('genre')
+        )
+        ranked = ScoringPipeline.compile().rank(
+            current,
+            TrackColumns.from_dicts(available_tracks),
+            limit=5,
+            min_score=0.0
+        )
+        return [available_tracks[i] for i, _, _ in ranked]
 
 
 
@@ -12,12 +12,16 @@ except ImportError:
     NUMPY_AVAILABLE = False
     np = None
 
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 import os
 
 class AudioAnalyzer:
     """Audio analysis service for BPM, key, and energy detection"""
     
+    # Samples in a track's energy envelope (whole track, low sample rate)
+    ENVELOPE_POINTS = 64
+    ENVELOPE_SAMPLE_RATE = 11025
+    
     @staticmethod
     def analyze_bpm(file_path: str) -> Dict[str, Any]:
         """Detect BPM using librosa"""
@@ -106,6 +110,7 @@ class AudioAnalyzer:
             
             return {
                 "energy": energy,
+                "energy_envelope": AudioAnalyzer.energy_envelope(file_path, energy),
                 "rms": rms_mean,
                 "brightness": centroid_mean,
                 "rhythmic_activity": zcr_mean,
@@ -118,6 +123,25 @@ class AudioAnalyzer:
                 "error": str(e)
             }
     
+    @staticmethod
+    def energy_envelope(file_path: str, energy: float) -> Optional[List[float]]:
+        """Energy over the whole track, scaled so its mean matches the track's energy"""
+        try:
+            y, _ = librosa.load(file_path, sr=AudioAnalyzer.ENVELOPE_SAMPLE_RATE)
+            rms = librosa.feature.rms(y=y)[0]
+            if len(rms) < AudioAnalyzer.ENVELOPE_POINTS:
+                return None
+            
+            segments = np.array_split(rms, AudioAnalyzer.ENVELOPE_POINTS)
+            levels = np.array([float(np.mean(s)) for s in segments])
+            if levels.mean() <= 0:
+                return None
+            
+            envelope = np.clip(levels / levels.mean() * energy, 0.0, 1.0)
+            return [round(float(v), 3) for v in envelope]
+        except Exception:
+            return None
+    
     @staticmethod
     def full_analysis(file_path: str) -> Dict[str, Any]:
         """Perform complete audio analysis"""
@@ -129,6 +153,7 @@ class AudioAnalyzer:
             "bpm": bpm_result.get("bpm"),
             "key": key_result.get("key"),
             "energy": energy_result.get("energy"),
+            "energy_envelope": energy_result.get("energy_envelope"),
             "confidence": (
                 bpm_result.get("confidence", 0) +
                 key_result.get("confidence", 0) +
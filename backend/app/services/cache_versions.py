@@ -0,0 +1,40 @@
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from app.models import CacheVersion
+
+
+class CacheVersions:
+    """Change counters shared by every worker process, kept in cache_versions
+
+    Anything a process mirrors in memory (library columns, the mix graph,
+    crate membership) remembers the counter it was built at and reloads when
+    the stored one has moved. Writers bump the counter in the same
+    transaction as their change, after writing it, so a reader can never
+    cache new data under an old version for long. Reading one is a
+    primary-key lookup.
+    """
+
+    LIBRARY = "library"
+    TRANSITIONS = "transitions"
+    CRATES = "crates"
+
+    @staticmethod
+    def get(db: Session, name: str) -> int:
+        return db.scalar(select(CacheVersion.version).where(CacheVersion.name == name)) or 0
+
+    @staticmethod
+    def bump(db: Session, name: str) -> int:
+        """Increment a counter (without committing) and return its new value"""
+        version = db.execute(
+            update(CacheVersion).where(CacheVersion.name == name)
+            .values(version=CacheVersion.version + 1)
+            .returning(CacheVersion.version)
+            .execution_options(synchronize_session=False)
+        ).scalar()
+        if version is None:
+            # Seeded by migration 0007; a database built some other way gets the row now
+            db.add(CacheVersion(name=name, version=1))
+            db.flush()
+            version = 1
+        return version
@@ -0,0 +1,251 @@
+import json
+import os
+from typing import List, Dict, Optional, Set, Tuple, Any
+
+from sqlalchemy import func, insert
+from sqlalchemy.orm import Session
+
+from app.models import Track, EventType, EventCandidate
+from app.services.set_report import SetReport
+from app.services.transition_cache import TransitionCache
+
+
+class EventPools:
+    """Precomputed, ranked candidate pools per event type
+
+    Each track is scored against an event profile's BPM range (counting
+    half/double time), genre weighting, energy curve and drop intensity.
+    The best POOL_SIZE tracks are stored in event_candidates and kept up to
+    date as tracks change, so set builders start from the pool instead of
+    filtering the whole library again. Tracks carry no vocal data, so the
+    profile's vocal_frequency is not scored.
+    """
+
+    POOL_SIZE = int(os.getenv("EVENT_POOL_SIZE", "500"))
+    # Tracks scoring below this fit the event too poorly to be candidates
+    MIN_SCORE = 0.3
+    # BPM distance outside the event range that still earns partial credit
+    BPM_MARGIN = 5.0
+    # Event types whose pool was built in this process (an empty pool may be legitimate)
+    _built: Set[str] = set()
+
+    @staticmethod
+    def profile(event_type: EventType) -> Dict[str, Any]:
+        """Normalize an event type's profile (JSON columns may hold JSON text)"""
+        weighting = event_type.genre_weighting
+        if isinstance(weighting, str):
+            try:
+                weighting = json.loads(weighting)
+            except ValueError:
+                weighting = None
+        weights = {
+            str(genre).lower(): float(weight)
+            for genre, weight in (weighting or {}).items()
+            if isinstance(weight, (int, float))
+        }
+        curve = SetReport.parse_energy_curve(event_type.energy_curve)
+
+        return {
+            "min_bpm": event_type.min_bpm,
+            "max_bpm": event_type.max_bpm,
+            "genre_weights": weights,
+            "energy_range": (min(curve), max(curve)) if curve else None,
+            "drop_intensity": event_type.drop_intensity
+        }
+
+    @staticmethod
+    def score_track(profile: Dict[str, Any], track) -> Tuple[float, List[str]]:
+        """Score how well a track fits an event profile"""
+        score = 0.0
+        reasons = []
+        min_bpm, max_bpm = profile["min_bpm"], profile["max_bpm"]
+
+        # BPM range, natively or at half/double time
+        if track.bpm:
+            tempos = ((track.bpm, ""), (track.bpm * 2, "double_time_"), (track.bpm / 2, "half_time_"))
+            in_range = next((prefix for bpm, prefix in tempos if min_bpm <= bpm <= max_bpm), None)
+            if in_range is not None:
+                score += 0.4
+                reasons.append(f"{in_range}bpm_in_range")
+            else:
+                distance = min(max(min_bpm - bpm, bpm - max_bpm) for bpm, _ in tempos)
+                if distance < EventPools.BPM_MARGIN:
+                    score += 0.2 * (1 - distance / EventPools.BPM_MARGIN)
+                    reasons.append("bpm_near_range")
+
+        # Genre weighting, relative to the profile's favourite genre
+        weights = profile["genre_weights"]
+        if weights:
+            weight = weights.get((track.genre or "").lower(), weights.get("other", 0.0))
+            if weight > 0:
+                score += 0.3 * weight / max(weights.values())
+                reasons.append("genre_weighted")
+
+        # Energy within the range the event's curve covers
+        if track.energy is not None:
+            energy_range = profile["energy_range"]
+            if energy_range and energy_range[0] <= track.energy <= energy_range[1]:
+                score += 0.2
+                reasons.append("energy_in_curve")
+
+            # High-drop events favour high-energy tracks, and vice versa
+            if profile["drop_intensity"] is not None:
+                fit = 1 - abs(track.energy - profile["drop_intensity"])
+                score += 0.1 * fit
+                if fit >= 0.8:
+                    reasons.append("drop_intensity_fit")
+
+        return score, reasons
+
+    @staticmethod
+    def _ranked(profile: Dict[str, Any], tracks: List[Any]) -> List[Dict[str, Any]]:
+        rows = []
+        for track in tracks:
+            score, reasons = EventPools.score_track(profile, track)
+            if score >= EventPools.MIN_SCORE:
+                rows.append({"track_id": track.id, "score": score, "reasons": ", ".join(reasons)})
+        rows.sort(key=lambda r: r["score"], reverse=True)
+        return rows[:EventPools.POOL_SIZE]
+
+    @staticmethod
+    def rebuild(db: Session, event_type: EventType) -> int:
+        """Rescore the library for one event type (after create or edit)"""
+        count = EventPools._replace(db, event_type)
+        db.commit()
+        EventPools._built.add(event_type.id)
+        return count
+
+    @staticmethod
+    def _replace(db: Session, event_type: EventType, exclude_id: Optional[str] = None) -> int:
+        """Rewrite one event type's pool from the library, without committing"""
+        rows = EventPools._ranked(
+            EventPools.profile(event_type),
+            TransitionCache.load_features(db, exclude_id=exclude_id)
+        )
+        db.query(EventCandidate).filter(
+            EventCandidate.event_type_id == event_type.id
+        ).delete(synchronize_session=False)
+        if rows:
+            db.execute(insert(EventCandidate), [{"event_type_id": event_type.id, **row} for row in rows])
+        return len(rows)
+
+    @staticmethod
+    def track_changed(db: Session, track: Track) -> None:
+        """Re-rank one created or re-analyzed track in every built pool"""
+        event_types = db.query(EventType).all()
+        if not event_types:
+            return
+
+        stats = {
+            event_type_id: (count, min_score)
+            for event_type_id, count, min_score in db.query(
+                EventCandidate.event_type_id,
+                func.count(EventCandidate.track_id),
+                func.min(EventCandidate.score)
+            ).group_by(EventCandidate.event_type_id).all()
+        }
+        existing = {
+            row.event_type_id: row
+            for row in db.query(EventCandidate).filter(EventCandidate.track_id == track.id).all()
+        }
+
+        stale = []
+        for event_type in event_types:
+            count, min_score = stats.get(event_type.id, (0, None))
+            if count == 0 and event_type.id not in EventPools._built:
+                continue  # Cold pool, built on first read
+
+            score, reasons = EventPools.score_track(EventPools.profile(event_type), track)
+            qualifies = score >= EventPools.MIN_SCORE
+            full = count >= EventPools.POOL_SIZE
+            row = existing.get(event_type.id)
+
+            if row is not None:
+                if full and (not qualifies or score < min_score):
+                    # An outsider may now outrank it
+                    stale.append(event_type)
+                elif not qualifies:
+                    db.delete(row)
+                else:
+                    row.score = score
+                    row.reasons = ", ".join(reasons)
+            elif qualifies and (not full or score > min_score):
+                if full:
+                    worst = db.query(EventCandidate).filter(
+                        EventCandidate.event_type_id == event_type.id
+                    ).order_by(EventCandidate.score).first()
+                    if worst:
+                        db.delete(worst)
+                    db.flush()
+                db.execute(insert(EventCandidate), [{
+                    "event_type_id": event_type.id,
+                    "track_id": track.id,
+                    "score": score,
+                    "reasons": ", ".join(reasons)
+                }])
+
+        db.commit()
+        for event_type in stale:
+            EventPools.rebuild(db, event_type)
+
+    @staticmethod
+    def track_removed(db: Session, track_id: str) -> None:
+        """Drop a track from every pool, refilling pools that were full
+
+        Called before the track row is deleted, so refills skip it
+        explicitly. Not committed: see LibraryEvents.track_deleted.
+        """
+        affected = [
+            row[0] for row in db.query(EventCandidate.event_type_id).filter(
+                EventCandidate.track_id == track_id
+            ).all()
+        ]
+        if not affected:
+            return
+
+        full = {
+            event_type_id
+            for event_type_id, count in db.query(
+                EventCandidate.event_type_id,
+                func.count(EventCandidate.track_id)
+            ).filter(
+                EventCandidate.event_type_id.in_(affected)
+            ).group_by(EventCandidate.event_type_id).all()
+            if count >= EventPools.POOL_SIZE
+        }
+        db.query(EventCandidate).filter(EventCandidate.track_id == track_id).delete(synchronize_session=False)
+
+        if full:
+            for event_type in db.query(EventType).filter(EventType.id.in_(full)).all():
+                EventPools._replace(db, event_type, exclude_id=track_id)
+
+    @staticmethod
+    def forget(db: Session, event_type_id: str) -> None:
+        db.query(EventCandidate).filter(
+            EventCandidate.event_type_id == event_type_id
+        ).delete(synchronize_session=False)
+        EventPools._built.discard(event_type_id)
+
+    @staticmethod
+    def get_pool(
+        db: Session,
+        event_type: EventType,
+        limit: Optional[int] = None,
+        exclude_ids: Optional[List[str]] = None
+    ) -> List[Tuple[Track, float, str]]:
+        """An event type's candidates, best first, building the pool on first use"""
+        query = db.query(Track, EventCandidate.score, EventCandidate.reasons).join(
+            EventCandidate, EventCandidate.track_id == Track.id
+        ).filter(
+            EventCandidate.event_type_id == event_type.id
+        )
+        if exclude_ids:
+            query = query.filter(Track.id.notin_(exclude_ids))
+        query = query.order_by(EventCandidate.score.desc(), Track.id)
+
+        rows = query.limit(limit).all() if limit else query.all()
+        if not rows and event_type.id not in EventPools._built:
+            EventPools.rebuild(db, event_type)
+            rows = query.limit(limit).all() if limit else query.all()
+
+        return [(track, score, reasons) for track, score, reasons in rows]
@@ -1,5 +1,9 @@
 from typing import List, Dict, Optional, Tuple
 from app.models import Track
+from app.services.harmonic_mixing import HarmonicMixingEngine
+from app.services.scoring_pipeline import ScoringPipeline
+from app.services.tempo_variants import TempoVariants
+from app.services.track_columns import TrackColumns
 
 class FlowEngine:
     """BPM flow and energy management engine"""
@@ -40,77 +44,123 @@ class FlowEngine:
             "recommended": abs_diff < 5
         }
     
+    @staticmethod
+    def score_transition(
+        current_track: Track,
+        track: Track,
+        energy_direction: str = "maintain"
+    ) -> Tuple[float, List[str]]:
+        """Score the pairwise part of a transition (BPM, key, energy, genre)
+        
+        Scalar form of ScoringPipeline's default weights, for callers that
+        score one pair at a time (transition cache, set optimization).
+        """
+        weights = ScoringPipeline.DEFAULT_WEIGHTS
+        score = 0.0
+        reasons = []
+        
+        # BPM compatibility, counting half/double time as the same tempo
+        effective_bpm = TempoVariants.effective_bpm(current_track.bpm, track.bpm)
+        if current_track.bpm and track.bpm:
+            bpm_transition = FlowEngine.calculate_bpm_transition(
+                current_track.bpm,
+                effective_bpm
+            )
+            tempo_reason = "half_time_" if effective_bpm < track.bpm else "double_time_" if effective_bpm > track.bpm else ""
+            if bpm_transition["recommended"]:
+                score += weights["bpm"]
+                reasons.append(f"{tempo_reason}smooth_bpm")
+            elif bpm_transition["difficulty"] == "medium":
+                score += weights["bpm"] / 2
+                reasons.append(f"{tempo_reason}moderate_bpm")
+        
+        # Harmonic compatibility (table lookup), including the key the track
+        # lands in once pitched to the current tempo with key lock off
+        key_score, pitch_shift = TempoVariants.best_key_score(
+            current_track.key_code,
+            track.key_code,
+            current_track.bpm,
+            effective_bpm
+        )
+        pitch_reason = "pitched_" if pitch_shift else ""
+        if key_score >= 0.8:
+            score += weights["key"]
+            reasons.append(f"{pitch_reason}harmonic_match")
+        elif key_score >= 0.5:
+            score += weights["key"] / 2
+            reasons.append(f"{pitch_reason}harmonic_risky")
+        
+        # Energy compatibility
+        if current_track.energy and track.energy:
+            energy_diff = track.energy - current_track.energy
+            
+            if energy_direction == "maintain":
+                if abs(energy_diff) < 0.1:
+                    score += weights["energy"]
+                    reasons.append("matched_energy")
+            elif energy_direction == "boost":
+                if 0.1 <= energy_diff <= 0.3:
+                    score += weights["energy"]
+                    reasons.append("energy_boost")
+            elif energy_direction == "drop":
+                if -0.3 <= energy_diff <= -0.1:
+                    score += weights["energy"]
+                    reasons.append("energy_drop")
+        
+        # Genre consistency (bonus)
+        if current_track.genre and track.genre:
+            if current_track.genre == track.genre:
+                score += weights["genre"]
+                reasons.append("same_genre")
+        
+        return score, reasons
+    
+    @staticmethod
+    def score_targets(
+        track: Track,
+        target_energy: Optional[float] = None,
+        target_bpm: Optional[float] = None
+    ) -> Tuple[float, List[str]]:
+        """Score how well a candidate hits the requested energy/BPM targets"""
+        weights = ScoringPipeline.DEFAULT_WEIGHTS
+        score = 0.0
+        reasons = []
+        
+        # Target energy match
+        if target_energy and track.energy:
+            if abs(track.energy - target_energy) < 0.15:
+                score += weights["target_energy"]
+                reasons.append("target_energy")
+        
+        # Target BPM match
+        if target_bpm and track.bpm:
+            if abs(track.bpm - target_bpm) < 3:
+                score += weights["target_bpm"]
+                reasons.append("target_bpm")
+        
+        return score, reasons
+    
     @staticmethod
     def suggest_next_track(
         current_track: Track,
         available_tracks: List[Track],
         target_energy: Optional[float] = None,
         target_bpm: Optional[float] = None,
-        energy_direction: str = "maintain"  # "maintain", "boost", "drop"
+        energy_direction: str = "maintain",  # "maintain", "boost", "drop"
+        weights: Optional[Dict[str, float]] = None
     ) -> List[Tuple[Track, float, str]]:
-        """Suggest next tracks with compatibility scores"""
-        suggestions = []
-        
-        for track in available_tracks:
-            if track.id == current_track.id:
-                continue
-            
-            score = 0.0
-            reasons = []
-            
-            # BPM compatibility
-            if current_track.bpm and track.bpm:
-                bpm_transition = FlowEngine.calculate_bpm_transition(
-                    current_track.bpm,
-                    track.bpm
-                )
-                if bpm_transition["recommended"]:
-                    score += 0.4
-                    reasons.append("smooth_bpm")
-                elif bpm_transition["difficulty"] == "medium":
-                    score += 0.2
-                    reasons.append("moderate_bpm")
-            
-            # Energy compatibility
-            if current_track.energy and track.energy:
-                energy_diff = track.energy - current_track.energy
-                
-                if energy_direction == "maintain":
-                    if abs(energy_diff) < 0.1:
-                        score += 0.3
-                        reasons.append("matched_energy")
-                elif energy_direction == "boost":
-                    if 0.1 <= energy_diff <= 0.3:
-                        score += 0.3
-                        reasons.append("energy_boost")
-                elif energy_direction == "drop":
-                    if -0.3 <= energy_diff <= -0.1:
-                        score += 0.3
-                        reasons.append("energy_drop")
-            
-            # Target energy match
-            if target_energy and track.energy:
-                if abs(track.energy - target_energy) < 0.15:
-                    score += 0.2
-                    reasons.append("target_energy")
-            
-            # Target BPM match
-            if target_bpm and track.bpm:
-                if abs(track.bpm - target_bpm) < 3:
-                    score += 0.1
-                    reasons.append("target_bpm")
-            
-            # Genre consistency (bonus)
-            if current_track.genre and track.genre:
-                if current_track.genre == track.genre:
-                    score += 0.1
-                    reasons.append("same_genre")
-            
-            suggestions.append((track, score, ", ".join(reasons)))
+        """Suggest next tracks with compatibility scores
         
-        # Sort by score descending
-        suggestions.sort(key=lambda x: x[1], reverse=True)
-        return suggestions
+        Scores every candidate at once with ScoringPipeline (default weights
+        unless a profile's weights are passed in).
+        """
+        columns = TrackColumns.from_tracks(available_tracks)
+        ranked = ScoringPipeline.compile(weights).rank(
+            current_track,
+            columns,
+            {"energy_direction": energy_direction, "target_energy": target_energy, "target_bpm": target_bpm}
+        )
+        return [(available_tracks[i], score, reasons) for i, score, reasons in ranked]
     
     @staticmethod
     def build_energy_curve(
@@ -147,8 +197,15 @@ class FlowEngine:
         return drops
     
     @staticmethod
-    def optimize_set_order(tracks: List[Track]) -> List[Track]:
-        """Optimize track order for smooth flow"""
+    def optimize_set_order(
+        tracks: List[Track],
+        pair_scores: Optional[Dict[Tuple[str, str], float]] = None
+    ) -> List[Track]:
+        """Optimize track order for smooth flow
+        
+        pair_scores maps (from_id, to_id) to a precomputed transition score;
+        pairs missing from it are scored on the fly.
+        """
         if not tracks:
             return []
         
@@ -159,19 +216,20 @@ class FlowEngine:
         
         while remaining:
             current = optimized[-1]
-            suggestions = FlowEngine.suggest_next_track(
-                current,
-                remaining,
-                energy_direction="maintain"
-            )
+            best_track = None
+            best_score = None
+            
+            for track in remaining:
+                if pair_scores is not None and (current.id, track.id) in pair_scores:
+                    score = pair_scores[(current.id, track.id)]
+                else:
+                    score, _ = FlowEngine.score_transition(current, track)
+                if best_score is None or score > best_score:
+                    best_track = track
+                    best_score = score
             
-            if suggestions:
-                next_track = suggestions[0][0]
-                optimized.append(next_track)
-                remaining.remove(next_track)
-            else:
-                # Fallback: add remaining track
-                optimized.append(remaining.pop(0))
+            optimized.append(best_track)
+            remaining.remove(best_track)
         
         return optimized
 
@@ -1,4 +1,7 @@
-from typing import List, Dict, Tuple
+import heapq
+from typing import List, Dict, Tuple, Optional
+
+import numpy as np
 
 class HarmonicMixingEngine:
     """Camelot wheel harmonic mixing system"""
@@ -13,10 +16,63 @@ class HarmonicMixingEngine:
         "G#m": "1A", "D#m": "2A", "A#m": "3A", "Fm": "4A", "Cm": "5A", "Gm": "6A", "Dm": "7A"
     }
     
+    # All 24 Camelot codes: 1A-12A then 1B-12B
+    CAMELOT_KEYS = [f"{n}A" for n in range(1, 13)] + [f"{n}B" for n in range(1, 13)]
+    
+    # Transition types by integer code, as stored in TRANSITION_TYPE_TABLE
+    TRANSITION_TYPES = ["perfect", "smooth", "risky", "clash"]
+    TRANSITION_SCORES = {
+        "perfect": 1.0,
+        "smooth": 0.8,
+        "risky": 0.5,
+        "clash": 0.2,
+        "unknown": 0.0
+    }
+    
+    # 24x24 lookup tables indexed by key code, filled in at import time below
+    TRANSITION_TYPE_TABLE: np.ndarray = None
+    COMPATIBILITY_TABLE: np.ndarray = None
+    MODAL_INTERCHANGE_TABLE: np.ndarray = None
+    
+    # Extra cost per key change on a route, so shorter routes win ties
+    KEY_STEP_COST = 0.1
+    
+    # Precomputed key graph: key -> [(neighbour, cost)], built on first use
+    _key_graph: Optional[Dict[str, List[Tuple[str, float]]]] = None
+    _key_routes: Dict[str, Dict[str, Tuple[float, Optional[str]]]] = {}
+    
+    @staticmethod
+    def to_camelot(key: Optional[str]) -> Optional[str]:
+        """Normalize a musical key ("Am") or Camelot code ("8a") to a Camelot code"""
+        if not key:
+            return None
+        key = key.strip()
+        if key in HarmonicMixingEngine.CAMELOT_WHEEL:
+            return HarmonicMixingEngine.CAMELOT_WHEEL[key]
+        code = key.upper()
+        if code in HarmonicMixingEngine.CAMELOT_KEYS:
+            return code
+        return None
+    
+    @staticmethod
+    def key_code(key: Optional[str]) -> Optional[int]:
+        """Encode a key as 0-23 (1A-12A -> 0-11, 1B-12B -> 12-23)"""
+        code = HarmonicMixingEngine.to_camelot(key)
+        if code is None:
+            return None
+        return HarmonicMixingEngine.CAMELOT_KEYS.index(code)
+    
+    @staticmethod
+    def key_from_code(code: Optional[int]) -> Optional[str]:
+        """Decode a 0-23 key code back to its Camelot code"""
+        if code is None or not 0 <= code < 24:
+            return None
+        return HarmonicMixingEngine.CAMELOT_KEYS[code]
+    
     @staticmethod
     def get_compatible_keys(camelot_key: str) -> Dict[str, List[str]]:
         """Get all compatible keys for a given Camelot key"""
-        if not camelot_key or len(camelot_key) < 2:
+        if not camelot_key or len(camelot_key) < 2 or not camelot_key[:-1].isdigit():
             return {"perfect": [], "safe": [], "risky": []}
         
         number = int(camelot_key[:-1])
@@ -72,40 +128,48 @@ class HarmonicMixingEngine:
         if not from_key or not to_key:
             return "unknown"
         
-        compat = HarmonicMixingEngine.get_compatible_keys(from_key)
-        
-        if to_key in compat["perfect"]:
-            return "perfect"
-        elif to_key in compat["safe"]:
-            return "smooth"
-        elif to_key in compat["risky"]:
-            return "risky"
-        else:
+        from_code = HarmonicMixingEngine.key_code(from_key)
+        to_code = HarmonicMixingEngine.key_code(to_key)
+        if from_code is None or to_code is None:
             return "clash"
+        
+        return HarmonicMixingEngine.TRANSITION_TYPES[
+            HarmonicMixingEngine.TRANSITION_TYPE_TABLE[from_code, to_code]
+        ]
     
     @staticmethod
     def calculate_compatibility_score(from_key: str, to_key: str) -> float:
         """Calculate compatibility score (0.0 - 1.0)"""
         transition_type = HarmonicMixingEngine.get_transition_type(from_key, to_key)
-        
-        scores = {
-            "perfect": 1.0,
-            "smooth": 0.8,
-            "risky": 0.5,
-            "clash": 0.2,
-            "unknown": 0.0
-        }
-        
-        return scores.get(transition_type, 0.0)
+        return HarmonicMixingEngine.TRANSITION_SCORES.get(transition_type, 0.0)
+    
+    @staticmethod
+    def score_key_codes(from_code: Optional[int], to_code: Optional[int]) -> float:
+        """Compatibility score for two encoded keys (0.0 if either is unknown)"""
+        if from_code is None or to_code is None:
+            return 0.0
+        return float(HarmonicMixingEngine.COMPATIBILITY_TABLE[from_code, to_code])
+    
+    @staticmethod
+    def score_matrix(from_codes: np.ndarray, to_codes: np.ndarray) -> np.ndarray:
+        """Score every pair of encoded keys at once; -1 codes score 0.0"""
+        from_codes = np.asarray(from_codes, dtype=np.int64)
+        to_codes = np.asarray(to_codes, dtype=np.int64)
+        scores = HarmonicMixingEngine.COMPATIBILITY_TABLE[np.ix_(
+            np.clip(from_codes, 0, 23), np.clip(to_codes, 0, 23)
+        )]
+        known = (from_codes >= 0)[:, None] & (to_codes >= 0)[None, :]
+        return np.where(known, scores, 0.0)
     
     @staticmethod
     def get_modal_interchange_suggestions(key: str) -> List[str]:
-        """Get modal interchange suggestions for creative mixing"""
-        if not key or len(key) < 2:
+        """Get modal interchange suggestions for creative mixing ([] for an unknown key)"""
+        code = HarmonicMixingEngine.key_code(key)
+        if code is None:
             return []
         
-        number = int(key[:-1])
-        mode = key[-1]
+        number = code % 12 + 1
+        mode = "A" if code < 12 else "B"
         
         # Parallel modes (same root, different mode)
         opposite_mode = "A" if mode == "B" else "B"
@@ -125,6 +189,101 @@ class HarmonicMixingEngine:
             f"{subdominant}{opposite_mode}",
             f"{dominant}{opposite_mode}"
         ]
+    
+    @staticmethod
+    def get_key_graph() -> Dict[str, List[Tuple[str, float]]]:
+        """24-node key graph weighted by 1 - compatibility score (clashes excluded)"""
+        if HarmonicMixingEngine._key_graph is None:
+            graph = {}
+            for from_key in HarmonicMixingEngine.CAMELOT_KEYS:
+                edges = []
+                for to_key in HarmonicMixingEngine.CAMELOT_KEYS:
+                    if to_key == from_key:
+                        continue
+                    score = float(HarmonicMixingEngine.COMPATIBILITY_TABLE[
+                        HarmonicMixingEngine.key_code(from_key),
+                        HarmonicMixingEngine.key_code(to_key)
+                    ])
+                    if score >= 0.5:
+                        edges.append((to_key, 1.0 - score + HarmonicMixingEngine.KEY_STEP_COST))
+                graph[from_key] = edges
+            HarmonicMixingEngine._key_graph = graph
+        return HarmonicMixingEngine._key_graph
+    
+    @staticmethod
+    def _routes_from(from_key: str) -> Dict[str, Tuple[float, Optional[str]]]:
+        """Dijkstra from one key to all others, memoized per source key"""
+        if from_key not in HarmonicMixingEngine._key_routes:
+            graph = HarmonicMixingEngine.get_key_graph()
+            routes = {from_key: (0.0, None)}
+            heap = [(0.0, from_key)]
+            while heap:
+                cost, key = heapq.heappop(heap)
+                if cost > routes[key][0]:
+                    continue
+                for neighbour, edge_cost in graph[key]:
+                    total = cost + edge_cost
+                    if neighbour not in routes or total < routes[neighbour][0]:
+                        routes[neighbour] = (total, key)
+                        heapq.heappush(heap, (total, neighbour))
+            HarmonicMixingEngine._key_routes[from_key] = routes
+        return HarmonicMixingEngine._key_routes[from_key]
+    
+    @staticmethod
+    def find_key_path(from_key: str, to_key: str) -> Optional[Dict]:
+        """Cheapest multi-step route around the Camelot wheel between two keys"""
+        from_code = HarmonicMixingEngine.to_camelot(from_key)
+        to_code = HarmonicMixingEngine.to_camelot(to_key)
+        if not from_code or not to_code:
+            return None
+        
+        routes = HarmonicMixingEngine._routes_from(from_code)
+        if to_code not in routes:
+            return None
+        
+        keys = [to_code]
+        while routes[keys[-1]][1] is not None:
+            keys.append(routes[keys[-1]][1])
+        keys.reverse()
+        
+        return {
+            "keys": keys,
+            "cost": round(routes[to_code][0], 3),
+            "transitions": [
+                {
+                    "from_key": a,
+                    "to_key": b,
+                    "transition_type": HarmonicMixingEngine.get_transition_type(a, b),
+                    "compatibility_score": HarmonicMixingEngine.calculate_compatibility_score(a, b)
+                }
+                for a, b in zip(keys, keys[1:])
+            ]
+        }
+
+
+def _build_key_tables() -> None:
+    """Precompute the 24x24 transition, score and modal interchange tables"""
+    engine = HarmonicMixingEngine
+    type_codes = {name: i for i, name in enumerate(engine.TRANSITION_TYPES)}
+    types = np.full((24, 24), type_codes["clash"], dtype=np.int8)
+    modal = np.zeros((24, 24), dtype=bool)
+    
+    for from_code, from_key in enumerate(engine.CAMELOT_KEYS):
+        compat = engine.get_compatible_keys(from_key)
+        # Apply in reverse priority so "perfect" wins when a key appears twice
+        for name, keys in (("risky", compat["risky"]), ("smooth", compat["safe"]), ("perfect", compat["perfect"])):
+            for key in keys:
+                types[from_code, engine.CAMELOT_KEYS.index(key)] = type_codes[name]
+        for key in engine.get_modal_interchange_suggestions(from_key):
+            modal[from_code, engine.CAMELOT_KEYS.index(key)] = True
+    
+    scores = np.array([engine.TRANSITION_SCORES[name] for name in engine.TRANSITION_TYPES], dtype=np.float64)
+    engine.TRANSITION_TYPE_TABLE = types
+    engine.COMPATIBILITY_TABLE = scores[types]
+    engine.MODAL_INTERCHANGE_TABLE = modal
+
+
+_build_key_tables()
 
 
 
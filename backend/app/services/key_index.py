@@ -0,0 +1,96 @@
+from bisect import bisect_left
+from typing import List, Dict, Optional, Set, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.models import Track
+from app.services.harmonic_mixing import HarmonicMixingEngine
+from app.services.library_events import LibraryEvents
+
+
+class KeyIndex:
+    """In-memory index of the library by Camelot key, sorted by energy
+
+    Reloaded whenever LibraryEvents reports a track insert, re-analysis or
+    delete.
+    """
+
+    _cached: Optional["KeyIndex"] = None
+    _cached_version: Optional[int] = None
+
+    def __init__(self, rows: List[Tuple[str, Optional[int], Optional[float]]]):
+        buckets: Dict[str, List[Tuple[float, str]]] = {}
+        for track_id, key_code, energy in rows:
+            code = HarmonicMixingEngine.key_from_code(key_code)
+            if code:
+                buckets.setdefault(code, []).append((energy if energy is not None else 0.5, track_id))
+
+        self.track_ids: Dict[str, List[str]] = {}
+        self.energies: Dict[str, List[float]] = {}
+        for code, entries in buckets.items():
+            entries.sort()
+            self.energies[code] = [e for e, _ in entries]
+            self.track_ids[code] = [t for _, t in entries]
+
+    @staticmethod
+    def get(db: Session) -> "KeyIndex":
+        """Get the cached index, reloading it after library changes"""
+        version = LibraryEvents.current(db)
+        if KeyIndex._cached is None or KeyIndex._cached_version != version:
+            index = KeyIndex(db.query(Track.id, Track.key_code, Track.energy).all())
+            KeyIndex._cached_version = version
+            KeyIndex._cached = index
+        return KeyIndex._cached
+
+    @staticmethod
+    def backfill_key_codes(db: Session) -> int:
+        """Fill Track.key_code for rows written before the column existed"""
+        updated = 0
+        keys = db.query(Track.key).filter(
+            Track.key.isnot(None),
+            Track.key_code.is_(None)
+        ).distinct().all()
+        for (key,) in keys:
+            code = HarmonicMixingEngine.key_code(key)
+            if code is not None:
+                updated += db.query(Track).filter(
+                    Track.key == key,
+                    Track.key_code.is_(None)
+                ).update({Track.key_code: code}, synchronize_session=False)
+        db.commit()
+        return updated
+
+    def count(self, key: str) -> int:
+        return len(self.track_ids.get(key, []))
+
+    def nearest(
+        self,
+        key: str,
+        energy: float,
+        limit: int = 1,
+        exclude: Optional[Set[str]] = None
+    ) -> List[str]:
+        """Tracks in a key whose energy is closest to the target"""
+        energies = self.energies.get(key)
+        if not energies:
+            return []
+        track_ids = self.track_ids[key]
+        exclude = exclude or set()
+
+        result = []
+        right = bisect_left(energies, energy)
+        left = right - 1
+        while len(result) < limit and (left >= 0 or right < len(energies)):
+            take_left = right >= len(energies) or (
+                left >= 0 and energy - energies[left] <= energies[right] - energy
+            )
+            if take_left:
+                candidate = track_ids[left]
+                left -= 1
+            else:
+                candidate = track_ids[right]
+                right += 1
+            if candidate not in exclude:
+                result.append(candidate)
+
+        return result
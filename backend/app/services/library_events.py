@@ -0,0 +1,77 @@
+from sqlalchemy.orm import Session
+
+from app.models import Track, SmartCrate, EventType
+from app.services.cache_versions import CacheVersions
+from app.services.event_pools import EventPools
+from app.services.smart_crates import SmartCrates
+from app.services.tempo_variants import TempoVariants
+from app.services.transition_cache import TransitionCache
+
+
+class LibraryEvents:
+    """Keeps the derived track indexes in sync with library writes
+
+    Routers call these after committing a track change instead of updating
+    each index themselves. Each call ends by bumping the shared library
+    version, which in-memory indexes in every worker compare against.
+    """
+
+    @staticmethod
+    def current(db: Session) -> int:
+        """The library version in-memory indexes were built at must match this"""
+        return CacheVersions.get(db, CacheVersions.LIBRARY)
+
+    @staticmethod
+    def _changed(db: Session) -> None:
+        CacheVersions.bump(db, CacheVersions.LIBRARY)
+        db.commit()
+
+    @staticmethod
+    def track_created(db: Session, track: Track) -> None:
+        TempoVariants.sync_track(db, track)
+        TransitionCache.add_track(db, track)
+        SmartCrates.track_changed(db, track)
+        EventPools.track_changed(db, track)
+        LibraryEvents._changed(db)
+
+    @staticmethod
+    def track_updated(db: Session, track: Track) -> None:
+        """A track's fields changed (edited or re-analyzed)"""
+        TempoVariants.sync_track(db, track)
+        TransitionCache.refresh_track(db, track)
+        SmartCrates.track_changed(db, track)
+        EventPools.track_changed(db, track)
+        LibraryEvents._changed(db)
+
+    @staticmethod
+    def track_deleted(db: Session, track_id: str) -> None:
+        """Call before deleting the track row so cached references can be found
+
+        Nothing here commits: the caller's commit, which deletes the row,
+        applies the index removals and version bumps with it (or none of them).
+        """
+        TransitionCache.remove_track(db, track_id)
+        TempoVariants.remove_track(db, track_id)
+        SmartCrates.track_removed(db, track_id)
+        EventPools.track_removed(db, track_id)
+        CacheVersions.bump(db, CacheVersions.LIBRARY)
+
+    @staticmethod
+    def library_imported(db: Session) -> None:
+        """Rows were bulk-written without per-track events: rebuild the cheap indexes, drop the rest
+
+        Tempo variants and crate membership are recomputed now; the transition
+        cache and event pools are cleared and rebuild on their next use.
+        """
+        TempoVariants.rebuild(db)
+        for crate in db.query(SmartCrate).all():
+            SmartCrates.evaluate(db, crate)
+        for event_type_id, in db.query(EventType.id).all():
+            EventPools.forget(db, event_type_id)
+        TransitionCache.clear(db)
+        LibraryEvents._changed(db)
+
+    @staticmethod
+    def ensure_built(db: Session) -> None:
+        """Build derived indexes that are still empty (first start on an existing library)"""
+        TempoVariants.ensure_built(db)
@@ -0,0 +1,232 @@
+import argparse
+import json
+import sys
+import time
+from datetime import datetime
+from typing import List, Dict, Optional, Any, Iterable, Iterator, Callable
+
+from sqlalchemy import DateTime, Index, Table, literal, select
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models import Track, TrackAnalysis, EventType, Set, SetTrack, Playlist, PlaylistTrack
+from app.responses import json_bytes, orjson, ORJSON_AVAILABLE
+from app.services.harmonic_mixing import HarmonicMixingEngine
+from app.services.library_events import LibraryEvents
+
+
+class LibraryTransfer:
+    """NDJSON export and bulk import of the library between instances
+
+    Each line is {"table": ..., "row": {column: value}}, tables in foreign-key
+    order so a file imports top to bottom. Export streams each table with a
+    server-side cursor, one batch of rows in memory at a time. Import reads a
+    line at a time and upserts BATCH_SIZE rows per statement (executemany,
+    which SQLAlchemy turns into multi-row INSERT ... ON CONFLICT on both
+    dialects), one transaction per batch; a table that starts out empty is
+    filled without its non-unique indexes, which are built once at the end.
+    Rows are keyed by id, so an interrupted import can simply be run again.
+    """
+
+    # Export groups -> tables, dependencies first (sets carry their event types and entries)
+    GROUPS = {
+        "tracks": [Track],
+        "track_analyses": [TrackAnalysis],
+        "sets": [EventType, Set, SetTrack],
+        "playlists": [Playlist, PlaylistTrack],
+    }
+    TABLES: Dict[str, Table] = {
+        model.__tablename__: model.__table__ for models in GROUPS.values() for model in models
+    }
+    BATCH_SIZE = 5000
+    MEDIA_TYPE = "application/x-ndjson"
+
+    @staticmethod
+    def parse_groups(groups: Optional[str]) -> List[str]:
+        """Comma-separated export groups (all of them by default) -> table names in import order"""
+        requested = [g.strip() for g in groups.split(",") if g.strip()] if groups else list(LibraryTransfer.GROUPS)
+        unknown = [g for g in requested if g not in LibraryTransfer.GROUPS]
+        if unknown:
+            raise ValueError(f"Unknown groups: {', '.join(unknown)}. Available: {', '.join(LibraryTransfer.GROUPS)}")
+        names = {model.__tablename__ for g in requested for model in LibraryTransfer.GROUPS[g]}
+        return [name for name in LibraryTransfer.TABLES if name in names]
+
+    @staticmethod
+    def export_lines(engine: Engine, tables: Optional[List[str]] = None) -> Iterator[bytes]:
+        """NDJSON for the tables, one chunk of BATCH_SIZE lines at a time"""
+        tables = tables or list(LibraryTransfer.TABLES)
+        with engine.connect() as connection:
+            streaming = connection.execution_options(stream_results=True, yield_per=LibraryTransfer.BATCH_SIZE)
+            for name in tables:
+                table = LibraryTransfer.TABLES[name]
+                columns = [column.name for column in table.columns]
+                result = streaming.execute(select(table).order_by(*table.primary_key.columns))
+                for partition in result.partitions():
+                    yield b"".join(
+                        json_bytes({"table": name, "row": dict(zip(columns, row))}) + b"\n"
+                        for row in partition
+                    )
+
+    @staticmethod
+    def _loads(line):
+        return orjson.loads(line) if ORJSON_AVAILABLE else json.loads(line)
+
+    @staticmethod
+    def _row_converter(table: Table) -> Callable[[Dict[str, Any]], Dict[str, Any]]:
+        """Known columns only, ISO strings back to datetimes; tracks get their derived columns"""
+        known = {column.name for column in table.columns}
+        datetimes = {column.name for column in table.columns if isinstance(column.type, DateTime)}
+
+        def convert(row: Dict[str, Any]) -> Dict[str, Any]:
+            row = {name: value for name, value in row.items() if name in known}
+            for name in datetimes:
+                if isinstance(row.get(name), str):
+                    row[name] = datetime.fromisoformat(row[name])
+            if table.name == "tracks":
+                # Exports from before these columns existed
+                if "key" in row and "key_code" not in row:
+                    row["key_code"] = HarmonicMixingEngine.key_code(row["key"])
+                if "cover_art" in row and "album_image_url" not in row:
+                    row["album_image_url"] = Track.spotify_album_art(row["cover_art"])
+            return row
+
+        return convert
+
+    @staticmethod
+    def upsert(connection: Connection, table: Table, rows: List[Dict[str, Any]]) -> None:
+        """Insert rows, replacing the given columns of rows whose primary key already exists"""
+        if connection.dialect.name == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+
+        # executemany needs one column set per statement
+        by_columns: Dict[tuple, List[Dict[str, Any]]] = {}
+        for row in rows:
+            by_columns.setdefault(tuple(row), []).append(row)
+
+        keys = [column.name for column in table.primary_key.columns]
+        for columns, group in by_columns.items():
+            statement = insert(table)
+            updates = {name: statement.excluded[name] for name in columns if name not in keys}
+            if updates:
+                statement = statement.on_conflict_do_update(index_elements=keys, set_=updates)
+            else:
+                statement = statement.on_conflict_do_nothing(index_elements=keys)
+            connection.execute(statement, group)
+
+    @staticmethod
+    def defer_indexes(connection: Connection, table: Table) -> List[Index]:
+        """Drop an empty table's non-unique indexes before filling it; returns them for restore_indexes
+
+        Building an index once over the loaded rows is several times cheaper
+        than updating it row by row. Tables that already hold rows keep their
+        indexes, since queries against them may run during the import.
+        """
+        with connection.begin():
+            if connection.execute(select(literal(1)).select_from(table).limit(1)).first() is not None:
+                return []
+            indexes = [index for index in table.indexes if not index.unique]
+            for index in indexes:
+                index.drop(connection, checkfirst=True)
+        return indexes
+
+    @staticmethod
+    def restore_indexes(connection: Connection, indexes: List[Index]) -> None:
+        with connection.begin():
+            for index in indexes:
+                index.create(connection, checkfirst=True)
+
+    @staticmethod
+    def import_lines(engine: Engine, lines: Iterable, batch_size: Optional[int] = None) -> Dict[str, int]:
+        """Upsert every row in an NDJSON stream; returns rows per table
+
+        Raises ValueError naming the line for malformed input. Batches before
+        it are already committed.
+        """
+        batch_size = batch_size or LibraryTransfer.BATCH_SIZE
+        converters = {name: LibraryTransfer._row_converter(table) for name, table in LibraryTransfer.TABLES.items()}
+        counts: Dict[str, int] = {}
+        deferred: Dict[str, List[Index]] = {}
+        pending: List[Dict[str, Any]] = []
+        pending_table: Optional[str] = None
+
+        try:
+            with engine.connect() as connection:
+                def flush(before_line: int):
+                    if not pending:
+                        return
+                    table = LibraryTransfer.TABLES[pending_table]
+                    if pending_table not in deferred:
+                        deferred[pending_table] = LibraryTransfer.defer_indexes(connection, table)
+                    try:
+                        with connection.begin():
+                            LibraryTransfer.upsert(connection, table, pending)
+                    except IntegrityError as e:
+                        raise ValueError(f"{pending_table} rows before line {before_line}: {e.orig}")
+                    counts[pending_table] = counts.get(pending_table, 0) + len(pending)
+
+                try:
+                    number = 0
+                    for number, line in enumerate(lines, start=1):
+                        if not line.strip():
+                            continue
+                        try:
+                            record = LibraryTransfer._loads(line)
+                            name, row = record["table"], record["row"]
+                            row = converters[name](row)
+                        except KeyError as e:
+                            raise ValueError(f"Line {number}: unknown table or missing key {e}")
+                        except (ValueError, TypeError, AttributeError) as e:
+                            raise ValueError(f"Line {number}: {e}")
+
+                        if name != pending_table or len(pending) >= batch_size:
+                            flush(number)
+                            pending, pending_table = [], name
+                        pending.append(row)
+                    flush(number + 1)
+                finally:
+                    # Even after a bad line: the rows already committed need their indexes
+                    for indexes in deferred.values():
+                        LibraryTransfer.restore_indexes(connection, indexes)
+        finally:
+            # Whatever was committed, even if a later line failed
+            if counts:
+                with Session(engine) as db:
+                    LibraryEvents.library_imported(db)
+        return counts
+
+
+if __name__ == "__main__":
+    from app.database import engine, run_migrations
+
+    parser = argparse.ArgumentParser(description="Export or import the library as NDJSON")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export_parser = commands.add_parser("export", help="Write the library to a file (- for stdout)")
+    export_parser.add_argument("path")
+    export_parser.add_argument("--groups", default=None, help=f"Comma-separated: {', '.join(LibraryTransfer.GROUPS)}")
+    import_parser = commands.add_parser("import", help="Upsert a library export (- for stdin)")
+    import_parser.add_argument("path")
+    import_parser.add_argument("--batch-size", type=int, default=LibraryTransfer.BATCH_SIZE)
+    args = parser.parse_args()
+
+    run_migrations()
+    started = time.perf_counter()
+    if args.command == "export":
+        output = sys.stdout.buffer if args.path == "-" else open(args.path, "wb")
+        try:
+            for chunk in LibraryTransfer.export_lines(engine, LibraryTransfer.parse_groups(args.groups)):
+                output.write(chunk)
+        finally:
+            if output is not sys.stdout.buffer:
+                output.close()
+        print(f"Exported in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+    else:
+        source = sys.stdin.buffer if args.path == "-" else open(args.path, "rb")
+        try:
+            counts = LibraryTransfer.import_lines(engine, source, args.batch_size)
+        finally:
+            if source is not sys.stdin.buffer:
+                source.close()
+        print(json.dumps({"rows": counts, "seconds": round(time.perf_counter() - started, 1)}), file=sys.stderr)
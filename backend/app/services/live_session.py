@@ -0,0 +1,202 @@
+import os
+import time
+import uuid
+from collections import namedtuple
+from typing import List, Dict, Optional, Set, Any
+
+from fastapi import WebSocket
+from sqlalchemy.orm import Session
+
+from app.models import Track, SetTrack
+from app.services.scoring_pipeline import ScoringPipeline
+from app.services.track_columns import TrackColumns
+from app.services.transition_cache import TransitionCache
+
+# Columns a live session keeps in memory for every candidate in its pool
+Candidate = namedtuple("Candidate", ["id", "title", "artist", "bpm", "key", "key_code", "energy", "genre"])
+
+CANDIDATE_COLUMNS = (
+    Track.id, Track.title, Track.artist, Track.bpm,
+    Track.key, Track.key_code, Track.energy, Track.genre
+)
+
+
+class LiveSession:
+    """State for one DJ's live set: history, exclusions and a rolling candidate pool
+
+    When a track starts, only that track's cached successors are added to the
+    pool; the pool (bounded by POOL_SIZE) is then rescored against the new
+    track, so an update never rescans the library. A session started from a
+    set also keeps that set's unplayed tracks in the pool.
+    """
+
+    POOL_SIZE = 200
+    SUGGESTION_COUNT = 10
+
+    def __init__(
+        self,
+        set_id: Optional[str] = None,
+        energy_direction: str = "maintain",
+        target_energy: Optional[float] = None,
+        target_bpm: Optional[float] = None,
+        excluded_track_ids: Optional[List[str]] = None,
+        weights: Optional[Dict[str, float]] = None
+    ):
+        self.id = str(uuid.uuid4())
+        self.set_id = set_id
+        self.energy_direction = energy_direction
+        self.target_energy = target_energy
+        self.target_bpm = target_bpm
+        self.scorer = ScoringPipeline.compile(weights)
+        self.excluded: Set[str] = set(excluded_track_ids or [])
+        self.played: List[str] = []
+        self.current: Optional[Candidate] = None
+        self.pool: Dict[str, Candidate] = {}
+        self.suggestions: List[Dict[str, Any]] = []
+        self.planned: Dict[str, Candidate] = {}
+        self.subscribers: Set[WebSocket] = set()
+        self.last_active = time.monotonic()
+
+    def touch(self) -> None:
+        self.last_active = time.monotonic()
+
+    def _blocked(self, track_id: str) -> bool:
+        return track_id in self.excluded or track_id in self.played
+
+    def _rescore(self) -> None:
+        """Rank the pool against the current track and trim it"""
+        if not self.current:
+            self.suggestions = []
+            return
+
+        candidates = list(self.pool.values())
+        ranked = self.scorer.rank(
+            self.current,
+            TrackColumns.from_tracks(candidates),
+            {
+                "energy_direction": self.energy_direction,
+                "target_energy": self.target_energy,
+                "target_bpm": self.target_bpm
+            },
+            limit=LiveSession.POOL_SIZE
+        )
+
+        self.pool = {candidates[i].id: candidates[i] for i, _, _ in ranked}
+        self.suggestions = [
+            {
+                "track": candidates[i]._asdict(),
+                "compatibility_score": round(score, 3),
+                "reason": reasons
+            }
+            for i, score, reasons in ranked[:LiveSession.SUGGESTION_COUNT]
+        ]
+
+    def load_set(self, db: Session) -> None:
+        """Remember the set's tracks as candidates for every rescore"""
+        rows = db.query(*CANDIDATE_COLUMNS).join(
+            SetTrack, SetTrack.track_id == Track.id
+        ).filter(SetTrack.set_id == self.set_id).all()
+        self.planned = {row[0]: Candidate(*row) for row in rows}
+        self.pool.update((track_id, c) for track_id, c in self.planned.items() if not self._blocked(track_id))
+
+    def play(self, db: Session, track: Track) -> None:
+        """Advance to a newly started track and fold its successors into the pool"""
+        self.played.append(track.id)
+        self.pool.pop(track.id, None)
+        self.current = Candidate(
+            track.id, track.title, track.artist, track.bpm,
+            track.key, track.key_code, track.energy, track.genre
+        )
+
+        new_ids = [
+            t.to_track_id for t in TransitionCache.get_transitions(db, track)
+            if t.to_track_id not in self.pool and not self._blocked(t.to_track_id)
+        ]
+        if new_ids:
+            for row in db.query(*CANDIDATE_COLUMNS).filter(Track.id.in_(new_ids)).all():
+                self.pool[row[0]] = Candidate(*row)
+        for track_id, candidate in self.planned.items():
+            if not self._blocked(track_id):
+                self.pool.setdefault(track_id, candidate)
+
+        self._rescore()
+
+    def exclude(self, track_ids: List[str]) -> None:
+        self.excluded.update(track_ids)
+        for track_id in track_ids:
+            self.pool.pop(track_id, None)
+        self._rescore()
+
+    def update_settings(
+        self,
+        energy_direction: Optional[str] = None,
+        target_energy: Optional[float] = None,
+        target_bpm: Optional[float] = None
+    ) -> None:
+        if energy_direction is not None:
+            self.energy_direction = energy_direction
+        if target_energy is not None:
+            self.target_energy = target_energy
+        if target_bpm is not None:
+            self.target_bpm = target_bpm
+        self._rescore()
+
+    def state(self) -> Dict[str, Any]:
+        return {
+            "session_id": self.id,
+            "set_id": self.set_id,
+            "current_track_id": self.current.id if self.current else None,
+            "played": self.played,
+            "excluded": sorted(self.excluded),
+            "energy_direction": self.energy_direction,
+            "target_energy": self.target_energy,
+            "target_bpm": self.target_bpm,
+            "pool_size": len(self.pool),
+            "suggestions": self.suggestions
+        }
+
+    async def broadcast(self) -> None:
+        """Push the latest state to every connected WebSocket"""
+        message = {"type": "state", **self.state()}
+        for websocket in list(self.subscribers):
+            try:
+                await websocket.send_json(message)
+            except Exception:
+                self.subscribers.discard(websocket)
+
+
+class LiveSessionManager:
+    """In-process registry of live sessions (sessions are pinned to one worker)
+
+    A session nobody is listening to is dropped once it has been idle for
+    IDLE_TTL seconds.
+    """
+
+    IDLE_TTL = int(os.getenv("LIVE_SESSION_TTL", "14400"))
+    _sessions: Dict[str, LiveSession] = {}
+
+    @staticmethod
+    def prune() -> None:
+        cutoff = time.monotonic() - LiveSessionManager.IDLE_TTL
+        for session_id, session in list(LiveSessionManager._sessions.items()):
+            if not session.subscribers and session.last_active < cutoff:
+                del LiveSessionManager._sessions[session_id]
+
+    @staticmethod
+    def create(**settings) -> LiveSession:
+        LiveSessionManager.prune()
+        session = LiveSession(**settings)
+        LiveSessionManager._sessions[session.id] = session
+        return session
+
+    @staticmethod
+    def get(session_id: str) -> Optional[LiveSession]:
+        LiveSessionManager.prune()
+        session = LiveSessionManager._sessions.get(session_id)
+        if session:
+            session.touch()
+        return session
+
+    @staticmethod
+    def close(session_id: str) -> Optional[LiveSession]:
+        return LiveSessionManager._sessions.pop(session_id, None)
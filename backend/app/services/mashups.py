@@ -0,0 +1,249 @@
+import heapq
+import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Optional, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.services.harmonic_mixing import HarmonicMixingEngine
+from app.services.library_events import LibraryEvents
+from app.services.track_columns import TrackColumns
+
+# Share of a mashup's score from each pairwise component
+KEY_WEIGHT = 0.5
+TEMPO_WEIGHT = 0.3
+ENERGY_WEIGHT = 0.2
+# Layering needs at least a smooth (adjacent) Camelot relation
+MIN_KEY_SCORE = 0.8
+
+
+class _MashupIndex:
+    """Tracks bucketed by key, each bucket sorted by tempo folded into one octave
+
+    log2(bpm) mod 1 puts half and double time on the same point, so a
+    tempo window is one (possibly wrapping) range per compatible key.
+    """
+
+    def __init__(self, key_code: np.ndarray, tempo: np.ndarray, energy: np.ndarray):
+        self.key_code = key_code
+        self.tempo = tempo
+        self.energy = energy
+        self.buckets: Dict[int, Tuple[np.ndarray, np.ndarray]] = {}
+        for code in np.unique(key_code):
+            members = np.flatnonzero(key_code == code)
+            members = members[np.argsort(tempo[members], kind="stable")]
+            self.buckets[int(code)] = (members, tempo[members])
+        self.compatible_keys = {
+            code: [
+                other for other in self.buckets
+                if HarmonicMixingEngine.COMPATIBILITY_TABLE[code, other] >= MIN_KEY_SCORE
+            ]
+            for code in self.buckets
+        }
+
+    def neighbours(self, i: int, tempo_tolerance: float, energy_tolerance: float) -> np.ndarray:
+        """Sorted indices of every track that layers with track i"""
+        t = self.tempo[i]
+        found = []
+        for code in self.compatible_keys[int(self.key_code[i])]:
+            members, tempos = self.buckets[code]
+            # The window may wrap around the octave boundary
+            for low, high in ((t - tempo_tolerance, t + tempo_tolerance),
+                              (t - tempo_tolerance + 1, t + tempo_tolerance + 1),
+                              (t - tempo_tolerance - 1, t + tempo_tolerance - 1)):
+                start = np.searchsorted(tempos, low, side="left")
+                stop = np.searchsorted(tempos, high, side="right")
+                if start < stop:
+                    found.append(members[start:stop])
+        if not found:
+            return np.zeros(0, dtype=np.int64)
+        result = np.unique(np.concatenate(found))
+        result = result[result != i]
+        if not np.isnan(self.energy[i]):
+            with np.errstate(invalid="ignore"):
+                far = np.abs(self.energy[result] - self.energy[i]) > energy_tolerance
+            result = result[~far]
+        return result
+
+    def pair_scores(self, a: np.ndarray, b: np.ndarray, tempo_tolerance: float, energy_tolerance: float) -> np.ndarray:
+        key = HarmonicMixingEngine.COMPATIBILITY_TABLE[self.key_code[a], self.key_code[b]]
+        distance = np.abs(self.tempo[a] - self.tempo[b])
+        distance = np.minimum(distance, 1 - distance)
+        tempo = 1 - distance / tempo_tolerance if tempo_tolerance > 0 else np.ones(len(a))
+        energy_gap = np.abs(self.energy[a] - self.energy[b])
+        energy = np.where(np.isnan(energy_gap), 0.5, 1 - energy_gap / max(energy_tolerance, 1e-9))
+        return KEY_WEIGHT * key + TEMPO_WEIGHT * np.clip(tempo, 0, 1) + ENERGY_WEIGHT * np.clip(energy, 0, 1)
+
+
+def _offer(heap: List[Tuple[float, Tuple[int, ...]]], cap: int, scores: np.ndarray, members: np.ndarray) -> None:
+    """Push scored combinations onto a bounded min-heap, skipping any below its floor"""
+    if len(heap) >= cap:
+        keep = scores > heap[0][0]
+        scores, members = scores[keep], members[keep]
+    for score, row in zip(scores.tolist(), members.tolist()):
+        if len(heap) < cap:
+            heapq.heappush(heap, (score, tuple(row)))
+        elif score > heap[0][0]:
+            heapq.heapreplace(heap, (score, tuple(row)))
+
+
+def _triple_scores(index: "_MashupIndex", i: int, js: np.ndarray, ks: np.ndarray, tempo_tolerance: float, energy_tolerance: float):
+    a, b = np.full(len(ks), i), js
+    scores = (
+        index.pair_scores(a, b, tempo_tolerance, energy_tolerance)
+        + index.pair_scores(a, ks, tempo_tolerance, energy_tolerance)
+        + index.pair_scores(b, ks, tempo_tolerance, energy_tolerance)
+    ) / 3
+    return scores, np.stack([a, b, ks], axis=1)
+
+
+def _search_chunk(args) -> Tuple[List[Tuple[float, Tuple[int, ...]]], int]:
+    """Worker: the best `cap` mashups whose lowest index falls in `sources`, and how many exist
+
+    Module level so it can be pickled for the process pool.
+    """
+    index, sources, size, tempo_tolerance, energy_tolerance, cap = args
+    forward: Dict[int, np.ndarray] = {}
+
+    def forward_of(i: int) -> np.ndarray:
+        if i not in forward:
+            found = index.neighbours(i, tempo_tolerance, energy_tolerance)
+            forward[i] = found[found > i]
+        return forward[i]
+
+    heap: List[Tuple[float, Tuple[int, ...]]] = []
+    found = 0
+    for i in sources:
+        i = int(i)
+        later = forward_of(i)
+        if not len(later):
+            continue
+        if size == 2:
+            a = np.full(len(later), i)
+            _offer(heap, cap, index.pair_scores(a, later, tempo_tolerance, energy_tolerance), np.stack([a, later], axis=1))
+            found += len(later)
+            continue
+        # Triangles i < j < k: k must be in both i's and j's forward lists
+        lists = [forward_of(j) for j in later.tolist()]
+        ks = np.concatenate(lists)
+        js = np.repeat(later, [len(l) for l in lists])
+        common = np.isin(ks, later)
+        if common.any():
+            _offer(heap, cap, *_triple_scores(index, i, js[common], ks[common], tempo_tolerance, energy_tolerance))
+            found += int(common.sum())
+    return heap, found
+
+
+class MashupFinder:
+    """Finds 2- and 3-track combinations that can be layered at once
+
+    Tracks layer when their tempos match within BPM_TOLERANCE percent
+    (counting half/double time), their keys are at least smooth on the
+    Camelot wheel and their energies are within ENERGY_TOLERANCE. Triples
+    must be compatible pairwise. Candidates come from a key/tempo index,
+    so a search visits compatible pairs and their common neighbours rather
+    than every O(n^3) triple. Large libraries are split across worker
+    processes. Results are cached per search until the library changes,
+    so pages are slices of one search.
+    """
+
+    BPM_TOLERANCE = 3.0  # percent
+    ENERGY_TOLERANCE = 0.2
+    MAX_RESULTS = int(os.getenv("MASHUP_MAX_RESULTS", "5000"))
+    PARALLEL_THRESHOLD = 2000
+    CACHE_SIZE = 16
+
+    _results: "OrderedDict[Tuple, Tuple[List[Tuple[float, Tuple[str, ...]]], int]]" = OrderedDict()
+
+    @staticmethod
+    def _index(columns: TrackColumns) -> Tuple[_MashupIndex, np.ndarray]:
+        """Index over tracks with a known BPM and key (and their column positions)"""
+        usable = np.flatnonzero(~np.isnan(columns.bpm) & (columns.key_code >= 0))
+        tempo = np.mod(np.log2(columns.bpm[usable]), 1.0)
+        return _MashupIndex(columns.key_code[usable], tempo, columns.energy[usable]), usable
+
+    @staticmethod
+    def search(
+        db: Session,
+        size: int = 2,
+        track_id: Optional[str] = None,
+        bpm_tolerance: Optional[float] = None,
+        energy_tolerance: Optional[float] = None,
+        workers: Optional[int] = None
+    ) -> Tuple[List[Tuple[float, Tuple[str, ...]]], int]:
+        """Best MAX_RESULTS mashups of `size` tracks, optionally containing track_id, and the total found"""
+        if size not in (2, 3):
+            raise ValueError("Mashups have 2 or 3 tracks")
+        bpm_tolerance = MashupFinder.BPM_TOLERANCE if bpm_tolerance is None else bpm_tolerance
+        energy_tolerance = MashupFinder.ENERGY_TOLERANCE if energy_tolerance is None else energy_tolerance
+
+        columns = TrackColumns.get(db)
+        cache_key = (LibraryEvents.current(db), size, track_id, bpm_tolerance, energy_tolerance)
+        if cache_key in MashupFinder._results:
+            MashupFinder._results.move_to_end(cache_key)
+            return MashupFinder._results[cache_key]
+
+        index, usable = MashupFinder._index(columns)
+        tempo_tolerance = float(np.log2(1 + bpm_tolerance / 100))
+        cap = MashupFinder.MAX_RESULTS
+
+        if track_id is not None:
+            found = [i for i in range(len(usable)) if columns.ids[usable[i]] == track_id]
+            if not found:
+                return [], 0
+            combos, total = MashupFinder._search_from(index, found[0], size, tempo_tolerance, energy_tolerance, cap)
+        else:
+            n = len(usable)
+            workers = workers or os.cpu_count() or 1
+            if workers == 1 or n < MashupFinder.PARALLEL_THRESHOLD:
+                combos, total = _search_chunk((index, np.arange(n), size, tempo_tolerance, energy_tolerance, cap))
+            else:
+                # Interleave sources so the cheap high indices spread across workers
+                chunks = [
+                    (index, np.arange(start, n, workers * 4), size, tempo_tolerance, energy_tolerance, cap)
+                    for start in range(workers * 4)
+                ]
+                combos, total = [], 0
+                with ProcessPoolExecutor(max_workers=workers) as executor:
+                    for chunk_combos, chunk_total in executor.map(_search_chunk, chunks):
+                        combos = heapq.nlargest(cap, combos + chunk_combos)
+                        total += chunk_total
+
+        combos.sort(key=lambda c: (-c[0], c[1]))
+        results = [
+            (round(score, 4), tuple(columns.ids[usable[i]] for i in members))
+            for score, members in combos
+        ]
+        MashupFinder._results[cache_key] = (results, total)
+        while len(MashupFinder._results) > MashupFinder.CACHE_SIZE:
+            MashupFinder._results.popitem(last=False)
+        return results, total
+
+    @staticmethod
+    def _search_from(
+        index: _MashupIndex,
+        seed: int,
+        size: int,
+        tempo_tolerance: float,
+        energy_tolerance: float,
+        cap: int
+    ) -> Tuple[List[Tuple[float, Tuple[int, ...]]], int]:
+        """Mashups containing one track: its neighbours, and compatible pairs among them"""
+        around = index.neighbours(seed, tempo_tolerance, energy_tolerance)
+        heap: List[Tuple[float, Tuple[int, ...]]] = []
+        if size == 2:
+            a = np.full(len(around), seed)
+            _offer(heap, cap, index.pair_scores(a, around, tempo_tolerance, energy_tolerance), np.stack([a, around], axis=1))
+            return heap, len(around)
+
+        if not len(around):
+            return heap, 0
+        lists = [index.neighbours(j, tempo_tolerance, energy_tolerance) for j in around.tolist()]
+        ks = np.concatenate(lists)
+        js = np.repeat(around, [len(l) for l in lists])
+        common = (ks > js) & np.isin(ks, around)
+        if common.any():
+            _offer(heap, cap, *_triple_scores(index, seed, js[common], ks[common], tempo_tolerance, energy_tolerance))
+        return heap, int(common.sum())
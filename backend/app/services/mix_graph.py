@@ -0,0 +1,205 @@
+from collections import deque
+from typing import List, Dict, Optional, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.models import Track, TrackTransition
+from app.services.cache_versions import CacheVersions
+from app.services.transition_cache import TransitionCache
+
+
+class MixGraph:
+    """k-nearest mixability graph over the cached transitions
+
+    Every track links to its k best successors from the TransitionCache. Edges
+    are kept as CSR adjacency arrays (plus a transposed copy for backward
+    searches) so multi-hop queries never touch the database.
+    """
+
+    _cached: Optional["MixGraph"] = None
+    _cached_version: Optional[int] = None
+
+    def __init__(
+        self,
+        track_ids: List[str],
+        genres: List[Optional[str]],
+        sources: np.ndarray,
+        targets: np.ndarray,
+        scores: np.ndarray,
+        key_scores: np.ndarray
+    ):
+        self.track_ids = track_ids
+        self.index = {track_id: i for i, track_id in enumerate(track_ids)}
+        self.genres = np.array([(g or "").lower() for g in genres], dtype=object)
+        n = len(track_ids)
+
+        order = np.lexsort((-(scores + key_scores), sources))
+        self.indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=n), out=self.indptr[1:])
+        self.indices = targets[order].astype(np.int32)
+        self.scores = scores[order].astype(np.float32)
+        self.key_scores = key_scores[order].astype(np.float32)
+
+        reverse = np.argsort(targets, kind="stable")
+        self.rev_indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(targets, minlength=n), out=self.rev_indptr[1:])
+        self.rev_indices = sources[reverse].astype(np.int32)
+
+    @staticmethod
+    def from_db(db: Session) -> "MixGraph":
+        """Materialize the graph from the track_transitions table, computing any missing lists first"""
+        TransitionCache.fill_missing(db)
+
+        tracks = db.query(Track.id, Track.genre).all()
+        track_ids = [t[0] for t in tracks]
+        index = {track_id: i for i, track_id in enumerate(track_ids)}
+
+        rows = [
+            (index[f], index[t], s, ks)
+            for f, t, s, ks in db.query(
+                TrackTransition.from_track_id,
+                TrackTransition.to_track_id,
+                TrackTransition.score,
+                TrackTransition.key_score
+            ).all()
+            if f in index and t in index
+        ]
+        edges = np.array(rows, dtype=np.float64).reshape(-1, 4)
+
+        return MixGraph(
+            track_ids,
+            [t[1] for t in tracks],
+            edges[:, 0].astype(np.int64),
+            edges[:, 1].astype(np.int64),
+            edges[:, 2],
+            edges[:, 3]
+        )
+
+    @staticmethod
+    def get(db: Session) -> "MixGraph":
+        """Get the in-memory graph, reloading it when the transition cache changed (in any worker)"""
+        version = CacheVersions.get(db, CacheVersions.TRANSITIONS)
+        if MixGraph._cached is None or MixGraph._cached_version != version:
+            graph = MixGraph.from_db(db)
+            MixGraph._cached_version = version
+            MixGraph._cached = graph
+        return MixGraph._cached
+
+    @property
+    def edge_count(self) -> int:
+        return int(self.indices.shape[0])
+
+    def _successors(self, node: int, min_score: float, min_key_score: float) -> np.ndarray:
+        start, end = self.indptr[node], self.indptr[node + 1]
+        mask = (self.scores[start:end] >= min_score) & (self.key_scores[start:end] >= min_key_score)
+        return self.indices[start:end][mask]
+
+    def _edge_weight(self, source: int, target: int) -> float:
+        start, end = self.indptr[source], self.indptr[source + 1]
+        hits = np.nonzero(self.indices[start:end] == target)[0]
+        if not len(hits):
+            return 0.0
+        edge = start + hits[0]
+        return float(self.scores[edge] + self.key_scores[edge])
+
+    def find_path(
+        self,
+        from_track_id: str,
+        to_track_id: str,
+        max_hops: int = 5,
+        min_score: float = 0.0,
+        min_key_score: float = 0.0
+    ) -> Optional[List[str]]:
+        """Fewest-transition path from one track to another, best-scoring among ties"""
+        if from_track_id not in self.index or to_track_id not in self.index:
+            return None
+        start, goal = self.index[from_track_id], self.index[to_track_id]
+        if start == goal:
+            return [from_track_id]
+
+        parent = {start: -1}
+        best = {start: 0.0}
+        frontier = [start]
+        for _ in range(max_hops):
+            layer: Dict[int, Tuple[int, float]] = {}
+            for node in frontier:
+                for succ in self._successors(node, min_score, min_key_score).tolist():
+                    if succ in parent:
+                        continue
+                    total = best[node] + self._edge_weight(node, succ)
+                    if succ not in layer or total > layer[succ][1]:
+                        layer[succ] = (node, total)
+            if not layer:
+                return None
+            for succ, (node, total) in layer.items():
+                parent[succ] = node
+                best[succ] = total
+            if goal in layer:
+                path = [goal]
+                while parent[path[-1]] != -1:
+                    path.append(parent[path[-1]])
+                return [self.track_ids[i] for i in reversed(path)]
+            frontier = list(layer)
+
+        return None
+
+    def reachable(
+        self,
+        track_id: str,
+        max_hops: int = 3,
+        min_score: float = 0.4,
+        min_key_score: float = 0.8
+    ) -> List[Tuple[str, int]]:
+        """All tracks reachable through smooth transitions, with their hop counts"""
+        if track_id not in self.index:
+            return []
+        start = self.index[track_id]
+        hops = {start: 0}
+        queue = deque([start])
+        while queue:
+            node = queue.popleft()
+            if hops[node] >= max_hops:
+                continue
+            for succ in self._successors(node, min_score, min_key_score).tolist():
+                if succ not in hops:
+                    hops[succ] = hops[node] + 1
+                    queue.append(succ)
+
+        return [(self.track_ids[i], h) for i, h in sorted(hops.items(), key=lambda x: x[1]) if i != start]
+
+    def _multi_source_hops(self, seeds: np.ndarray, indptr: np.ndarray, indices: np.ndarray, max_hops: int) -> np.ndarray:
+        hops = np.full(len(self.track_ids), -1, dtype=np.int32)
+        hops[seeds] = 0
+        frontier = seeds
+        for depth in range(1, max_hops + 1):
+            if not len(frontier):
+                break
+            neighbours = np.unique(np.concatenate(
+                [indices[indptr[n]:indptr[n + 1]] for n in frontier]
+            ))
+            neighbours = neighbours[hops[neighbours] == -1]
+            hops[neighbours] = depth
+            frontier = neighbours
+        return hops
+
+    def bridges(
+        self,
+        from_genre: str,
+        to_genre: str,
+        max_hops: int = 4,
+        limit: int = 20
+    ) -> List[Tuple[str, int]]:
+        """Tracks that sit on short mix paths from one genre into another"""
+        from_nodes = np.nonzero(self.genres == from_genre.lower())[0]
+        to_nodes = np.nonzero(self.genres == to_genre.lower())[0]
+        if not len(from_nodes) or not len(to_nodes):
+            return []
+
+        forward = self._multi_source_hops(from_nodes, self.indptr, self.indices, max_hops)
+        backward = self._multi_source_hops(to_nodes, self.rev_indptr, self.rev_indices, max_hops)
+
+        candidates = np.nonzero((forward > 0) & (backward > 0) & (forward + backward <= max_hops))[0]
+        total = forward[candidates] + backward[candidates]
+        ranked = candidates[np.argsort(total, kind="stable")][:limit]
+        return [(self.track_ids[i], int(forward[i] + backward[i])) for i in ranked]
@@ -0,0 +1,343 @@
+import multiprocessing
+import os
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, Future
+from datetime import datetime, timedelta
+from typing import Callable, List, Dict, Optional, Any
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.models import SetTrack, Track
+from app.services.positions import Positions
+from app.services.scoring_pipeline import ScoringPipeline
+from app.services.set_curves import SetCurves
+from app.services.track_columns import TrackColumns
+from app.services.transition_cache import TrackFeatures
+
+# How often a running job publishes its best-so-far order
+REPORT_INTERVAL = 0.25
+
+
+def _score_matrix(nodes: List[TrackFeatures], deadline: float, stop: Callable[[], bool]) -> Optional[np.ndarray]:
+    """Pairwise transition scores, plus a zero-cost start/end node at index n
+
+    One vectorized ScoringPipeline row per source; None if the deadline
+    passes or the job is cancelled before the matrix is complete.
+    """
+    n = len(nodes)
+    scorer = ScoringPipeline.compile()
+    columns = TrackColumns.from_tracks(nodes)
+    scores = np.zeros((n + 1, n + 1), dtype=np.float64)
+    for i, source in enumerate(nodes):
+        if stop() or time.monotonic() > deadline:
+            return None
+        scores[i, :n] = scorer.score(source, columns)[0]
+    np.fill_diagonal(scores, 0.0)
+    return scores
+
+
+def _greedy(nodes: List[TrackFeatures], scores: np.ndarray) -> List[int]:
+    """FlowEngine.optimize_set_order on the score matrix: highest energy first, then best next"""
+    remaining = sorted(range(len(nodes)), key=lambda i: nodes[i].energy or 0, reverse=True)
+    order = [remaining.pop(0)]
+    while remaining:
+        best = int(np.argmax(scores[order[-1], remaining]))
+        order.append(remaining.pop(best))
+    return order
+
+
+def _best_relocation(scores: np.ndarray, route: np.ndarray, start: int, length: int):
+    """Best gain from moving route[start:start + length] to another edge of the route"""
+    a, b = route[start - 1], route[start + length]
+    first, last = route[start], route[start + length - 1]
+    removal = scores[a, b] - scores[a, first] - scores[last, b]
+
+    c, d = route[:-1], route[1:]
+    gains = scores[c, first] + scores[last, d] - scores[c, d] + removal
+    # Edges touching the segment are not insertion points
+    gains[start - 1:start + length] = -np.inf
+    edge = int(np.argmax(gains))
+    return gains[edge], edge
+
+
+def _optimize_worker(
+    job_id: str,
+    nodes: List[TrackFeatures],
+    max_seconds: float,
+    progress: Any,
+    cancelled: Any
+) -> Dict[str, Any]:
+    """Segment relocation from the better of the current and greedy orders,
+    until no move helps, time runs out or the job is cancelled
+
+    Runs in a worker process; the best order so far is published to the
+    shared progress dict as it improves. The deadline covers building the
+    score matrix too. `improved` is only set when the result beats the
+    set's current order, which is the only case worth writing back.
+    """
+    deadline = time.monotonic() + max_seconds
+    n = len(nodes)
+    current = [node.id for node in nodes]
+
+    def stop() -> bool:
+        return bool(cancelled.get(job_id))
+
+    scores = _score_matrix(nodes, deadline, stop) if n else None
+    if scores is None:
+        return {
+            "order": current, "initial_score": None, "score": None,
+            "iterations": 0, "cancelled": stop(), "improved": False
+        }
+
+    def total() -> float:
+        return float(scores[route[:-1], route[1:]].sum())
+
+    route = np.array([n] + list(range(n)) + [n], dtype=np.int64)
+    initial_score = total()
+    greedy = np.array([n] + _greedy(nodes, scores) + [n], dtype=np.int64)
+    if float(scores[greedy[:-1], greedy[1:]].sum()) > initial_score:
+        route = greedy
+
+    def publish(iterations: int) -> None:
+        progress[job_id] = {
+            "order": [nodes[i].id for i in route[1:-1]],
+            "score": round(total(), 4),
+            "iterations": iterations
+        }
+
+    iterations = 0
+    publish(iterations)
+    last_report = time.monotonic()
+    stopped = False
+
+    improved = n > 2
+    while improved and not stopped:
+        improved = False
+        for length in (1, 2, 3):
+            for start in range(1, n - length + 2):
+                if stop() or time.monotonic() > deadline:
+                    stopped = True
+                    break
+                gain, edge = _best_relocation(scores, route, start, length)
+                if gain > 1e-9:
+                    segment = route[start:start + length]
+                    rest = np.concatenate((route[:start], route[start + length:]))
+                    insert_at = edge + 1 if edge < start else edge + 1 - length
+                    route = np.concatenate((rest[:insert_at], segment, rest[insert_at:]))
+                    iterations += 1
+                    improved = True
+                    if time.monotonic() - last_report > REPORT_INTERVAL:
+                        publish(iterations)
+                        last_report = time.monotonic()
+            if stopped:
+                break
+
+    publish(iterations)
+    improved = total() > initial_score + 1e-9
+    return {
+        "order": [nodes[i].id for i in route[1:-1]] if improved else current,
+        "initial_score": round(initial_score, 4),
+        "score": round(total(), 4),
+        "iterations": iterations,
+        "cancelled": stop(),
+        "improved": improved
+    }
+
+
+class OptimizationJob:
+    def __init__(self, set_id: str, track_count: int, max_seconds: float):
+        self.id = str(uuid.uuid4())
+        self.set_id = set_id
+        self.track_count = track_count
+        self.max_seconds = max_seconds
+        self.status = "queued"  # queued, running, completed, cancelled, failed
+        self.created_at = datetime.utcnow()
+        self.finished_at: Optional[datetime] = None
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.future: Optional[Future] = None
+
+
+class OptimizationJobs:
+    """Set-order optimization in a process pool with anytime results
+
+    Jobs for different sets run in parallel across cores. While a job runs,
+    its best order so far can be read from get(); the final order is
+    written back with a single bulk update (respaced, see Positions), and
+    only if it beats the set's order when the job started. Jobs live in
+    process memory and are forgotten JOB_TTL seconds after they finish.
+    """
+
+    MAX_WORKERS = int(os.getenv("OPTIMIZE_WORKERS", "0")) or os.cpu_count() or 1
+    MAX_SECONDS = 120.0
+    JOB_TTL = int(os.getenv("OPTIMIZE_JOB_TTL", "3600"))
+
+    _jobs: Dict[str, OptimizationJob] = {}
+    _executor: Optional[ProcessPoolExecutor] = None
+    _manager = None
+    _progress = None
+    _cancelled = None
+
+    @staticmethod
+    def _pool() -> ProcessPoolExecutor:
+        if OptimizationJobs._executor is None:
+            OptimizationJobs._manager = multiprocessing.Manager()
+            OptimizationJobs._progress = OptimizationJobs._manager.dict()
+            OptimizationJobs._cancelled = OptimizationJobs._manager.dict()
+            OptimizationJobs._executor = ProcessPoolExecutor(max_workers=OptimizationJobs.MAX_WORKERS)
+        return OptimizationJobs._executor
+
+    @staticmethod
+    def prune() -> None:
+        cutoff = datetime.utcnow() - timedelta(seconds=OptimizationJobs.JOB_TTL)
+        for job_id, job in list(OptimizationJobs._jobs.items()):
+            if job.finished_at is not None and job.finished_at < cutoff:
+                del OptimizationJobs._jobs[job_id]
+                if OptimizationJobs._cancelled is not None:
+                    OptimizationJobs._cancelled.pop(job_id, None)
+                    OptimizationJobs._progress.pop(job_id, None)
+
+    @staticmethod
+    def load_set(db: Session, set_id: str) -> List[TrackFeatures]:
+        """A set's entries in order, in one query (id is the SetTrack id)"""
+        return [
+            TrackFeatures(*row) for row in db.query(
+                SetTrack.id, Track.bpm, Track.key_code, Track.energy, Track.genre
+            ).join(
+                Track, Track.id == SetTrack.track_id
+            ).filter(
+                SetTrack.set_id == set_id
+            ).order_by(SetTrack.position).all()
+        ]
+
+    @staticmethod
+    def apply_order(db: Session, set_id: str, set_track_ids: List[str]) -> int:
+        """Write a new order with one bulk update, respacing positions (Positions.renumber)
+
+        Entries added to the set since the order was computed keep their
+        relative order after the optimized ones.
+        """
+        current = [row[0] for row in db.query(SetTrack.id).filter(
+            SetTrack.set_id == set_id
+        ).order_by(SetTrack.position).all()]
+        existing = set(current)
+        ordered = [st_id for st_id in set_track_ids if st_id in existing]
+        placed = set(ordered)
+        ordered += [st_id for st_id in current if st_id not in placed]
+
+        if ordered:
+            Positions.renumber(db, SetTrack.set_id, set_id, ordered)
+            SetCurves.bump(db, set_id)
+        db.commit()
+        SetCurves.invalidate(set_id)
+        return len(ordered)
+
+    @staticmethod
+    def start(db: Session, set_id: str, max_seconds: float = 10.0) -> OptimizationJob:
+        OptimizationJobs.prune()
+        nodes = OptimizationJobs.load_set(db, set_id)
+        max_seconds = max(0.1, min(max_seconds, OptimizationJobs.MAX_SECONDS))
+        job = OptimizationJob(set_id, len(nodes), max_seconds)
+        OptimizationJobs._jobs[job.id] = job
+
+        executor = OptimizationJobs._pool()
+        job.future = executor.submit(
+            _optimize_worker,
+            job.id,
+            nodes,
+            max_seconds,
+            OptimizationJobs._progress,
+            OptimizationJobs._cancelled
+        )
+        job.future.add_done_callback(lambda future: OptimizationJobs._finish(job, future))
+        return job
+
+    @staticmethod
+    def _finish(job: OptimizationJob, future: Future) -> None:
+        """Runs in the executor's callback thread once the worker returns"""
+        job.finished_at = datetime.utcnow()
+        if future.cancelled():
+            job.status = "cancelled"
+            return
+        error = future.exception()
+        if error is not None:
+            job.status = "failed"
+            job.error = str(error)
+            return
+
+        job.result = future.result()
+        OptimizationJobs._progress.pop(job.id, None)
+        if job.result["cancelled"]:
+            job.status = "cancelled"
+            return
+        if not job.result["improved"]:
+            job.status = "completed"
+            return
+
+        db = SessionLocal()
+        try:
+            OptimizationJobs.apply_order(db, job.set_id, job.result["order"])
+            job.status = "completed"
+        except Exception as e:
+            db.rollback()
+            job.status = "failed"
+            job.error = str(e)
+        finally:
+            db.close()
+
+    @staticmethod
+    def get(job_id: str) -> Optional[OptimizationJob]:
+        OptimizationJobs.prune()
+        return OptimizationJobs._jobs.get(job_id)
+
+    @staticmethod
+    def for_set(set_id: Optional[str] = None) -> List[OptimizationJob]:
+        OptimizationJobs.prune()
+        return [job for job in OptimizationJobs._jobs.values() if set_id is None or job.set_id == set_id]
+
+    @staticmethod
+    def cancel(job: OptimizationJob) -> None:
+        """Cancel a queued job, or stop a running one (its order is not written)"""
+        if job.future is not None and job.future.cancel():
+            return
+        OptimizationJobs._cancelled[job.id] = True
+
+    @staticmethod
+    def state(job: OptimizationJob) -> Dict[str, Any]:
+        if job.status == "queued" and job.future is not None and job.future.running():
+            job.status = "running"
+
+        best = job.result
+        if best is None and OptimizationJobs._progress is not None:
+            best = OptimizationJobs._progress.get(job.id)
+
+        return {
+            "job_id": job.id,
+            "set_id": job.set_id,
+            "status": job.status,
+            "track_count": job.track_count,
+            "max_seconds": job.max_seconds,
+            "created_at": job.created_at,
+            "finished_at": job.finished_at,
+            "best_score": best["score"] if best else None,
+            "initial_score": job.result["initial_score"] if job.result else None,
+            "improved": job.result["improved"] if job.result else None,
+            "iterations": best["iterations"] if best else 0,
+            "best_order": best["order"] if best else None,  # SetTrack IDs
+            "error": job.error
+        }
+
+    @staticmethod
+    def shutdown() -> None:
+        for job_id in list(OptimizationJobs._jobs):
+            if OptimizationJobs._cancelled is not None:
+                OptimizationJobs._cancelled[job_id] = True
+        if OptimizationJobs._executor is not None:
+            OptimizationJobs._executor.shutdown(wait=True, cancel_futures=True)
+            OptimizationJobs._executor = None
+        if OptimizationJobs._manager is not None:
+            OptimizationJobs._manager.shutdown()
+            OptimizationJobs._manager = None
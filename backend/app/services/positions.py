@@ -0,0 +1,110 @@
+from typing import List, Optional, Tuple
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+
+class Positions:
+    """Gapped sort keys for ordered entries (set tracks, playlist tracks)
+
+    Entries are stored GAP apart, so inserting or moving one takes a key
+    between its new neighbours: one row written, nothing renumbered. When
+    two neighbours run out of room the list is respaced once, which a run
+    of inserts at the same spot needs about every log2(GAP) times. The
+    stored key only orders entries (it is always >= 1); APIs take and
+    report 0-based indexes.
+
+    scope is the parent column of the entries, e.g. PlaylistTrack.playlist_id;
+    the entry model needs id and position columns. Nothing here commits.
+    """
+
+    GAP = 1024
+
+    @staticmethod
+    def spaced(count: int, start: int = 0) -> List[int]:
+        """Keys for count entries in a row, after start (0 for the beginning)"""
+        return [start + (i + 1) * Positions.GAP for i in range(count)]
+
+    @staticmethod
+    def between(before: Optional[int], after: Optional[int], count: int = 1) -> Optional[List[int]]:
+        """count keys spread between two neighbours (None at either end); None if they don't fit"""
+        if after is None:
+            return Positions.spaced(count, before or 0)
+        low = before if before is not None else 0
+        step = (after - low) // (count + 1)
+        if step < 1:
+            return None
+        return [low + (i + 1) * step for i in range(count)]
+
+    @staticmethod
+    def neighbours(db: Session, scope, scope_id: str, index: int, exclude_id: Optional[str] = None) -> Tuple[Optional[int], Optional[int]]:
+        """Keys of the entries that would sit either side of index (clamped to the list)"""
+        model = scope.class_
+        query = select(model.position).where(scope == scope_id)
+        if exclude_id is not None:
+            query = query.where(model.id != exclude_id)
+
+        if index <= 0:
+            return None, db.scalar(query.order_by(model.position).limit(1))
+        keys = db.scalars(query.order_by(model.position).offset(index - 1).limit(2)).all()
+        if not keys:
+            # Past the end: after the last entry
+            return db.scalar(query.order_by(model.position.desc()).limit(1)), None
+        return keys[0], keys[1] if len(keys) > 1 else None
+
+    @staticmethod
+    def renumber(db: Session, scope, scope_id: str, ordered_ids: List[str], hole_at: Optional[int] = None, hole: int = 0) -> None:
+        """Respace a scope's entries GAP apart in the given order, leaving room for hole entries before index hole_at
+
+        Every key is negated first, so no write below lands on a key another
+        row still holds (uq_playlist_position is checked row by row). Entries
+        not in ordered_ids are left negative for the caller to place.
+        """
+        model = scope.class_
+        db.execute(
+            update(model).where(scope == scope_id).values(position=-model.position)
+            .execution_options(synchronize_session=False)
+        )
+        if ordered_ids:
+            db.execute(update(model), [
+                {"id": entry_id, "position": (i + 1 + (hole if hole_at is not None and i >= hole_at else 0)) * Positions.GAP}
+                for i, entry_id in enumerate(ordered_ids)
+            ])
+
+    @staticmethod
+    def rebalance(db: Session, scope, scope_id: str, hole_at: Optional[int] = None, hole: int = 0, exclude_id: Optional[str] = None) -> None:
+        """Respace a scope's entries in their current order (see renumber)"""
+        model = scope.class_
+        query = select(model.id).where(scope == scope_id).order_by(model.position)
+        if exclude_id is not None:
+            query = query.where(model.id != exclude_id)
+        Positions.renumber(db, scope, scope_id, db.scalars(query).all(), hole_at, hole)
+
+    @staticmethod
+    def slots(db: Session, scope, scope_id: str, index: int, count: int = 1, exclude_id: Optional[str] = None) -> Tuple[List[int], bool]:
+        """Keys for count new entries at index, and whether the scope had to be respaced for them
+
+        exclude_id is an entry being moved: it is left out of the neighbours
+        (and, when respaced, keeps a negative key until the caller places it).
+        """
+        before, after = Positions.neighbours(db, scope, scope_id, index, exclude_id)
+        keys = Positions.between(before, after, count)
+        if keys is not None:
+            return keys, False
+        Positions.rebalance(db, scope, scope_id, hole_at=max(index, 0), hole=count, exclude_id=exclude_id)
+        before, after = Positions.neighbours(db, scope, scope_id, index, exclude_id)
+        return Positions.between(before, after, count), True
+
+    @staticmethod
+    def move(db: Session, scope, scope_id: str, entry_id: str, index: int) -> Tuple[int, bool]:
+        """Move one entry to index: a single-row update unless its new neighbours are out of room
+
+        Returns the entry's new key and whether the scope was respaced.
+        """
+        model = scope.class_
+        (key,), rebalanced = Positions.slots(db, scope, scope_id, index, exclude_id=entry_id)
+        db.execute(
+            update(model).where(model.id == entry_id).values(position=key)
+            .execution_options(synchronize_session=False)
+        )
+        return key, rebalanced
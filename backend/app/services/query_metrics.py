@@ -0,0 +1,237 @@
+import json
+import logging
+import os
+import time
+from contextvars import ContextVar
+from typing import List, Dict, Optional, Any
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+
+from app.database import env_flag, env_int
+
+logger = logging.getLogger("dj_arsenal.queries")
+if not logger.handlers:
+    # One JSON object per line on stderr, independent of uvicorn's log config
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(os.getenv("QUERY_LOG_LEVEL", "INFO").upper())
+    logger.propagate = False
+
+
+class RequestQueries:
+    """Statements run and time spent in the database while serving one request"""
+
+    __slots__ = ("method", "path", "count", "seconds")
+
+    def __init__(self, method: str, path: str):
+        self.method = method
+        self.path = path
+        self.count = 0
+        self.seconds = 0.0
+
+
+class EndpointStats:
+    __slots__ = ("requests", "queries", "max_queries", "db_seconds", "seconds", "errors")
+
+    def __init__(self):
+        self.requests = 0
+        self.queries = 0
+        self.max_queries = 0
+        self.db_seconds = 0.0
+        self.seconds = 0.0
+        self.errors = 0
+
+
+# The tally for the request being served; sync handlers see it through the
+# context their threadpool call copies, async sessions through their greenlet
+_current: ContextVar[Optional[RequestQueries]] = ContextVar("request_queries", default=None)
+
+
+class QueryMetrics:
+    """Per-request SQL counts and timings, slow-query logging and per-endpoint totals
+
+    Engine event hooks time every statement. Inside a request the time is
+    added to that request's tally, which the middleware reports in a
+    Server-Timing header and a JSON log line and folds into per-endpoint
+    totals. Statements slower than SLOW_QUERY_MS are logged (anywhere,
+    scripts included) with their parameters and, for reads, the EXPLAIN plan.
+    """
+
+    SLOW_QUERY_MS = env_int("SLOW_QUERY_MS", 200)
+    EXPLAIN_SLOW_QUERIES = env_flag("EXPLAIN_SLOW_QUERIES", True)
+    LOG_REQUESTS = env_flag("LOG_REQUESTS", True)
+    MAX_PARAMETERS_LENGTH = 1000
+    SORT_KEYS = ("avg_queries", "max_queries", "avg_db_ms", "total_db_ms", "avg_ms")
+
+    _endpoints: Dict[str, EndpointStats] = {}
+
+    @staticmethod
+    def instrument(engine: Engine) -> None:
+        """Time every statement run on the engine (pass async_engine.sync_engine for async engines)"""
+        if not event.contains(engine, "before_cursor_execute", QueryMetrics._before):
+            event.listen(engine, "before_cursor_execute", QueryMetrics._before)
+            event.listen(engine, "after_cursor_execute", QueryMetrics._after)
+
+    @staticmethod
+    def _before(conn, cursor, statement, parameters, context, executemany) -> None:
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @staticmethod
+    def _after(conn, cursor, statement, parameters, context, executemany) -> None:
+        elapsed = time.perf_counter() - conn.info["query_started"].pop()
+        tally = _current.get()
+        if tally is not None:
+            tally.count += 1
+            tally.seconds += elapsed
+
+        if elapsed * 1000 >= QueryMetrics.SLOW_QUERY_MS:
+            logger.warning(json.dumps({
+                "event": "slow_query",
+                "ms": round(elapsed * 1000, 1),
+                "request": f"{tally.method} {tally.path}" if tally else None,
+                "statement": statement,
+                "parameters": QueryMetrics._format_parameters(parameters),
+                "plan": QueryMetrics.explain(conn, statement, parameters) if (
+                    QueryMetrics.EXPLAIN_SLOW_QUERIES and not executemany
+                ) else None
+            }, default=str))
+
+    @staticmethod
+    def _format_parameters(parameters: Any) -> str:
+        text = repr(parameters)
+        if len(text) > QueryMetrics.MAX_PARAMETERS_LENGTH:
+            text = text[:QueryMetrics.MAX_PARAMETERS_LENGTH] + "..."
+        return text
+
+    @staticmethod
+    def explain(conn, statement: str, parameters: Any) -> Optional[List[str]]:
+        """The plan for a read, run on the raw DBAPI cursor so it is neither counted nor logged"""
+        if not statement.lstrip().upper().startswith(("SELECT", "WITH")):
+            return None
+        sqlite = conn.dialect.name == "sqlite"
+        try:
+            cursor = conn.connection.cursor()
+            try:
+                cursor.execute(("EXPLAIN QUERY PLAN " if sqlite else "EXPLAIN ") + statement, parameters)
+                rows = cursor.fetchall()
+            finally:
+                cursor.close()
+        except Exception as e:
+            return [f"EXPLAIN failed: {e}"]
+        # SQLite: (id, parent, notused, detail); PostgreSQL: one text column per plan line
+        return [str(row[-1] if sqlite else row[0]) for row in rows]
+
+    @staticmethod
+    def begin(method: str, path: str):
+        """Start a request's tally; returns the tally and a token for end()"""
+        tally = RequestQueries(method, path)
+        return tally, _current.set(tally)
+
+    @staticmethod
+    def end(token, tally: RequestQueries, endpoint: str, status: int, seconds: float) -> None:
+        _current.reset(token)
+        stats = QueryMetrics._endpoints.get(endpoint)
+        if stats is None:
+            stats = QueryMetrics._endpoints[endpoint] = EndpointStats()
+        stats.requests += 1
+        stats.queries += tally.count
+        stats.max_queries = max(stats.max_queries, tally.count)
+        stats.db_seconds += tally.seconds
+        stats.seconds += seconds
+        if status >= 500:
+            stats.errors += 1
+
+        if QueryMetrics.LOG_REQUESTS:
+            logger.info(json.dumps({
+                "event": "request",
+                "method": tally.method,
+                "path": tally.path,
+                "endpoint": endpoint,
+                "status": status,
+                "queries": tally.count,
+                "db_ms": round(tally.seconds * 1000, 2),
+                "total_ms": round(seconds * 1000, 2)
+            }))
+
+    @staticmethod
+    def server_timing(tally: RequestQueries, seconds: float) -> str:
+        return (
+            f'db;dur={tally.seconds * 1000:.2f};desc="{tally.count} queries", '
+            f"total;dur={seconds * 1000:.2f}"
+        )
+
+    @staticmethod
+    def worst_endpoints(limit: int = 20, sort: str = "avg_queries") -> List[Dict[str, Any]]:
+        """Endpoints ranked by average or maximum query count, or database time"""
+        if sort not in QueryMetrics.SORT_KEYS:
+            raise ValueError(f"sort must be one of {', '.join(QueryMetrics.SORT_KEYS)}")
+        rows = [
+            {
+                "endpoint": endpoint,
+                "requests": stats.requests,
+                "avg_queries": round(stats.queries / stats.requests, 2),
+                "max_queries": stats.max_queries,
+                "avg_db_ms": round(stats.db_seconds * 1000 / stats.requests, 2),
+                "total_db_ms": round(stats.db_seconds * 1000, 2),
+                "avg_ms": round(stats.seconds * 1000 / stats.requests, 2),
+                "errors": stats.errors
+            }
+            for endpoint, stats in list(QueryMetrics._endpoints.items())
+        ]
+        rows.sort(key=lambda row: row[sort], reverse=True)
+        return rows[:limit]
+
+    @staticmethod
+    def reset() -> None:
+        QueryMetrics._endpoints = {}
+
+
+class QueryMetricsMiddleware:
+    """ASGI middleware wrapping each HTTP request in a QueryMetrics tally
+
+    The Server-Timing header covers the queries run before the response
+    starts; the log line and endpoint totals include any run while a
+    streaming body is sent.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        tally, token = QueryMetrics.begin(scope["method"], scope["path"])
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", QueryMetrics.server_timing(tally, time.perf_counter() - started))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            endpoint = f"{scope['method']} {QueryMetricsMiddleware.route_path(scope)}"
+            QueryMetrics.end(token, tally, endpoint, status, time.perf_counter() - started)
+
+    @staticmethod
+    def route_path(scope) -> str:
+        """The matched route's template, e.g. /api/playlists/{playlist_id}; unmatched paths share one bucket"""
+        route = scope.get("route")
+        if route is None:
+            return "(unmatched)"
+        # Routes from include_router may carry only their own path; the prefix
+        # is whatever leading segments of the URL the template does not cover
+        template = [part for part in route.path.split("/") if part]
+        segments = [part for part in scope["path"].split("/") if part]
+        prefix = segments[:max(len(segments) - len(template), 0)]
+        return "".join(f"/{part}" for part in prefix) + route.path
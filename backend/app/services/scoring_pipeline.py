@@ -0,0 +1,299 @@
+from collections import namedtuple
+from typing import List, Dict, Optional, Tuple, Any
+
+import numpy as np
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+
+from app.models import ScoringProfile
+from app.services.harmonic_mixing import HarmonicMixingEngine
+from app.services.tempo_variants import TempoVariants
+
+# A feature term: values in [0, 1] per candidate, optional per-candidate reason
+# tags, and the reason labels for a full (1.0) and partial (0 < v < 1) hit; a
+# label's "{}" is filled with the candidate's tag
+ScoringTerm = namedtuple("ScoringTerm", ["fn", "full_reason", "partial_reason", "description"])
+
+
+def _source_bpm(source) -> float:
+    return source.bpm if source.bpm else np.nan
+
+
+def _effective_bpm(source, columns) -> Tuple[np.ndarray, np.ndarray]:
+    """Candidate BPMs, halved or doubled where that lands closer to the source"""
+    options = np.stack([columns.bpm, columns.bpm * 2, columns.bpm / 2])
+    distance = np.abs(options - _source_bpm(source))
+    choice = np.argmin(np.where(np.isnan(distance), np.inf, distance), axis=0)
+    return options[choice, np.arange(len(columns))], choice
+
+
+def _bpm(source, columns, context):
+    effective, choice = _effective_bpm(source, columns)
+    diff = np.abs(effective - _source_bpm(source))
+    values = np.where(diff < 5, 1.0, 0.0)
+    tags = np.where(choice == 1, "double_time_", np.where(choice == 2, "half_time_", ""))
+    return values, tags
+
+
+def _bpm_match(source, columns, context):
+    return np.where(np.abs(columns.bpm - _source_bpm(source)) < 3, 1.0, 0.0), None
+
+
+def _key_scores(source, columns, pitch: bool) -> Tuple[np.ndarray, np.ndarray]:
+    """Key compatibility per candidate, with key lock off if `pitch` (and the pitched mask)"""
+    n = len(columns)
+    if source.key_code is None:
+        return np.zeros(n), np.zeros(n, dtype=bool)
+
+    known = columns.key_code >= 0
+    to_key = np.clip(columns.key_code, 0, 23)
+    native = HarmonicMixingEngine.COMPATIBILITY_TABLE[source.key_code, to_key]
+    if not pitch or not source.bpm:
+        return np.where(known, native, 0.0), np.zeros(n, dtype=bool)
+
+    effective, _ = _effective_bpm(source, columns)
+    shift = TempoVariants.semitone_shifts(source.bpm, effective)
+    offset = np.where(to_key >= 12, 12, 0)
+    pitched_key = offset + (to_key - offset + 7 * shift) % 12
+    pitched_score = HarmonicMixingEngine.COMPATIBILITY_TABLE[source.key_code, pitched_key]
+    pitched = known & (pitched_score > native)
+    return np.where(known, np.maximum(native, pitched_score), 0.0), pitched
+
+
+def _key(source, columns, context):
+    scores, pitched = _key_scores(source, columns, pitch=True)
+    values = np.where(scores >= 0.8, 1.0, np.where(scores >= 0.5, 0.5, 0.0))
+    return values, np.where(pitched, "pitched_", "")
+
+
+def _key_compatible(source, columns, context):
+    scores, _ = _key_scores(source, columns, pitch=False)
+    return np.where(scores >= 0.8, 1.0, 0.0), None
+
+
+def _same_key(source, columns, context):
+    if source.key_code is None:
+        return np.zeros(len(columns)), None
+    return np.where(columns.key_code == source.key_code, 1.0, 0.0), None
+
+
+def _energy(source, columns, context):
+    n = len(columns)
+    if not source.energy:
+        return np.zeros(n), None
+    diff = columns.energy - source.energy
+    direction = context.get("energy_direction") or "maintain"
+    with np.errstate(invalid="ignore"):
+        if direction == "maintain":
+            hit = np.abs(diff) < 0.1
+        elif direction == "boost":
+            hit = (diff >= 0.1) & (diff <= 0.3)
+        elif direction == "drop":
+            hit = (diff >= -0.3) & (diff <= -0.1)
+        else:
+            hit = np.zeros(n, dtype=bool)
+    # Zero energy counts as unknown, as in FlowEngine.score_transition
+    values = np.where(hit & (columns.energy != 0), 1.0, 0.0)
+    tags = np.full(n, {"maintain": "matched_energy", "boost": "energy_boost", "drop": "energy_drop"}.get(direction, ""))
+    return values, tags
+
+
+def _genre(source, columns, context):
+    code = columns.genres.get(source.genre) if source.genre else None
+    if code is None:
+        return np.zeros(len(columns)), None
+    return np.where(columns.genre == code, 1.0, 0.0), None
+
+
+def _target_energy(source, columns, context):
+    target = context.get("target_energy")
+    if not target:
+        return np.zeros(len(columns)), None
+    with np.errstate(invalid="ignore"):
+        hit = (np.abs(columns.energy - target) < 0.15) & (columns.energy != 0)
+    return np.where(hit, 1.0, 0.0), None
+
+
+def _target_bpm(source, columns, context):
+    target = context.get("target_bpm")
+    if not target:
+        return np.zeros(len(columns)), None
+    with np.errstate(invalid="ignore"):
+        hit = np.abs(columns.bpm - target) < 3
+    return np.where(hit, 1.0, 0.0), None
+
+
+class CompiledScorer:
+    """A weight set bound to its term functions, scoring whole columns at once"""
+
+    def __init__(self, weights: Dict[str, float]):
+        self.weights = weights
+        self.terms = [
+            (name, weight, ScoringPipeline.TERMS[name])
+            for name, weight in weights.items() if weight
+        ]
+
+    def score(self, source, columns, context: Optional[Dict[str, Any]] = None):
+        """Total score per candidate plus each term's weighted contribution"""
+        context = context or {}
+        total = np.zeros(len(columns))
+        parts = []
+        for name, weight, term in self.terms:
+            values, tags = term.fn(source, columns, context)
+            total += weight * values
+            parts.append((term, values, tags))
+        return total, parts
+
+    def rank(
+        self,
+        source,
+        columns,
+        context: Optional[Dict[str, Any]] = None,
+        limit: Optional[int] = None,
+        exclude_ids: Optional[List[str]] = None,
+        min_score: Optional[float] = None
+    ) -> List[Tuple[int, float, str]]:
+        """(column index, score, reasons) for the best candidates, best first"""
+        if not len(columns):
+            return []
+        total, parts = self.score(source, columns, context)
+
+        keep = np.ones(len(columns), dtype=bool)
+        excluded = set(exclude_ids or [])
+        if getattr(source, "id", None) is not None:
+            excluded.add(source.id)
+        if excluded:
+            keep &= np.array([track_id not in excluded for track_id in columns.ids])
+        if min_score is not None:
+            keep &= total > min_score
+
+        candidates = np.flatnonzero(keep)
+        if limit is not None and limit < len(candidates):
+            top = np.argpartition(-total[candidates], limit - 1)[:limit]
+            candidates = np.sort(candidates[top])
+        # Stable on ties, so equal scores keep column order
+        candidates = candidates[np.argsort(-total[candidates], kind="stable")]
+
+        ranked = []
+        for i in candidates:
+            reasons = []
+            for term, values, tags in parts:
+                value = values[i]
+                label = term.full_reason if value >= 1 else term.partial_reason if value > 0 else None
+                if label:
+                    reasons.append(label.format(tags[i] if tags is not None else ""))
+            ranked.append((int(i), float(total[i]), ", ".join(reasons)))
+        return ranked
+
+
+class ScoringPipeline:
+    """One scoring model for every "what plays next" ranking
+
+    A score is a weighted sum of feature terms, each a vectorized function
+    over TrackColumns. A weight set is compiled once into a CompiledScorer.
+    Weights come from a named preset, overridden by the most specific
+    ScoringProfile for the user and event type (or the global profile,
+    e.g. weights learned by TransitionTrainer).
+    """
+
+    TERMS: Dict[str, ScoringTerm] = {
+        "bpm": ScoringTerm(_bpm, "{}smooth_bpm", None, "BPM within 5, counting half/double time"),
+        "bpm_match": ScoringTerm(_bpm_match, "bpm_match", None, "Native BPM within 3"),
+        "key": ScoringTerm(_key, "{}harmonic_match", "{}harmonic_risky",
+                           "Camelot score >= 0.8 (full) or >= 0.5 (half), with key lock on or off"),
+        "key_compatible": ScoringTerm(_key_compatible, "key_compatible", None, "Native Camelot score >= 0.8"),
+        "same_key": ScoringTerm(_same_key, "same_key", None, "Identical key"),
+        "energy": ScoringTerm(_energy, "{}", None,
+                              "Energy change matches the requested direction (maintain, boost, drop)"),
+        "genre": ScoringTerm(_genre, "same_genre", None, "Same genre"),
+        "target_energy": ScoringTerm(_target_energy, "target_energy", None, "Energy within 0.15 of the target"),
+        "target_bpm": ScoringTerm(_target_bpm, "target_bpm", None, "BPM within 3 of the target"),
+    }
+
+    # FlowEngine.score_transition + score_targets
+    DEFAULT_WEIGHTS: Dict[str, float] = {
+        "bpm": 0.4,
+        "key": 0.2,
+        "energy": 0.3,
+        "genre": 0.1,
+        "target_energy": 0.2,
+        "target_bpm": 0.1,
+    }
+
+    PRESETS: Dict[str, Dict[str, float]] = {
+        "flow": DEFAULT_WEIGHTS,
+        # Quick "what mixes with this" lookup: tight tempo and native key only
+        "compatible": {"bpm_match": 0.5, "key_compatible": 0.5},
+    }
+
+    _compiled: Dict[Tuple[Tuple[str, float], ...], CompiledScorer] = {}
+
+    @staticmethod
+    def validate(weights: Dict[str, float]) -> None:
+        for name, weight in weights.items():
+            if name not in ScoringPipeline.TERMS:
+                raise ValueError(f"Unknown scoring term: {name}")
+            if weight is None or weight < 0:
+                raise ValueError(f"Weight for {name} must be zero or positive")
+
+    @staticmethod
+    def compile(weights: Optional[Dict[str, float]] = None) -> CompiledScorer:
+        """Compile (and cache) a scorer for a weight set; raises ValueError on bad weights"""
+        weights = weights if weights is not None else ScoringPipeline.DEFAULT_WEIGHTS
+        key = tuple(sorted(weights.items()))
+        scorer = ScoringPipeline._compiled.get(key)
+        if scorer is None:
+            ScoringPipeline.validate(weights)
+            scorer = CompiledScorer(dict(weights))
+            ScoringPipeline._compiled[key] = scorer
+        return scorer
+
+    @staticmethod
+    def find_profile(
+        db: Session,
+        user_id: Optional[str] = None,
+        event_type_id: Optional[str] = None
+    ) -> Optional[ScoringProfile]:
+        """Most specific profile: user + event type, user, event type, then the global one"""
+        conditions = [and_(ScoringProfile.user_id.is_(None), ScoringProfile.event_type_id.is_(None))]
+        if user_id:
+            conditions.append(ScoringProfile.user_id == user_id)
+        if event_type_id:
+            conditions.append(ScoringProfile.event_type_id == event_type_id)
+        profiles = db.query(ScoringProfile).filter(or_(*conditions)).all()
+
+        def rank(profile: ScoringProfile) -> int:
+            if profile.user_id and profile.user_id != user_id:
+                return -1
+            if profile.event_type_id and profile.event_type_id != event_type_id:
+                return -1
+            return 2 * bool(profile.user_id) + bool(profile.event_type_id)
+
+        ranked = [(rank(p), p) for p in profiles]
+        ranked = [(r, p) for r, p in ranked if r >= 0]
+        return max(ranked, key=lambda x: x[0])[1] if ranked else None
+
+    @staticmethod
+    def resolve_weights(
+        db: Session,
+        user_id: Optional[str] = None,
+        event_type_id: Optional[str] = None,
+        preset: str = "flow"
+    ) -> Dict[str, float]:
+        """A preset's weights with the most specific profile's overrides applied"""
+        weights = dict(ScoringPipeline.PRESETS[preset])
+        profile = ScoringPipeline.find_profile(db, user_id, event_type_id)
+        if profile and profile.weights:
+            weights.update(profile.weights)
+        return weights
+
+    @staticmethod
+    def describe_terms() -> List[Dict[str, Any]]:
+        return [
+            {
+                "name": name,
+                "description": term.description,
+                "default_weight": ScoringPipeline.DEFAULT_WEIGHTS.get(name, 0.0)
+            }
+            for name, term in ScoringPipeline.TERMS.items()
+        ]
@@ -0,0 +1,259 @@
+from collections import namedtuple
+from typing import List, Dict, Optional, Tuple, Any
+
+import numpy as np
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from app.models import CacheVersion, Set, SetTrack, Track
+from app.services.cache_versions import CacheVersions
+
+# One set track with the columns the energy curve reads
+CurveEntry = namedtuple("CurveEntry", ["set_track_id", "track_id", "energy", "bpm", "duration", "envelope"])
+
+
+class SetCurve:
+    """A set's energy curve and drops, maintained incrementally
+
+    Matches FlowEngine.build_energy_curve / detect_energy_drops: tracks
+    without a duration or energy are skipped on the curve but still count
+    as positions. Inserting, removing or moving one track only shifts the
+    points after it and rechecks the drops next to it.
+    """
+
+    # Same threshold as FlowEngine.detect_energy_drops
+    DROP_THRESHOLD = 0.2
+
+    def __init__(self, set_id: str, version: int):
+        self.set_id = set_id
+        self.version = version
+        # (Set.version, library version) the curve reflects
+        self.source: Optional[Tuple[int, int]] = None
+        self.entries: List[CurveEntry] = []
+        self.positions: List[int] = []  # SetTrack.position for each entry
+        self.points: List[Dict[str, Any]] = []
+        self.durations: List[int] = []  # Duration of each curve point
+        self.envelopes: List[List[float]] = []  # Energy envelope of each curve point
+        self.drop_flags: List[bool] = []
+        self.total_duration = 0
+
+    @staticmethod
+    def _on_curve(entry: CurveEntry) -> bool:
+        return bool(entry.duration and entry.energy)
+
+    def _point_index(self, entry_index: int) -> int:
+        """Index of the first curve point at or after an entry index"""
+        for i, point in enumerate(self.points):
+            if point["position"] >= entry_index:
+                return i
+        return len(self.points)
+
+    def _check_drops(self, *indices: int) -> None:
+        for i in indices:
+            if 0 < i < len(self.points):
+                energy_diff = self.points[i]["energy"] - self.points[i - 1]["energy"]
+                self.drop_flags[i] = energy_diff < -SetCurve.DROP_THRESHOLD
+            elif i == 0 and self.points:
+                self.drop_flags[0] = False
+
+    def insert(self, index: int, position: int, entry: CurveEntry) -> None:
+        """Insert a set track at an entry index"""
+        self.entries.insert(index, entry)
+        self.positions.insert(index, position)
+        self.total_duration += entry.duration or 0
+
+        p = self._point_index(index)
+        for point in self.points[p:]:
+            point["position"] += 1
+
+        if SetCurve._on_curve(entry):
+            time = self.points[p - 1]["time"] + self.durations[p - 1] if p else 0
+            self.points.insert(p, {
+                "position": index,
+                "track_id": entry.track_id,
+                "time": time,
+                "energy": entry.energy,
+                "bpm": entry.bpm
+            })
+            self.durations.insert(p, entry.duration)
+            self.envelopes.insert(p, entry.envelope or [entry.energy])
+            self.drop_flags.insert(p, False)
+            for point in self.points[p + 1:]:
+                point["time"] += entry.duration
+            self._check_drops(p, p + 1)
+
+    def remove(self, index: int) -> CurveEntry:
+        """Remove the set track at an entry index"""
+        entry = self.entries.pop(index)
+        self.positions.pop(index)
+        self.total_duration -= entry.duration or 0
+
+        p = self._point_index(index)
+        if p < len(self.points) and self.points[p]["position"] == index:
+            self.points.pop(p)
+            self.durations.pop(p)
+            self.envelopes.pop(p)
+            self.drop_flags.pop(p)
+            for point in self.points[p:]:
+                point["time"] -= entry.duration
+            self._check_drops(p)
+        for point in self.points[p:]:
+            point["position"] -= 1
+
+        return entry
+
+    def index_of(self, set_track_id: str) -> Optional[int]:
+        for i, entry in enumerate(self.entries):
+            if entry.set_track_id == set_track_id:
+                return i
+        return None
+
+    def add(self, position: int, entry: CurveEntry) -> None:
+        """Add a set track by its SetTrack.position (a key between its neighbours', see Positions)"""
+        index = next((i for i, existing in enumerate(self.positions) if existing > position), len(self.positions))
+        self.insert(index, position, entry)
+
+    def move(self, set_track_id: str, new_index: int, position: int) -> None:
+        """Move a set track to an entry index, where it now has SetTrack.position position"""
+        index = self.index_of(set_track_id)
+        if index is None:
+            return
+        entry = self.remove(index)
+        self.insert(min(new_index, len(self.entries)), position, entry)
+
+    @property
+    def drops(self) -> List[int]:
+        return [i for i, flag in enumerate(self.drop_flags) if flag]
+
+    def timeline(self, points: int = 200) -> List[Dict[str, float]]:
+        """Time-resolved curve from per-track energy envelopes, resampled to `points`"""
+        if not self.points or points < 1:
+            return []
+
+        starts = np.array([p["time"] for p in self.points], dtype=np.float64)
+        durations = np.array(self.durations, dtype=np.float64)
+        lengths = np.array([len(e) for e in self.envelopes], dtype=np.int64)
+        offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        samples = np.concatenate([np.asarray(e, dtype=np.float64) for e in self.envelopes])
+
+        total = starts[-1] + durations[-1]
+        times = (np.arange(points) + 0.5) * total / points
+        point_idx = np.searchsorted(starts, times, side="right") - 1
+        fraction = (times - starts[point_idx]) / durations[point_idx]
+        sample_idx = np.minimum((fraction * lengths[point_idx]).astype(np.int64), lengths[point_idx] - 1)
+        energies = samples[offsets[point_idx] + sample_idx]
+
+        return [
+            {"time": round(float(t), 1), "energy": round(float(e), 3)}
+            for t, e in zip(times, energies)
+        ]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "curve": self.points,
+            "drops": self.drops,
+            "total_duration": self.total_duration,
+            "version": self.version
+        }
+
+
+class SetCurves:
+    """Cache of per-set energy curves
+
+    A cached curve remembers the set's stored version (bumped by every write
+    to its order, see bump()) and the library version it was built at, and
+    get() compares both with the database, so a curve is never served stale
+    after a write in another worker. The sets router reports single-track
+    adds, removes and moves so this process's cached curves are patched in
+    place; any other write to a set's order, including a Positions
+    rebalance, should bump() and then invalidate().
+    """
+
+    _cached: Dict[str, SetCurve] = {}
+    # Stamp handed to each build or edit, so clients can tell curves apart
+    _next_version = 0
+
+    @staticmethod
+    def _stamp() -> int:
+        SetCurves._next_version += 1
+        return SetCurves._next_version
+
+    @staticmethod
+    def bump(db: Session, set_id: str) -> int:
+        """Count a change to a set's order (without committing); returns the set's new version"""
+        return db.execute(
+            update(Set).where(Set.id == set_id).values(version=Set.version + 1)
+            .returning(Set.version)
+            .execution_options(synchronize_session=False)
+        ).scalar()
+
+    @staticmethod
+    def _source(db: Session, set_id: str) -> Optional[Tuple[int, int]]:
+        library = select(CacheVersion.version).where(CacheVersion.name == CacheVersions.LIBRARY).scalar_subquery()
+        row = db.execute(select(Set.version, library).where(Set.id == set_id)).first()
+        return tuple(row) if row else None
+
+    @staticmethod
+    def get(db: Session, set_id: str) -> SetCurve:
+        """Get a set's curve: one version check when cached, one more query to load it"""
+        source = SetCurves._source(db, set_id)
+        curve = SetCurves._cached.get(set_id)
+        if curve is None or curve.source != source:
+            rows = db.query(
+                SetTrack.id, SetTrack.position, Track.id, Track.energy,
+                Track.bpm, Track.duration, Track.energy_envelope
+            ).join(
+                Track, Track.id == SetTrack.track_id
+            ).filter(
+                SetTrack.set_id == set_id
+            ).order_by(SetTrack.position).all()
+
+            curve = SetCurve(set_id, SetCurves._stamp())
+            curve.source = source
+            for set_track_id, position, track_id, energy, bpm, duration, envelope in rows:
+                curve.insert(
+                    len(curve.entries),
+                    position,
+                    CurveEntry(set_track_id, track_id, energy, bpm, duration, envelope)
+                )
+            SetCurves._cached[set_id] = curve
+        return curve
+
+    @staticmethod
+    def _patchable(set_id: str, version: int) -> Optional[SetCurve]:
+        """The cached curve, if this write (now at version) is the only one since it was built"""
+        curve = SetCurves._cached.get(set_id)
+        if curve is None:
+            return None
+        if curve.source is None or curve.source[0] != version - 1:
+            SetCurves._cached.pop(set_id, None)
+            return None
+        curve.source = (version, curve.source[1])
+        curve.version = SetCurves._stamp()
+        return curve
+
+    @staticmethod
+    def track_added(set_id: str, version: int, set_track: SetTrack, track: Track) -> None:
+        curve = SetCurves._patchable(set_id, version)
+        if curve is not None:
+            curve.add(set_track.position, CurveEntry(
+                set_track.id, track.id, track.energy, track.bpm, track.duration, track.energy_envelope
+            ))
+
+    @staticmethod
+    def track_removed(set_id: str, version: int, set_track_id: str) -> None:
+        curve = SetCurves._patchable(set_id, version)
+        if curve is not None:
+            index = curve.index_of(set_track_id)
+            if index is not None:
+                curve.remove(index)
+
+    @staticmethod
+    def track_moved(set_id: str, version: int, set_track_id: str, new_index: int, position: int) -> None:
+        curve = SetCurves._patchable(set_id, version)
+        if curve is not None:
+            curve.move(set_track_id, new_index, position)
+
+    @staticmethod
+    def invalidate(set_id: str) -> None:
+        SetCurves._cached.pop(set_id, None)
@@ -0,0 +1,185 @@
+import json
+from typing import List, Dict, Optional, Any
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.models import Set, SetTrack, Track, EventType
+from app.services.harmonic_mixing import HarmonicMixingEngine
+from app.services.tempo_variants import TempoVariants
+
+
+class SetReport:
+    """Whole-set quality report computed as array operations
+
+    The set is loaded with one query; every transition's BPM delta, key
+    transition, energy delta and distance from the event type's energy
+    curve is then computed across all transitions at once.
+    """
+
+    # Penalty ramps: no penalty at the first value, full penalty at the second
+    BPM_RAMP = (2.0, 10.0)  # Same bands as FlowEngine.calculate_bpm_transition
+    ENERGY_RAMP = (0.2, 0.5)  # 0.2 is FlowEngine.detect_energy_drops' threshold
+    CURVE_RAMP = (0.1, 0.4)
+    WEIGHTS = {"bpm": 0.3, "key": 0.35, "energy": 0.2, "curve": 0.15}
+    # Transitions whose weighted penalty reaches this are reported as problems
+    PROBLEM_THRESHOLD = 0.25
+
+    @staticmethod
+    def parse_energy_curve(energy_curve: Any) -> Optional[List[float]]:
+        """Event type energy curves are stored as JSON text, a list or a dict of points"""
+        if isinstance(energy_curve, str):
+            try:
+                energy_curve = json.loads(energy_curve)
+            except ValueError:
+                return None
+        if isinstance(energy_curve, dict):
+            energy_curve = energy_curve.get("points") or energy_curve.get("curve") or list(energy_curve.values())
+        if not isinstance(energy_curve, list):
+            return None
+        values = [float(v) for v in energy_curve if isinstance(v, (int, float))]
+        return values or None
+
+    @staticmethod
+    def _ramp(values: np.ndarray, ramp: tuple) -> np.ndarray:
+        low, high = ramp
+        return np.clip((values - low) / (high - low), 0.0, 1.0)
+
+    @staticmethod
+    def load(db: Session, set_id: str) -> Dict[str, Any]:
+        """Load a set's tracks in order, plus its event type's energy curve"""
+        rows = db.query(
+            Track.id, Track.title, Track.artist, Track.bpm,
+            Track.key_code, Track.energy, Track.duration
+        ).join(
+            SetTrack, SetTrack.track_id == Track.id
+        ).filter(
+            SetTrack.set_id == set_id
+        ).order_by(SetTrack.position).all()
+
+        energy_curve = db.query(EventType.energy_curve).join(
+            Set, Set.event_type_id == EventType.id
+        ).filter(Set.id == set_id).scalar()
+
+        return {"rows": rows, "target_curve": SetReport.parse_energy_curve(energy_curve)}
+
+    @staticmethod
+    def build(rows: List[tuple], target_curve: Optional[List[float]] = None) -> Dict[str, Any]:
+        """Score every transition in a set and rank the problem ones"""
+        n = len(rows)
+        track_ids = [r[0] for r in rows]
+        bpm = np.array([r[3] if r[3] else np.nan for r in rows], dtype=np.float64)
+        key = np.array([r[4] if r[4] is not None else -1 for r in rows], dtype=np.int64)
+        energy = np.array([r[5] if r[5] is not None else np.nan for r in rows], dtype=np.float64)
+        duration = np.array([r[6] or 0 for r in rows], dtype=np.float64)
+
+        # Where each track sits in the set (0..1), by time when durations are known
+        starts = np.concatenate(([0.0], np.cumsum(duration)[:-1])) if n else np.zeros(0)
+        total = duration.sum()
+        if total > 0:
+            progress = (starts + duration / 2) / total
+        else:
+            progress = (np.arange(n) + 0.5) / max(n, 1)
+
+        curve_deviation = np.full(n, np.nan)
+        if target_curve and n:
+            target = np.interp(progress, np.linspace(0.0, 1.0, len(target_curve)), target_curve)
+            curve_deviation = energy - target
+
+        if n < 2:
+            return SetReport._summarize(track_ids, rows, curve_deviation, [], np.zeros(0), {})
+
+        a, b = slice(0, n - 1), slice(1, n)
+
+        # BPM: compare against the target's half/double time if that is closer
+        options = np.stack([bpm[b], bpm[b] * 2, bpm[b] / 2])
+        distance = np.abs(options - bpm[a])
+        choice = np.argmin(np.where(np.isnan(distance), np.inf, distance), axis=0)
+        effective_bpm = options[choice, np.arange(n - 1)]
+        bpm_delta = effective_bpm - bpm[a]
+
+        # Key: best of key lock on and off (pitching moves 7 Camelot steps per semitone)
+        known_key = (key[a] >= 0) & (key[b] >= 0)
+        from_key, to_key = np.clip(key[a], 0, 23), np.clip(key[b], 0, 23)
+        shift = TempoVariants.semitone_shifts(bpm[a], effective_bpm)
+        offset = np.where(to_key >= 12, 12, 0)
+        pitched_key = offset + (to_key - offset + 7 * shift) % 12
+        native_score = HarmonicMixingEngine.COMPATIBILITY_TABLE[from_key, to_key]
+        pitched_score = HarmonicMixingEngine.COMPATIBILITY_TABLE[from_key, pitched_key]
+        pitched = pitched_score > native_score
+        played_key = np.where(pitched, pitched_key, to_key)
+        key_score = np.where(known_key, np.maximum(native_score, pitched_score), np.nan)
+        transition_type = np.where(known_key, HarmonicMixingEngine.TRANSITION_TYPE_TABLE[from_key, played_key], -1)
+
+        energy_delta = energy[b] - energy[a]
+
+        penalties = {
+            "bpm": np.nan_to_num(SetReport._ramp(np.abs(bpm_delta), SetReport.BPM_RAMP)),
+            "key": np.nan_to_num(1.0 - key_score),
+            "energy": np.nan_to_num(SetReport._ramp(np.abs(energy_delta), SetReport.ENERGY_RAMP)),
+            "curve": np.nan_to_num(SetReport._ramp(np.abs(curve_deviation[b]), SetReport.CURVE_RAMP)),
+        }
+        severity = sum(SetReport.WEIGHTS[name] * p for name, p in penalties.items())
+
+        transitions = [
+            {
+                "position": i + 1,
+                "from_track_id": track_ids[i],
+                "to_track_id": track_ids[i + 1],
+                "bpm_delta": None if np.isnan(bpm_delta[i]) else round(float(bpm_delta[i]), 2),
+                "tempo": ("half_time" if choice[i] == 2 else "double_time" if choice[i] == 1 else "native"),
+                "transition_type": HarmonicMixingEngine.TRANSITION_TYPES[transition_type[i]] if transition_type[i] >= 0 else "unknown",
+                "pitched": bool(pitched[i] and known_key[i]),
+                "key_score": None if np.isnan(key_score[i]) else round(float(key_score[i]), 3),
+                "energy_delta": None if np.isnan(energy_delta[i]) else round(float(energy_delta[i]), 3),
+                "curve_deviation": None if np.isnan(curve_deviation[i + 1]) else round(float(curve_deviation[i + 1]), 3),
+                "severity": round(float(severity[i]), 3)
+            }
+            for i in range(n - 1)
+        ]
+        return SetReport._summarize(track_ids, rows, curve_deviation, transitions, severity, penalties)
+
+    @staticmethod
+    def _issues(transition: Dict[str, Any]) -> List[str]:
+        issues = []
+        if transition["bpm_delta"] is not None and abs(transition["bpm_delta"]) >= SetReport.BPM_RAMP[0]:
+            issues.append("bpm_jump")
+        if transition["transition_type"] in ("risky", "clash"):
+            issues.append(f"key_{transition['transition_type']}")
+        if transition["energy_delta"] is not None:
+            if transition["energy_delta"] < -SetReport.ENERGY_RAMP[0]:
+                issues.append("energy_drop")
+            elif transition["energy_delta"] > SetReport.ENERGY_RAMP[0]:
+                issues.append("energy_spike")
+        if transition["curve_deviation"] is not None and abs(transition["curve_deviation"]) >= SetReport.CURVE_RAMP[0]:
+            issues.append("off_curve")
+        return issues
+
+    @staticmethod
+    def _summarize(
+        track_ids: List[str],
+        rows: List[tuple],
+        curve_deviation: np.ndarray,
+        transitions: List[Dict[str, Any]],
+        severity: np.ndarray,
+        penalties: Dict[str, np.ndarray]
+    ) -> Dict[str, Any]:
+        problems = []
+        for transition in transitions:
+            if transition["severity"] >= SetReport.PROBLEM_THRESHOLD:
+                problems.append({**transition, "issues": SetReport._issues(transition)})
+        problems.sort(key=lambda t: t["severity"], reverse=True)
+
+        known_deviation = curve_deviation[~np.isnan(curve_deviation)]
+        return {
+            "track_count": len(track_ids),
+            "transition_count": len(transitions),
+            "quality_score": round(100 * (1 - float(severity.mean())), 1) if len(severity) else None,
+            "component_scores": {
+                name: round(100 * (1 - float(p.mean())), 1) for name, p in penalties.items()
+            },
+            "energy_fit": round(float(np.abs(known_deviation).mean()), 3) if len(known_deviation) else None,
+            "total_duration": int(sum(r[6] or 0 for r in rows)),
+            "problems": problems,
+            "transitions": transitions
+        }
@@ -0,0 +1,178 @@
+from typing import List, Dict, Optional, Set, Callable, Any, Tuple
+
+from sqlalchemy import func, insert
+from sqlalchemy.orm import Session
+
+from app.models import Track, SmartCrate, SmartCrateTrack
+from app.services.cache_versions import CacheVersions
+from app.services.harmonic_mixing import HarmonicMixingEngine
+
+
+class SmartCrates:
+    """Rule-based crates with materialized membership
+
+    Each crate's rules compile to SQL filters (for a full evaluation) and to
+    an in-memory predicate (for re-checking one changed track). Membership
+    is stored in smart_crate_tracks and mirrored per process as sets of
+    track IDs, so opening a crate or testing membership only checks the
+    shared crates version (CacheVersions) before reading the mirror.
+    """
+
+    _members: Dict[str, Set[str]] = {}
+    _predicates: Dict[str, Callable[[Any], bool]] = {}
+    _loaded_version: Optional[int] = None
+
+    @staticmethod
+    def compile(rules: Dict[str, Any]) -> Tuple[List, Callable[[Any], bool]]:
+        """Compile crate rules to SQL filters and an equivalent predicate
+
+        Raises ValueError for keys that are not Camelot or musical keys.
+        """
+        filters = []
+        checks: List[Callable[[Any], bool]] = []
+
+        bpm_min, bpm_max = rules.get("bpm_min"), rules.get("bpm_max")
+        if bpm_min is not None:
+            filters.append(Track.bpm >= bpm_min)
+            checks.append(lambda t: t.bpm is not None and t.bpm >= bpm_min)
+        if bpm_max is not None:
+            filters.append(Track.bpm <= bpm_max)
+            checks.append(lambda t: t.bpm is not None and t.bpm <= bpm_max)
+
+        if rules.get("keys"):
+            key_codes = set()
+            for key in rules["keys"]:
+                code = HarmonicMixingEngine.key_code(key)
+                if code is None:
+                    raise ValueError(f"Invalid key: {key}")
+                key_codes.add(code)
+            filters.append(Track.key_code.in_(sorted(key_codes)))
+            checks.append(lambda t: t.key_code in key_codes)
+
+        energy_min, energy_max = rules.get("energy_min"), rules.get("energy_max")
+        if energy_min is not None:
+            filters.append(Track.energy >= energy_min)
+            checks.append(lambda t: t.energy is not None and t.energy >= energy_min)
+        if energy_max is not None:
+            filters.append(Track.energy <= energy_max)
+            checks.append(lambda t: t.energy is not None and t.energy <= energy_max)
+
+        # Text rules match case-insensitively
+        for field, column in (("genres", Track.genre), ("moods", Track.mood), ("artists", Track.artist)):
+            if rules.get(field):
+                values = {v.lower() for v in rules[field]}
+                filters.append(func.lower(column).in_(sorted(values)))
+                checks.append(lambda t, name=column.key, values=values: (getattr(t, name) or "").lower() in values)
+
+        return filters, lambda track: all(check(track) for check in checks)
+
+    @staticmethod
+    def _ensure_loaded(db: Session) -> None:
+        version = CacheVersions.get(db, CacheVersions.CRATES)
+        if SmartCrates._loaded_version == version:
+            return
+        members: Dict[str, Set[str]] = {}
+        predicates = {}
+        for crate in db.query(SmartCrate).all():
+            predicates[crate.id] = SmartCrates.compile(crate.rules or {})[1]
+            members[crate.id] = set()
+        for crate_id, track_id in db.query(SmartCrateTrack.crate_id, SmartCrateTrack.track_id).all():
+            members.setdefault(crate_id, set()).add(track_id)
+        SmartCrates._members = members
+        SmartCrates._predicates = predicates
+        SmartCrates._loaded_version = version
+
+    @staticmethod
+    def _changed(db: Session) -> bool:
+        """Bump the crates version for this process's write; False if another worker wrote since the mirror loaded
+
+        The mirror is then left to reload on its next read instead of being patched.
+        """
+        version = CacheVersions.bump(db, CacheVersions.CRATES)
+        if SmartCrates._loaded_version == version - 1:
+            SmartCrates._loaded_version = version
+            return True
+        SmartCrates._loaded_version = None
+        return False
+
+    @staticmethod
+    def evaluate(db: Session, crate: SmartCrate) -> int:
+        """Re-run a crate's rules over the whole library (after create or a rule change)"""
+        SmartCrates._ensure_loaded(db)
+        filters, predicate = SmartCrates.compile(crate.rules or {})
+
+        track_ids = [row[0] for row in db.query(Track.id).filter(*filters).all()]
+        db.query(SmartCrateTrack).filter(SmartCrateTrack.crate_id == crate.id).delete(synchronize_session=False)
+        if track_ids:
+            db.execute(insert(SmartCrateTrack), [{"crate_id": crate.id, "track_id": t} for t in track_ids])
+        current = SmartCrates._changed(db)
+        db.commit()
+
+        if current:
+            SmartCrates._predicates[crate.id] = predicate
+            SmartCrates._members[crate.id] = set(track_ids)
+        return len(track_ids)
+
+    @staticmethod
+    def forget(db: Session, crate_id: str) -> None:
+        """Drop a crate's membership (call before deleting the crate row)"""
+        db.query(SmartCrateTrack).filter(SmartCrateTrack.crate_id == crate_id).delete(synchronize_session=False)
+        if SmartCrates._changed(db):
+            SmartCrates._predicates.pop(crate_id, None)
+            SmartCrates._members.pop(crate_id, None)
+
+    @staticmethod
+    def track_changed(db: Session, track: Track) -> None:
+        """Re-check one created or re-analyzed track against every crate"""
+        SmartCrates._ensure_loaded(db)
+        added, removed = [], []
+        for crate_id, predicate in SmartCrates._predicates.items():
+            members = SmartCrates._members[crate_id]
+            matches = predicate(track)
+            if matches and track.id not in members:
+                added.append(crate_id)
+            elif not matches and track.id in members:
+                removed.append(crate_id)
+
+        if not added and not removed:
+            return
+        if added:
+            db.execute(insert(SmartCrateTrack), [{"crate_id": c, "track_id": track.id} for c in added])
+        if removed:
+            db.query(SmartCrateTrack).filter(
+                SmartCrateTrack.track_id == track.id,
+                SmartCrateTrack.crate_id.in_(removed)
+            ).delete(synchronize_session=False)
+        current = SmartCrates._changed(db)
+        db.commit()
+
+        if current:
+            for crate_id in added:
+                SmartCrates._members[crate_id].add(track.id)
+            for crate_id in removed:
+                SmartCrates._members[crate_id].discard(track.id)
+
+    @staticmethod
+    def track_removed(db: Session, track_id: str) -> None:
+        """Not committed: see LibraryEvents.track_deleted"""
+        SmartCrates._ensure_loaded(db)
+        removed = db.query(SmartCrateTrack).filter(SmartCrateTrack.track_id == track_id).delete(synchronize_session=False)
+        if not removed:
+            return
+        if SmartCrates._changed(db):
+            for members in SmartCrates._members.values():
+                members.discard(track_id)
+
+    @staticmethod
+    def members(db: Session, crate_id: str) -> Set[str]:
+        SmartCrates._ensure_loaded(db)
+        return SmartCrates._members.get(crate_id, set())
+
+    @staticmethod
+    def contains(db: Session, crate_id: str, track_id: str) -> bool:
+        return track_id in SmartCrates.members(db, crate_id)
+
+    @staticmethod
+    def crates_for_track(db: Session, track_id: str) -> List[str]:
+        SmartCrates._ensure_loaded(db)
+        return [crate_id for crate_id, members in SmartCrates._members.items() if track_id in members]
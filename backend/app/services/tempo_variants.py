@@ -0,0 +1,177 @@
+import math
+from typing import List, Dict, Optional, Tuple, Any
+
+import numpy as np
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app.models import Track, TrackVariant
+from app.services.harmonic_mixing import HarmonicMixingEngine
+
+
+class TempoVariants:
+    """Half/double-time and pitch-shift aware "playable as" variants
+
+    Pitching a track by one semitone (~6%) without key lock moves it 7 steps
+    around the Camelot wheel; half or double time leaves the key alone. Each
+    track's variants are stored in track_variants, indexed by (key_code, bpm),
+    so a "what can I play at 128 BPM in 8A" query is a single range scan.
+    """
+
+    SEMITONE_RATIO = 2 ** (1 / 12)
+    # A tempo change only lands in another key within this many semitones of
+    # a whole shift; in between (e.g. ~3% = half a semitone) it is just detuned
+    SHIFT_TOLERANCE = 0.25
+    MIN_BPM = 60.0
+    MAX_BPM = 200.0
+
+    @staticmethod
+    def shift_key_code(key_code: Optional[int], semitones: int) -> Optional[int]:
+        """Key code after pitching by whole semitones (7 Camelot steps each)"""
+        if key_code is None:
+            return None
+        letter_offset = 12 if key_code >= 12 else 0
+        return letter_offset + (key_code - letter_offset + 7 * semitones) % 12
+
+    @staticmethod
+    def effective_bpm(from_bpm: Optional[float], to_bpm: Optional[float]) -> Optional[float]:
+        """The target's BPM, halved or doubled if that lands closer to the source"""
+        if not from_bpm or not to_bpm:
+            return to_bpm
+        return min((to_bpm, to_bpm * 2, to_bpm / 2), key=lambda bpm: abs(bpm - from_bpm))
+
+    @staticmethod
+    def semitone_shift(from_bpm: Optional[float], to_bpm: Optional[float]) -> int:
+        """Whole semitones the target moves when beatmatched to the source with key lock off
+
+        0 unless the shift is within SHIFT_TOLERANCE of a whole semitone.
+        """
+        if not from_bpm or not to_bpm:
+            return 0
+        exact = 12 * math.log2(from_bpm / to_bpm)
+        shift = round(exact)
+        return shift if abs(exact - shift) <= TempoVariants.SHIFT_TOLERANCE else 0
+
+    @staticmethod
+    def semitone_shifts(from_bpm, to_bpm) -> np.ndarray:
+        """semitone_shift over arrays (0 where either BPM is missing)"""
+        with np.errstate(invalid="ignore", divide="ignore"):
+            exact = 12 * np.log2(np.asarray(from_bpm, dtype=np.float64) / np.asarray(to_bpm, dtype=np.float64))
+        exact = np.nan_to_num(exact, nan=0.0, posinf=0.0, neginf=0.0)
+        shift = np.round(exact)
+        return np.where(np.abs(exact - shift) <= TempoVariants.SHIFT_TOLERANCE, shift, 0).astype(np.int64)
+
+    @staticmethod
+    def best_key_score(
+        from_key_code: Optional[int],
+        to_key_code: Optional[int],
+        from_bpm: Optional[float] = None,
+        to_bpm: Optional[float] = None
+    ) -> Tuple[float, int]:
+        """Best key score with key lock on or off, and the pitch shift that gets it"""
+        native = HarmonicMixingEngine.score_key_codes(from_key_code, to_key_code)
+        shift = TempoVariants.semitone_shift(from_bpm, to_bpm)
+        if shift == 0:
+            return native, 0
+        pitched = HarmonicMixingEngine.score_key_codes(
+            from_key_code,
+            TempoVariants.shift_key_code(to_key_code, shift)
+        )
+        return (pitched, shift) if pitched > native else (native, 0)
+
+    @staticmethod
+    def playable_as(bpm: Optional[float], key_code: Optional[int]) -> List[Dict[str, Any]]:
+        """A track's native, half/double-time and ±1 semitone variants"""
+        if not bpm:
+            return [{"kind": "native", "bpm": bpm, "key_code": key_code, "pitch_shift": 0}] if key_code is not None else []
+
+        variants = [
+            ("native", bpm, key_code, 0),
+            ("half_time", bpm / 2, key_code, 0),
+            ("double_time", bpm * 2, key_code, 0),
+            ("pitch_up", bpm * TempoVariants.SEMITONE_RATIO, TempoVariants.shift_key_code(key_code, 1), 1),
+            ("pitch_down", bpm / TempoVariants.SEMITONE_RATIO, TempoVariants.shift_key_code(key_code, -1), -1),
+        ]
+        return [
+            {"kind": kind, "bpm": round(v_bpm, 3), "key_code": v_key, "pitch_shift": shift}
+            for kind, v_bpm, v_key, shift in variants
+            if kind == "native" or TempoVariants.MIN_BPM <= v_bpm <= TempoVariants.MAX_BPM
+        ]
+
+    @staticmethod
+    def sync_track(db: Session, track: Track) -> None:
+        """Recompute one track's variants after it is created or re-analyzed"""
+        db.query(TrackVariant).filter(TrackVariant.track_id == track.id).delete(synchronize_session=False)
+        rows = [
+            {"track_id": track.id, **variant}
+            for variant in TempoVariants.playable_as(track.bpm, track.key_code)
+        ]
+        if rows:
+            db.execute(insert(TrackVariant), rows)
+        db.commit()
+
+    @staticmethod
+    def remove_track(db: Session, track_id: str) -> None:
+        """Not committed: see LibraryEvents.track_deleted"""
+        db.query(TrackVariant).filter(TrackVariant.track_id == track_id).delete(synchronize_session=False)
+
+    @staticmethod
+    def rebuild(db: Session) -> int:
+        """Recompute variants for the whole library
+
+        Rows go in track id order so the (track_id, kind) key only ever appends.
+        """
+        db.query(TrackVariant).delete(synchronize_session=False)
+        rows = [
+            {"track_id": track_id, **variant}
+            for track_id, bpm, key_code in db.query(Track.id, Track.bpm, Track.key_code).order_by(Track.id).all()
+            for variant in TempoVariants.playable_as(bpm, key_code)
+        ]
+        if rows:
+            # Core executemany; the ORM bulk path costs more than the insert itself here
+            db.execute(insert(TrackVariant.__table__), rows)
+        db.commit()
+        return len(rows)
+
+    @staticmethod
+    def ensure_built(db: Session) -> None:
+        """Build the variant index on first start against an existing library"""
+        if db.query(TrackVariant.track_id).first() is None and db.query(Track.id).first() is not None:
+            TempoVariants.rebuild(db)
+
+    @staticmethod
+    def find_playable(
+        db: Session,
+        bpm: float,
+        key_code: Optional[int] = None,
+        bpm_tolerance: float = 2.0,
+        harmonic: bool = True,
+        exclude_id: Optional[str] = None,
+        limit: int = 50
+    ) -> List[Tuple[Track, TrackVariant, float]]:
+        """Tracks with a variant near a BPM (and compatible with a key), best first"""
+        query = db.query(Track, TrackVariant).join(
+            TrackVariant, TrackVariant.track_id == Track.id
+        ).filter(
+            TrackVariant.bpm.between(bpm - bpm_tolerance, bpm + bpm_tolerance)
+        )
+        if exclude_id:
+            query = query.filter(Track.id != exclude_id)
+
+        key_scores = None
+        if key_code is not None:
+            row = HarmonicMixingEngine.COMPATIBILITY_TABLE[key_code]
+            min_score = 0.8 if harmonic else 1.0
+            key_scores = {code: float(row[code]) for code in range(24) if row[code] >= min_score}
+            query = query.filter(TrackVariant.key_code.in_(list(key_scores)))
+
+        # Keep each track's best variant: key score, then native before shifted, then BPM distance
+        best: Dict[str, Tuple[Tuple, Track, TrackVariant, float]] = {}
+        for track, variant in query.all():
+            key_score = key_scores.get(variant.key_code, 0.0) if key_scores else 0.0
+            rank = (-key_score, abs(variant.pitch_shift), variant.kind != "native", abs(variant.bpm - bpm))
+            if track.id not in best or rank < best[track.id][0]:
+                best[track.id] = (rank, track, variant, key_score)
+
+        ranked = sorted(best.values(), key=lambda x: x[0])[:limit]
+        return [(track, variant, key_score) for _, track, variant, key_score in ranked]
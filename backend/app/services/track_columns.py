@@ -0,0 +1,92 @@
+from typing import List, Dict, Optional, Any
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.models import Track
+from app.services.harmonic_mixing import HarmonicMixingEngine
+
+
+class TrackColumns:
+    """Columnar copy of the scoring fields for a group of tracks
+
+    Missing values are NaN (bpm, energy) or -1 (key_code, genre). Genres are
+    integer codes into `genres`. The whole-library copy is cached and
+    reloaded whenever LibraryEvents reports a track change.
+    """
+
+    _cached: Optional["TrackColumns"] = None
+    _cached_version: Optional[int] = None
+
+    def __init__(
+        self,
+        ids: List[str],
+        bpm: List[Optional[float]],
+        key_code: List[Optional[int]],
+        energy: List[Optional[float]],
+        genre: List[Optional[str]]
+    ):
+        self.ids = ids
+        self.bpm = np.array([b if b else np.nan for b in bpm], dtype=np.float64)
+        self.key_code = np.array([k if k is not None else -1 for k in key_code], dtype=np.int64)
+        self.energy = np.array([e if e is not None else np.nan for e in energy], dtype=np.float64)
+        self.genres: Dict[str, int] = {}
+        self.genre = np.array([
+            self.genres.setdefault(g, len(self.genres)) if g else -1 for g in genre
+        ], dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def take(self, indices) -> "TrackColumns":
+        """A subset of rows (genre codes are shared with the parent)"""
+        subset = TrackColumns.__new__(TrackColumns)
+        subset.ids = [self.ids[i] for i in indices]
+        subset.bpm = self.bpm[indices]
+        subset.key_code = self.key_code[indices]
+        subset.energy = self.energy[indices]
+        subset.genres = self.genres
+        subset.genre = self.genre[indices]
+        return subset
+
+    @staticmethod
+    def from_tracks(tracks: List[Any]) -> "TrackColumns":
+        """From Track rows or anything with id, bpm, key_code, energy and genre"""
+        return TrackColumns(
+            [t.id for t in tracks],
+            [t.bpm for t in tracks],
+            [t.key_code for t in tracks],
+            [t.energy for t in tracks],
+            [t.genre for t in tracks]
+        )
+
+    @staticmethod
+    def from_dicts(tracks: List[Dict[str, Any]]) -> "TrackColumns":
+        """From track dicts as passed to the AI services (key instead of key_code)"""
+        return TrackColumns(
+            [t.get("id") for t in tracks],
+            [t.get("bpm") for t in tracks],
+            [t.get("key_code", HarmonicMixingEngine.key_code(t.get("key"))) for t in tracks],
+            [t.get("energy") for t in tracks],
+            [t.get("genre") for t in tracks]
+        )
+
+    @staticmethod
+    def get(db: Session) -> "TrackColumns":
+        """The whole library, reloaded after library changes"""
+        # Imported here: LibraryEvents depends (via TransitionCache) on FlowEngine, which uses this module
+        from app.services.library_events import LibraryEvents
+
+        version = LibraryEvents.current(db)
+        if TrackColumns._cached is None or TrackColumns._cached_version != version:
+            rows = db.query(Track.id, Track.bpm, Track.key_code, Track.energy, Track.genre).all()
+            columns = TrackColumns(
+                [r[0] for r in rows],
+                [r[1] for r in rows],
+                [r[2] for r in rows],
+                [r[3] for r in rows],
+                [r[4] for r in rows]
+            )
+            TrackColumns._cached_version = version
+            TrackColumns._cached = columns
+        return TrackColumns._cached
@@ -0,0 +1,106 @@
+import re
+from typing import List, Dict, Optional, Any
+
+from sqlalchemy import select, func, literal_column, text
+from sqlalchemy.orm import Session
+
+from app.models import Track
+from app.services.harmonic_mixing import HarmonicMixingEngine
+from app.services.track_pages import TrackPages
+from app.services.track_serializer import TrackSerializer
+
+
+class TrackSearch:
+    """Ranked full-text search over track title, artist, genre and mood
+
+    Backed by the index from migration 0005, which triggers keep in sync:
+    FTS5 on SQLite (BM25, diacritics folded by the tokenizer, prefix indexes
+    for two- and three-letter typeahead) and a weighted tsvector with a GIN
+    index on PostgreSQL (ts_rank over unaccented text). Every word of the
+    query must match as a prefix, and the BPM, key and energy filters go
+    into the same statement.
+    """
+
+    FTS_TABLE = "tracks_fts"
+    # bm25() weights in tracks_fts column order: title, artist, genre, mood
+    BM25_WEIGHTS = (10.0, 5.0, 2.0, 2.0)
+    DEFAULT_LIMIT = 20
+    MAX_LIMIT = 100
+    # Matches scored per query (the rest of a very broad match is not ranked)
+    RANK_CANDIDATES = 1000
+
+    @staticmethod
+    def terms(q: Optional[str]) -> List[str]:
+        """The words of a query; punctuation and FTS operators are dropped"""
+        return re.findall(r"\w+", q or "")
+
+    @staticmethod
+    def search(
+        db: Session,
+        q: str,
+        limit: int = DEFAULT_LIMIT,
+        fields: Optional[str] = None,
+        min_bpm: Optional[float] = None,
+        max_bpm: Optional[float] = None,
+        key: Optional[str] = None,
+        min_energy: Optional[float] = None,
+        max_energy: Optional[float] = None
+    ) -> List[Dict[str, Any]]:
+        """Best matches first, as TrackSerializer dicts holding the requested fields"""
+        terms = TrackSearch.terms(q)
+        if not terms:
+            raise ValueError("q must contain at least one letter or digit")
+        names = TrackPages.parse_fields(fields)
+        limit = max(1, min(limit, TrackSearch.MAX_LIMIT))
+
+        postgresql = db.get_bind().dialect.name == "postgresql"
+
+        def field(name: str):
+            if postgresql:
+                return Track.__table__.c[name]
+            # Typed, but not bound to the Track table, which the textual join below names
+            return literal_column(f'tracks."{name}"', Track.__table__.c[name].type)
+
+        if postgresql:
+            query = " & ".join(f"{term}:*" for term in terms)
+            tsquery = func.to_tsquery("simple", func.unaccent(query))
+            vector = literal_column("tracks.search_vector")
+            # Negated so that, as with bm25(), lower is better
+            score = -func.ts_rank(vector, tsquery)
+            statement = select(*[field(name) for name in names], score.label("score")).where(vector.op("@@")(tsquery))
+        else:
+            # Each word quoted (so FTS5 syntax in the input is just text) and prefix-matched
+            query = " ".join(f'"{term}"*' for term in terms)
+            score = func.bm25(literal_column(TrackSearch.FTS_TABLE), *TrackSearch.BM25_WEIGHTS)
+            statement = (
+                select(*[field(name).label(name) for name in names], score.label("score"))
+                # SQLite never reorders a CROSS JOIN: walk the matches and look
+                # each track up by rowid, rather than let a selective key or BPM
+                # filter drive the loop and re-run the MATCH for every track
+                .select_from(text(f"{TrackSearch.FTS_TABLE} CROSS JOIN tracks ON tracks.rowid = {TrackSearch.FTS_TABLE}.rowid"))
+                .where(text(f"{TrackSearch.FTS_TABLE} MATCH :query").bindparams(query=query))
+            )
+
+        if min_bpm:
+            statement = statement.where(field("bpm") >= min_bpm)
+        if max_bpm:
+            statement = statement.where(field("bpm") <= max_bpm)
+        if key:
+            key_code = HarmonicMixingEngine.key_code(key)
+            if key_code is None:
+                raise ValueError(f"Unknown key: {key}")
+            statement = statement.where(field("key_code") == key_code)
+        if min_energy is not None:
+            statement = statement.where(field("energy") >= min_energy)
+        if max_energy is not None:
+            statement = statement.where(field("energy") <= max_energy)
+
+        # Scoring every match of a one- or two-letter prefix would take a
+        # second on a big library; rank the first RANK_CANDIDATES instead
+        candidates = statement.limit(TrackSearch.RANK_CANDIDATES).subquery()
+        ranked = (
+            select(*[candidates.c[name] for name in names])
+            .order_by(candidates.c.score, candidates.c.id)
+            .limit(limit)
+        )
+        return TrackSerializer.rows(db.execute(ranked).all(), names)
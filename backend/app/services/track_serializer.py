@@ -0,0 +1,40 @@
+from typing import List, Dict, Optional, Any, Iterable, Sequence
+
+from app.models import Track
+from app.schemas import TrackResponse
+
+
+class TrackSerializer:
+    """TrackResponse-shaped dicts straight from selected columns
+
+    Select COLUMNS (or columns(fields)) instead of whole Track entities and
+    zip each row with the field names: no ORM identity map, no instance
+    state, no per-row Pydantic validation. album_image_url is a stored
+    column, so nothing is derived per row. Pair with FastJSONResponse.
+    """
+
+    FIELDS = tuple(TrackResponse.model_fields)
+    COLUMNS = tuple(getattr(Track, name) for name in FIELDS)
+
+    @staticmethod
+    def columns(fields: Optional[Sequence[str]] = None) -> List[Any]:
+        """The Track columns for these TrackResponse fields (all of them by default)"""
+        if fields is None:
+            return list(TrackSerializer.COLUMNS)
+        return [getattr(Track, name) for name in fields]
+
+    @staticmethod
+    def rows(rows: Iterable[Sequence[Any]], fields: Sequence[str] = FIELDS, offset: int = 0) -> List[Dict[str, Any]]:
+        """One dict per row, from the len(fields) values starting at offset"""
+        if offset:
+            return [dict(zip(fields, row[offset:])) for row in rows]
+        return [dict(zip(fields, row)) for row in rows]
+
+    @staticmethod
+    def row(row: Sequence[Any], fields: Sequence[str] = FIELDS, offset: int = 0) -> Dict[str, Any]:
+        return dict(zip(fields, row[offset:] if offset else row))
+
+    @staticmethod
+    def from_track(track: Track) -> Dict[str, Any]:
+        """The same dict for an already-loaded Track instance"""
+        return {name: getattr(track, name) for name in TrackSerializer.FIELDS}
@@ -0,0 +1,362 @@
+import heapq
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Optional, Tuple, Any
+
+from sqlalchemy import func, insert, or_, select, tuple_
+from sqlalchemy.orm import Session
+
+from app.models import Track, TrackTransition
+from app.services.cache_versions import CacheVersions
+from app.services.flow_engine import FlowEngine
+from app.services.harmonic_mixing import HarmonicMixingEngine
+
+# Picklable view of the columns transition scoring reads
+TrackFeatures = namedtuple("TrackFeatures", ["id", "bpm", "key_code", "energy", "genre"])
+
+
+def _features(track) -> TrackFeatures:
+    return TrackFeatures(track.id, track.bpm, track.key_code, track.energy, track.genre)
+
+
+def _score_pair(source: TrackFeatures, target: TrackFeatures) -> Dict[str, Any]:
+    """Score a single source -> target transition as a cache row"""
+    score, reasons = FlowEngine.score_transition(source, target)
+    bpm_difference = None
+    if source.bpm and target.bpm:
+        bpm_difference = target.bpm - source.bpm
+
+    return {
+        "from_track_id": source.id,
+        "to_track_id": target.id,
+        "score": score,
+        "key_score": HarmonicMixingEngine.score_key_codes(source.key_code, target.key_code),
+        "bpm_difference": bpm_difference,
+        "reasons": ", ".join(reasons)
+    }
+
+
+def _top_k(source: TrackFeatures, candidates: List[TrackFeatures], k: int) -> List[Dict[str, Any]]:
+    rows = (_score_pair(source, c) for c in candidates if c.id != source.id)
+    return heapq.nlargest(k, rows, key=lambda r: (r["score"], r["key_score"]))
+
+
+def _top_k_chunk(args: Tuple[List[TrackFeatures], List[TrackFeatures], int]) -> List[Dict[str, Any]]:
+    """Worker entry point for parallel rebuilds (must be module level to pickle)"""
+    sources, candidates, k = args
+    rows = []
+    for source in sources:
+        rows.extend(_top_k(source, candidates, k))
+    return rows
+
+
+class TransitionCache:
+    """Persistent cache of the k best outgoing transitions per track
+
+    Rows live in the track_transitions table and are maintained incrementally
+    as tracks are created, re-analyzed or deleted, so ranking a candidate is a
+    lookup instead of a rescore of the whole library. Each incremental update
+    scores the changed track against the library in Python and writes the
+    result with one DELETE and one executemany INSERT; a cold (empty) cache is
+    left for the first read (MixGraph.from_db, get_transitions) to build.
+
+    A source with no rows has never been computed (get_transitions fills one
+    source at a time), so incremental updates leave it alone rather than
+    treat it as a short list, and fill_missing computes it in full.
+    """
+
+    K = int(os.getenv("TRANSITION_CACHE_K", "25"))
+    # Libraries smaller than this are rebuilt inline; process startup costs more
+    PARALLEL_THRESHOLD = 2000
+    # (from, to) pairs per DELETE ... IN, well under SQLite's bound-parameter limit
+    DELETE_CHUNK = 500
+
+    @staticmethod
+    def load_features(db: Session, exclude_id: Optional[str] = None) -> List[TrackFeatures]:
+        """Load the scoring columns for the whole library"""
+        query = db.query(Track.id, Track.bpm, Track.key_code, Track.energy, Track.genre)
+        if exclude_id:
+            query = query.filter(Track.id != exclude_id)
+        return [TrackFeatures(*row) for row in query.all()]
+
+    @staticmethod
+    def rebuild(db: Session, k: Optional[int] = None, workers: Optional[int] = None) -> int:
+        """Recompute every track's k best transitions, in parallel for large libraries"""
+        k = k or TransitionCache.K
+        workers = workers or os.cpu_count() or 1
+        features = TransitionCache.load_features(db)
+
+        db.query(TrackTransition).delete(synchronize_session=False)
+
+        total = 0
+        if workers == 1 or len(features) < TransitionCache.PARALLEL_THRESHOLD:
+            rows = _top_k_chunk((features, features, k))
+            if rows:
+                db.execute(insert(TrackTransition), rows)
+            total = len(rows)
+        else:
+            chunk_size = max(1, len(features) // (workers * 4))
+            chunks = [
+                (features[i:i + chunk_size], features, k)
+                for i in range(0, len(features), chunk_size)
+            ]
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                for rows in executor.map(_top_k_chunk, chunks):
+                    if rows:
+                        db.execute(insert(TrackTransition), rows)
+                    total += len(rows)
+
+        CacheVersions.bump(db, CacheVersions.TRANSITIONS)
+        db.commit()
+        return total
+
+    @staticmethod
+    def _store_outgoing(
+        db: Session,
+        source: TrackFeatures,
+        candidates: List[TrackFeatures],
+        k: int
+    ) -> None:
+        db.query(TrackTransition).filter(
+            TrackTransition.from_track_id == source.id
+        ).delete(synchronize_session=False)
+        rows = _top_k(source, candidates, k)
+        if rows:
+            db.execute(insert(TrackTransition), rows)
+        CacheVersions.bump(db, CacheVersions.TRANSITIONS)
+
+    @staticmethod
+    def clear(db: Session) -> None:
+        """Drop every cached transition; the next graph load rebuilds from scratch"""
+        db.query(TrackTransition).delete(synchronize_session=False)
+        CacheVersions.bump(db, CacheVersions.TRANSITIONS)
+        db.commit()
+
+    @staticmethod
+    def is_cold(db: Session) -> bool:
+        return db.query(TrackTransition.from_track_id).first() is None
+
+    @staticmethod
+    def fill_missing(db: Session) -> int:
+        """Compute the full list of every track that has never been computed
+
+        Rebuilds a cold cache outright. Returns the number of rows written.
+        """
+        if TransitionCache.is_cold(db):
+            return TransitionCache.rebuild(db) if db.query(Track.id).first() is not None else 0
+
+        computed = select(TrackTransition.from_track_id).distinct()
+        missing = [
+            TrackFeatures(*row) for row in db.query(
+                Track.id, Track.bpm, Track.key_code, Track.energy, Track.genre
+            ).filter(Track.id.not_in(computed)).all()
+        ]
+        rows = _top_k_chunk((missing, TransitionCache.load_features(db), TransitionCache.K)) if missing else []
+        if rows:
+            db.execute(insert(TrackTransition), rows)
+            CacheVersions.bump(db, CacheVersions.TRANSITIONS)
+            db.commit()
+        return len(rows)
+
+    @staticmethod
+    def _worst_entries(db: Session, exclude_id: str) -> Dict[str, Tuple[int, Tuple[float, float], str]]:
+        """Per source: how many transitions it has cached, and the (score, key_score) and target of its worst"""
+        ranked = select(
+            TrackTransition.from_track_id,
+            TrackTransition.to_track_id,
+            TrackTransition.score,
+            TrackTransition.key_score,
+            func.count().over(partition_by=TrackTransition.from_track_id).label("entries"),
+            func.row_number().over(
+                partition_by=TrackTransition.from_track_id,
+                order_by=(TrackTransition.score, TrackTransition.key_score)
+            ).label("rank")
+        ).where(TrackTransition.from_track_id != exclude_id).subquery()
+
+        rows = db.execute(
+            select(ranked.c.from_track_id, ranked.c.entries, ranked.c.score, ranked.c.key_score, ranked.c.to_track_id)
+            .where(ranked.c.rank == 1)
+        )
+        return {source_id: (entries, (score, key_score), target_id) for source_id, entries, score, key_score, target_id in rows}
+
+    @staticmethod
+    def _listed_by(db: Session, track_id: str) -> Dict[str, set]:
+        """Full cached lists of every other source that has track_id among its transitions"""
+        sources = select(TrackTransition.from_track_id).where(
+            TrackTransition.to_track_id == track_id,
+            TrackTransition.from_track_id != track_id
+        )
+        lists: Dict[str, set] = {}
+        for source_id, target_id in db.query(
+            TrackTransition.from_track_id, TrackTransition.to_track_id
+        ).filter(TrackTransition.from_track_id.in_(sources)).all():
+            lists.setdefault(source_id, set()).add(target_id)
+        return lists
+
+    @staticmethod
+    def _refill(sources: Dict[str, set], others: List[TrackFeatures], extra: Optional[TrackFeatures] = None) -> List[Dict[str, Any]]:
+        """The best transition each source doesn't list yet (one of theirs was just dropped)"""
+        by_id = {f.id: f for f in others}
+        rows = []
+        for source_id, listed in sources.items():
+            if source_id not in by_id:
+                continue
+            candidates = [c for c in others if c.id not in listed]
+            if extra is not None:
+                candidates.append(extra)
+            rows.extend(_top_k(by_id[source_id], candidates, 1))
+        return rows
+
+    @staticmethod
+    def _offer(
+        db: Session,
+        new: TrackFeatures,
+        others: List[TrackFeatures],
+        k: int,
+        skip: Optional[Dict[str, set]] = None
+    ) -> Tuple[List[Dict[str, Any]], List[Tuple[str, str]]]:
+        """Rows that put new into every other source's list it makes, and the (from, to) pairs it pushes out
+
+        Sources without rows have never been computed and are skipped.
+        """
+        worst = TransitionCache._worst_entries(db, new.id)
+        rows, evicted = [], []
+        for source in others:
+            if (skip and source.id in skip) or source.id not in worst:
+                continue
+            entries, worst_key, worst_target = worst[source.id]
+            row = _score_pair(source, new)
+            if entries < k:
+                rows.append(row)
+            elif (row["score"], row["key_score"]) > worst_key:
+                rows.append(row)
+                evicted.append((source.id, worst_target))
+        return rows, evicted
+
+    @staticmethod
+    def _write(db: Session, rows: List[Dict[str, Any]], evicted: List[Tuple[str, str]]) -> None:
+        size = TransitionCache.DELETE_CHUNK
+        for i in range(0, len(evicted), size):
+            db.query(TrackTransition).filter(
+                tuple_(TrackTransition.from_track_id, TrackTransition.to_track_id).in_(evicted[i:i + size])
+            ).delete(synchronize_session=False)
+        if rows:
+            db.execute(insert(TrackTransition), rows)
+
+    @staticmethod
+    def add_track(db: Session, track: Track, k: Optional[int] = None) -> None:
+        """Insert a new track into a warm cache: its own k best, plus every list it makes"""
+        k = k or TransitionCache.K
+        if TransitionCache.is_cold(db):
+            return
+
+        new = _features(track)
+        others = TransitionCache.load_features(db, exclude_id=track.id)
+
+        rows, evicted = TransitionCache._offer(db, new, others, k)
+        TransitionCache._write(db, _top_k(new, others, k) + rows, evicted)
+        CacheVersions.bump(db, CacheVersions.TRANSITIONS)
+        db.commit()
+
+    @staticmethod
+    def remove_track(db: Session, track_id: str) -> None:
+        """Drop a track from the cache and refill the sources that pointed at it (not committed)"""
+        if TransitionCache.is_cold(db):
+            return
+
+        affected = TransitionCache._listed_by(db, track_id)
+        db.query(TrackTransition).filter(
+            or_(TrackTransition.from_track_id == track_id, TrackTransition.to_track_id == track_id)
+        ).delete(synchronize_session=False)
+
+        if affected:
+            others = TransitionCache.load_features(db, exclude_id=track_id)
+            TransitionCache._write(db, TransitionCache._refill(affected, others), [])
+
+        CacheVersions.bump(db, CacheVersions.TRANSITIONS)
+
+    @staticmethod
+    def refresh_track(db: Session, track: Track, k: Optional[int] = None) -> None:
+        """Re-score a track after its BPM, key, energy or genre changed, in one pass
+
+        Sources that listed the track refill the freed slot from the whole
+        library (the re-scored track included); every other source is offered
+        the re-scored track as in add_track.
+        """
+        k = k or TransitionCache.K
+        if TransitionCache.is_cold(db):
+            return
+
+        new = _features(track)
+        affected = TransitionCache._listed_by(db, track.id)
+        db.query(TrackTransition).filter(
+            or_(TrackTransition.from_track_id == track.id, TrackTransition.to_track_id == track.id)
+        ).delete(synchronize_session=False)
+
+        others = TransitionCache.load_features(db, exclude_id=track.id)
+        rows, evicted = TransitionCache._offer(db, new, others, k, skip=affected)
+        rows = _top_k(new, others, k) + TransitionCache._refill(affected, others, extra=new) + rows
+        TransitionCache._write(db, rows, evicted)
+        CacheVersions.bump(db, CacheVersions.TRANSITIONS)
+        db.commit()
+
+    @staticmethod
+    def get_transitions(db: Session, track: Track, limit: Optional[int] = None) -> List[TrackTransition]:
+        """Get a track's cached transitions, best first, filling the cache on a miss"""
+        query = db.query(TrackTransition).filter(
+            TrackTransition.from_track_id == track.id
+        ).order_by(TrackTransition.score.desc(), TrackTransition.key_score.desc())
+
+        transitions = query.limit(limit).all() if limit else query.all()
+        if not transitions:
+            others = TransitionCache.load_features(db, exclude_id=track.id)
+            TransitionCache._store_outgoing(db, _features(track), others, TransitionCache.K)
+            db.commit()
+            transitions = query.limit(limit).all() if limit else query.all()
+
+        return transitions
+
+    @staticmethod
+    def get_pair_scores(db: Session, track_ids: List[str]) -> Dict[Tuple[str, str], float]:
+        """Look up cached scores for every cached pair within a group of tracks"""
+        if not track_ids:
+            return {}
+
+        rows = db.query(
+            TrackTransition.from_track_id,
+            TrackTransition.to_track_id,
+            TrackTransition.score
+        ).filter(
+            TrackTransition.from_track_id.in_(track_ids),
+            TrackTransition.to_track_id.in_(track_ids)
+        ).all()
+
+        return {(from_id, to_id): score for from_id, to_id, score in rows}
+
+    @staticmethod
+    def suggest_next(
+        db: Session,
+        current_track: Track,
+        target_energy: Optional[float] = None,
+        target_bpm: Optional[float] = None,
+        energy_direction: str = "maintain",
+        weights: Optional[Dict[str, float]] = None
+    ) -> List[Tuple[Track, float, str]]:
+        """FlowEngine.suggest_next_track over the cached candidates only"""
+        transitions = TransitionCache.get_transitions(db, current_track)
+        tracks = {
+            t.id: t for t in db.query(Track).filter(
+                Track.id.in_([tr.to_track_id for tr in transitions])
+            ).all()
+        }
+        candidates = [tracks[tr.to_track_id] for tr in transitions if tr.to_track_id in tracks]
+
+        return FlowEngine.suggest_next_track(
+            current_track,
+            candidates,
+            target_energy=target_energy,
+            target_bpm=target_bpm,
+            energy_direction=energy_direction,
+            weights=weights
+        )
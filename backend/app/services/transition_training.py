@@ -0,0 +1,294 @@
+import argparse
+import json
+import time
+import uuid
+from collections import defaultdict
+from typing import List, Dict, Optional, Tuple, Any
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.models import Set, SetTrack, Performance, ScoringProfile
+from app.services.scoring_pipeline import ScoringPipeline
+from app.services.track_columns import TrackColumns
+from app.services.transition_cache import TransitionCache
+
+
+class TransitionTrainer:
+    """Offline fit of ScoringPipeline weights from logged sets and performances
+
+    Every consecutive pair in a saved set is a transition a DJ chose; it is
+    paired with NEGATIVES random library tracks the DJ could have played
+    instead. A pairwise logistic (RankNet) loss then learns non-negative
+    weights for the pairwise terms so chosen transitions outrank the
+    alternatives. Performances weight their set's transitions: crowd_vibe
+    scales the whole set and, when energy_levels has one reading per track,
+    each transition is scaled by how the crowd's energy moved across it.
+
+    Term values are discrete, so pairs collapse to a few hundred distinct
+    feature rows and training is a few hundred gradient steps over those;
+    years of history fit in minutes, dominated by feature extraction. The result
+    is saved as a ScoringProfile, which the runtime scorer loads like any
+    other weight set - but only once there are MIN_SETS sets and the learned
+    weights beat the defaults on the held-out ones (see save_rejection).
+    """
+
+    # Pairwise terms the model can weight (target terms need a request context)
+    FEATURES = ["bpm", "bpm_match", "key", "key_compatible", "same_key", "energy", "genre"]
+    NEGATIVES = 10
+    ITERATIONS = 500
+    LEARNING_RATE = 0.5
+    L2 = 1e-3
+    HOLDOUT = 0.2
+    # Fewer sets than this leave nothing to hold out, so the weights can't be validated
+    MIN_SETS = 5
+    # Learned weights are rescaled to the default pairwise total, so scores stay comparable
+    WEIGHT_TOTAL = sum(ScoringPipeline.DEFAULT_WEIGHTS.get(name, 0.0) for name in FEATURES)
+    PROFILE_NAME = "learned"
+
+    VIBE_WEIGHTS = {
+        "electric": 2.0, "peak": 2.0, "euphoric": 2.0,
+        "great": 1.5, "good": 1.5, "hyped": 1.5,
+        "building": 1.0, "chill": 1.0,
+        "flat": 0.5, "tired": 0.5,
+        "dead": 0.25, "bad": 0.25,
+    }
+
+    @staticmethod
+    def _energy_readings(energy_levels: Any) -> Optional[List[float]]:
+        """A performance's crowd energy readings, if logged as numbers or {"energy": x} points"""
+        if isinstance(energy_levels, str):
+            try:
+                energy_levels = json.loads(energy_levels)
+            except ValueError:
+                return None
+        if isinstance(energy_levels, dict):
+            energy_levels = energy_levels.get("levels") or energy_levels.get("points")
+        if not isinstance(energy_levels, list):
+            return None
+        readings = []
+        for level in energy_levels:
+            if isinstance(level, dict):
+                level = level.get("energy")
+            if not isinstance(level, (int, float)):
+                return None
+            readings.append(float(level))
+        return readings
+
+    @staticmethod
+    def transition_weights(performances: List[Performance], length: int) -> np.ndarray:
+        """Sample weight for each of a set's length - 1 transitions"""
+        weights = np.ones(max(length - 1, 0))
+        if not performances or length < 2:
+            return weights
+
+        vibe = np.mean([
+            TransitionTrainer.VIBE_WEIGHTS.get((p.crowd_vibe or "").strip().lower(), 1.0)
+            for p in performances
+        ])
+        weights *= vibe
+
+        for performance in performances:
+            readings = TransitionTrainer._energy_readings(performance.energy_levels)
+            if readings and len(readings) == length:
+                # Crowd energy rising across a transition is evidence it worked
+                delta = np.diff(np.array(readings))
+                weights *= np.clip(1 + 2 * delta, 0.25, 2.0)
+        return weights
+
+    @staticmethod
+    def load_history(
+        db: Session,
+        event_type_id: Optional[str] = None
+    ) -> List[Tuple[str, List[str], np.ndarray]]:
+        """(set_id, track IDs in order, transition weights) for every logged set"""
+        query = db.query(SetTrack.set_id, SetTrack.track_id).join(Set, Set.id == SetTrack.set_id)
+        if event_type_id:
+            query = query.filter(Set.event_type_id == event_type_id)
+        orders: Dict[str, List[str]] = defaultdict(list)
+        for set_id, track_id in query.order_by(SetTrack.set_id, SetTrack.position).all():
+            orders[set_id].append(track_id)
+
+        performances: Dict[str, List[Performance]] = defaultdict(list)
+        if orders:
+            for performance in db.query(Performance).filter(Performance.set_id.in_(list(orders))).all():
+                performances[performance.set_id].append(performance)
+
+        return [
+            (set_id, track_ids, TransitionTrainer.transition_weights(performances[set_id], len(track_ids)))
+            for set_id, track_ids in orders.items()
+            if len(track_ids) > 1
+        ]
+
+    @staticmethod
+    def build_pairs(
+        history: List[Tuple[str, List[str], np.ndarray]],
+        columns: TrackColumns,
+        sources: List[Any],
+        seed: int = 0
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Feature differences (chosen - alternative) and their sample weights
+
+        Features are computed per source track, over that source's chosen
+        successors and sampled alternatives at once.
+        """
+        rng = np.random.default_rng(seed)
+        index = {track_id: i for i, track_id in enumerate(columns.ids)}
+        n = len(columns)
+
+        # source index -> [(chosen index, negative indices, weight)]
+        by_source: Dict[int, List[Tuple[int, np.ndarray, float]]] = defaultdict(list)
+        for _, track_ids, weights in history:
+            for (a, b), weight in zip(zip(track_ids, track_ids[1:]), weights):
+                if a not in index or b not in index or weight <= 0:
+                    continue
+                negatives = rng.integers(0, n, TransitionTrainer.NEGATIVES)
+                negatives = negatives[(negatives != index[a]) & (negatives != index[b])]
+                if len(negatives):
+                    by_source[index[a]].append((index[b], negatives, weight))
+
+        scorers = [(name, ScoringPipeline.TERMS[name]) for name in TransitionTrainer.FEATURES]
+        diffs, sample_weights = [], []
+        for source_index, samples in by_source.items():
+            candidates = np.unique(np.concatenate([
+                np.concatenate(([chosen], negatives)) for chosen, negatives, _ in samples
+            ]))
+            subset = columns.take(candidates)
+            features = np.stack([
+                term.fn(sources[source_index], subset, {"energy_direction": "maintain"})[0]
+                for _, term in scorers
+            ], axis=1)
+
+            for chosen, negatives, weight in samples:
+                chosen_features = features[np.searchsorted(candidates, chosen)]
+                negative_features = features[np.searchsorted(candidates, negatives)]
+                diffs.append(chosen_features - negative_features)
+                sample_weights.append(np.full(len(negatives), weight))
+
+        if not diffs:
+            return np.zeros((0, len(scorers))), np.zeros(0)
+        return np.concatenate(diffs), np.concatenate(sample_weights)
+
+    @staticmethod
+    def fit(diffs: np.ndarray, sample_weights: np.ndarray) -> np.ndarray:
+        """Non-negative weights minimizing weighted pairwise logistic loss (projected gradient)"""
+        k = diffs.shape[1]
+        w = np.array([ScoringPipeline.DEFAULT_WEIGHTS.get(name, 0.0) for name in TransitionTrainer.FEATURES])
+        if not len(diffs):
+            return w
+        # Term values are 0, 0.5 or 1, so each difference row is one of 5^k codes and
+        # millions of pairs collapse to a few hundred distinct rows
+        digits = np.rint(diffs * 2 + 2).astype(np.int64)
+        codes = digits @ (5 ** np.arange(k, dtype=np.int64))
+        codes, inverse = np.unique(codes, return_inverse=True)
+        s = np.bincount(inverse.ravel(), weights=sample_weights, minlength=len(codes))
+        s = s / s.sum()
+        diffs = ((codes[:, None] // 5 ** np.arange(k)) % 5 - 2) / 2
+
+        for _ in range(TransitionTrainer.ITERATIONS):
+            margin = diffs @ w
+            # d/dw softplus(-margin) = -sigmoid(-margin) * diff
+            grad = -(s * (0.5 * (1 - np.tanh(margin / 2)))) @ diffs + 2 * TransitionTrainer.L2 * w
+            w = np.maximum(w - TransitionTrainer.LEARNING_RATE * grad, 0.0)
+
+        if w.sum() <= 0:
+            w = np.ones(k)
+        return w * TransitionTrainer.WEIGHT_TOTAL / w.sum()
+
+    @staticmethod
+    def pairwise_accuracy(diffs: np.ndarray, sample_weights: np.ndarray, w: np.ndarray) -> Optional[float]:
+        """Weighted share of pairs where the chosen track outscores the alternative (ties count half)"""
+        if not len(diffs):
+            return None
+        margin = diffs @ w
+        correct = np.where(margin > 1e-12, 1.0, np.where(margin < -1e-12, 0.0, 0.5))
+        return float((correct * sample_weights).sum() / sample_weights.sum())
+
+    @staticmethod
+    def train(db: Session, event_type_id: Optional[str] = None, seed: int = 0) -> Dict[str, Any]:
+        """Fit weights on logged history, holding out HOLDOUT of the sets for evaluation"""
+        started = time.monotonic()
+        history = TransitionTrainer.load_history(db, event_type_id)
+        sources = TransitionCache.load_features(db)
+        columns = TrackColumns.from_tracks(sources)
+
+        order = np.random.default_rng(seed).permutation(len(history))
+        holdout_count = int(len(history) * TransitionTrainer.HOLDOUT) if len(history) >= TransitionTrainer.MIN_SETS else 0
+        holdout = [history[i] for i in order[:holdout_count]]
+        training = [history[i] for i in order[holdout_count:]]
+
+        diffs, sample_weights = TransitionTrainer.build_pairs(training, columns, sources, seed)
+        w = TransitionTrainer.fit(diffs, sample_weights)
+        holdout_diffs, holdout_weights = TransitionTrainer.build_pairs(holdout, columns, sources, seed + 1)
+        default = np.array([ScoringPipeline.DEFAULT_WEIGHTS.get(name, 0.0) for name in TransitionTrainer.FEATURES])
+
+        return {
+            "event_type_id": event_type_id,
+            "weights": {name: round(float(weight), 4) for name, weight in zip(TransitionTrainer.FEATURES, w)},
+            "sets": len(history),
+            "training_pairs": int(len(diffs)),
+            "holdout_pairs": int(len(holdout_diffs)),
+            "train_accuracy": TransitionTrainer.pairwise_accuracy(diffs, sample_weights, w),
+            "holdout_accuracy": TransitionTrainer.pairwise_accuracy(holdout_diffs, holdout_weights, w),
+            "default_holdout_accuracy": TransitionTrainer.pairwise_accuracy(holdout_diffs, holdout_weights, default),
+            "seconds": round(time.monotonic() - started, 2)
+        }
+
+    @staticmethod
+    def save_rejection(result: Dict[str, Any]) -> Optional[str]:
+        """Why a training result must not replace the profile, or None if it may"""
+        if result["sets"] < TransitionTrainer.MIN_SETS:
+            return f"Needs at least {TransitionTrainer.MIN_SETS} logged sets to validate on, got {result['sets']}"
+        if result["holdout_accuracy"] is None:
+            return "No held-out transitions to validate on"
+        if result["holdout_accuracy"] <= result["default_holdout_accuracy"]:
+            return (
+                f"Held-out accuracy {result['holdout_accuracy']:.3f} does not beat "
+                f"the default weights' {result['default_holdout_accuracy']:.3f}"
+            )
+        return None
+
+    @staticmethod
+    def save(db: Session, result: Dict[str, Any]) -> ScoringProfile:
+        """Store learned weights as the global (or event type's) profile"""
+        event_type_id = result["event_type_id"]
+        profile = db.query(ScoringProfile).filter(
+            ScoringProfile.user_id.is_(None),
+            ScoringProfile.event_type_id.is_(None) if event_type_id is None
+            else ScoringProfile.event_type_id == event_type_id
+        ).first()
+        if profile is None:
+            profile = ScoringProfile(
+                id=str(uuid.uuid4()),
+                name=TransitionTrainer.PROFILE_NAME,
+                event_type_id=event_type_id,
+                weights=result["weights"]
+            )
+            db.add(profile)
+        else:
+            profile.weights = {**(profile.weights or {}), **result["weights"]}
+        db.commit()
+        db.refresh(profile)
+        return profile
+
+
+if __name__ == "__main__":
+    from app.database import SessionLocal, run_migrations
+
+    parser = argparse.ArgumentParser(description="Learn transition scoring weights from logged sets")
+    parser.add_argument("--event-type", dest="event_type_id", default=None, help="Train on one event type's sets")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--dry-run", action="store_true", help="Print the weights without saving them")
+    args = parser.parse_args()
+
+    run_migrations()
+    session = SessionLocal()
+    try:
+        trained = TransitionTrainer.train(session, args.event_type_id, args.seed)
+        if not args.dry_run and trained["training_pairs"]:
+            trained["not_saved_reason"] = TransitionTrainer.save_rejection(trained)
+            if trained["not_saved_reason"] is None:
+                trained["profile_id"] = TransitionTrainer.save(session, trained).id
+        print(json.dumps(trained, indent=2))
+    finally:
+        session.close()
@@ -5,12 +5,17 @@ from contextlib import asynccontextmanager
 import os
 from dotenv import load_dotenv
 
-from app.database import engine, Base
+from app.database import SessionLocal, engine, async_engine, run_migrations
+from app.services.key_index import KeyIndex
+from app.services.library_events import LibraryEvents
+from app.services.optimization_jobs import OptimizationJobs
+from app.services.query_metrics import QueryMetrics, QueryMetricsMiddleware
 from app.routers import (
     tracks, sets, events, analysis, ai_voice, flow_engine, 
     harmonic_mixing, ai_recommendations, trending,
     dj_intelligence, ai_embeddings, ai_visuals, personas,
-    spotify_auth, playlists, local_playlists
+    spotify_auth, playlists, local_playlists, mix_graph, live, crates, scoring, mashups, debug,
+    library
 )
 
 # Optional router for file uploads (requires python-multipart)
@@ -26,9 +31,17 @@ load_dotenv()
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
-    Base.metadata.create_all(bind=engine)
+    run_migrations()
+    db = SessionLocal()
+    try:
+        KeyIndex.backfill_key_codes(db)
+        LibraryEvents.ensure_built(db)
+    finally:
+        db.close()
     yield
     # Shutdown
+    OptimizationJobs.shutdown()
+    await async_engine.dispose()
 
 app = FastAPI(
     title="DJ Arsenal API",
@@ -37,6 +50,11 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# Query counts and DB time per request (Server-Timing header, JSON logs, /api/debug/queries)
+QueryMetrics.instrument(engine)
+QueryMetrics.instrument(async_engine.sync_engine)
+app.add_middleware(QueryMetricsMiddleware)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -51,6 +69,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Include routers
@@ -72,6 +91,13 @@ app.include_router(personas.router, prefix="/api/personas", tags=["personas"])
 app.include_router(spotify_auth.router, prefix="/api", tags=["spotify-auth"])
 app.include_router(playlists.router, prefix="/api/spotify", tags=["spotify-playlists"])
 app.include_router(local_playlists.router, prefix="/api/playlists", tags=["local-playlists"])
+app.include_router(mix_graph.router, prefix="/api/graph", tags=["graph"])
+app.include_router(live.router, prefix="/api/live", tags=["live"])
+app.include_router(crates.router, prefix="/api/crates", tags=["crates"])
+app.include_router(scoring.router, prefix="/api/scoring", tags=["scoring"])
+app.include_router(mashups.router, prefix="/api/mashups", tags=["mashups"])
+app.include_router(debug.router, prefix="/api/debug", tags=["debug"])
+app.include_router(library.router, prefix="/api/library", tags=["library"])
 
 @app.get("/")
 async def root():
@@ -0,0 +1,123 @@
+"""
+Serialization benchmark - builds a 10k-track response the way the tracks
+router used to (ORM entities, __dict__ copies, cover_art scans, TrackResponse
+validation, json) and the way it does now (column tuples, TrackSerializer
+dicts, FastJSONResponse).
+
+    python scripts/benchmark_serialization.py
+    python scripts/benchmark_serialization.py --tracks 50000 --repeat 5
+
+Runs against a throwaway SQLite database.
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from alembic import command
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+from sqlalchemy import select, insert
+from sqlalchemy.orm import Session
+
+from app.database import alembic_config, create_storage_engine
+from app.models import Track
+from app.responses import FastJSONResponse, ORJSON_AVAILABLE
+from app.schemas import TrackResponse
+from app.services.track_serializer import TrackSerializer
+
+
+def build(engine, tracks: int, seed: int):
+    rng = random.Random(seed)
+    config = alembic_config()
+    with engine.begin() as connection:
+        config.attributes["connection"] = connection
+        command.upgrade(config, "head")
+    rows = []
+    for i in range(tracks):
+        cover_art = f"https://i.scdn.co/image/{uuid.uuid4().hex}" if rng.random() < 0.6 else None
+        rows.append({
+            "id": str(uuid.uuid4()),
+            "title": f"Track {i}",
+            "artist": f"Artist {rng.randrange(tracks // 10 or 1)}",
+            "duration": rng.randrange(150, 480),
+            "bpm": round(rng.gauss(124, 18), 1),
+            "key": f"{rng.randrange(1, 13)}{rng.choice('AB')}",
+            "energy": round(rng.random(), 2),
+            "energy_envelope": [round(rng.random(), 3) for _ in range(64)],
+            "genre": rng.choice(["house", "techno", "dnb", "disco"]),
+            "file_path": f"/music/{i}.mp3",
+            "cover_art": cover_art,
+            "album_image_url": cover_art,
+        })
+    with engine.begin() as connection:
+        connection.execute(insert(Track), rows)
+
+
+def before(engine) -> bytes:
+    """The old path: entities, __dict__ copies, per-row URL scan, validation, jsonable_encoder, json"""
+    with Session(engine) as db:
+        result = []
+        for track in db.scalars(select(Track)).all():
+            track_dict = track.__dict__.copy()
+            track_dict.pop("_sa_instance_state", None)
+            if track.cover_art and ("i.scdn.co" in track.cover_art or "spotify" in track.cover_art.lower()):
+                track_dict["album_image_url"] = track.cover_art
+            result.append(track_dict)
+    adapter = TypeAdapter(List[TrackResponse])
+    validated = adapter.validate_python(result)
+    return json.dumps(jsonable_encoder(validated), ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+
+
+def after(engine) -> bytes:
+    """Column tuples, TrackSerializer dicts, FastJSONResponse rendering"""
+    with Session(engine) as db:
+        tracks = TrackSerializer.rows(db.execute(select(*TrackSerializer.COLUMNS)).all())
+    return FastJSONResponse(tracks).body
+
+
+def timed(call, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body = call()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings), body
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark track response serialization")
+    parser.add_argument("--tracks", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(prefix="dj_serialize_"), "serialize.db")
+    engine = create_storage_engine(f"sqlite:///{path}")
+    build(engine, args.tracks, args.seed)
+
+    old_ms, old_body = timed(lambda: before(engine), args.repeat)
+    new_ms, new_body = timed(lambda: after(engine), args.repeat)
+    assert json.loads(old_body) == json.loads(new_body), "responses differ"
+
+    print(f"{args.tracks} tracks, median of {args.repeat} ({'orjson' if ORJSON_AVAILABLE else 'json fallback'})")
+    print(f"  before: {old_ms:8.1f} ms  {len(old_body) / 1024:8.0f} KiB")
+    print(f"  after:  {new_ms:8.1f} ms  {len(new_body) / 1024:8.0f} KiB  ({old_ms / new_ms:.1f}x faster)")
+
+    engine.dispose()
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Query-count check - each set/playlist/flow endpoint must run the same number
+of SQL statements whether a set or playlist holds a few tracks or many.
+
+    python scripts/count_queries.py
+
+Runs against a throwaway SQLite database and exits non-zero if any
+endpoint's query count grows with the number of tracks (an N+1).
+"""
+
+import os
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="dj_queries_"), "queries.db")
+os.environ.setdefault("OPENAI_API_KEY", "unused")
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+import main
+from app.database import engine, async_engine
+from app.services.set_curves import SetCurves
+
+SIZES = (3, 30)
+
+
+class QueryCounter:
+    """Counts statements on both the sync and the async engine"""
+
+    def __init__(self):
+        self.count = 0
+        for target in (engine, async_engine.sync_engine):
+            event.listen(target, "before_cursor_execute", self._count)
+
+    def _count(self, *args):
+        self.count += 1
+
+    def measure(self, call) -> int:
+        before = self.count
+        response = call()
+        assert response.status_code < 400, response.text
+        return self.count - before
+
+
+def endpoint_counts(client: TestClient, counter: QueryCounter, size: int):
+    track_ids = [
+        client.post("/api/tracks/", json={
+            "title": f"Track {i}", "artist": "Artist", "duration": 240,
+            "bpm": 120 + i % 8, "key": f"{i % 12 + 1}A", "energy": (i % 10) / 10, "genre": "house"
+        }).json()["id"]
+        for i in range(size)
+    ]
+    playlist_id = client.post("/api/playlists", json={"name": f"Playlist {size}"}).json()["id"]
+
+    counts = {}
+    counts["POST /playlists/{id}/tracks"] = counter.measure(
+        lambda: client.post(f"/api/playlists/{playlist_id}/tracks", json={"track_ids": track_ids})
+    )
+    counts["GET /playlists"] = counter.measure(lambda: client.get("/api/playlists"))
+    counts["GET /playlists/{id}"] = counter.measure(lambda: client.get(f"/api/playlists/{playlist_id}"))
+    counts["GET /playlists/{id}/tracks"] = counter.measure(lambda: client.get(f"/api/playlists/{playlist_id}/tracks"))
+    counts["DELETE /playlists/{id}/tracks"] = counter.measure(
+        lambda: client.request("DELETE", f"/api/playlists/{playlist_id}/tracks", json={"track_ids": track_ids[:2]})
+    )
+
+    response = client.post("/api/sets/", json={"name": f"Set {size}", "duration": 60, "track_ids": track_ids})
+    set_id = response.json()["id"]
+    counts["POST /sets"] = counter.measure(
+        lambda: client.post("/api/sets/", json={"name": "Copy", "duration": 60, "track_ids": track_ids})
+    )
+    counts["GET /sets/{id}"] = counter.measure(lambda: client.get(f"/api/sets/{set_id}"))
+
+    SetCurves.invalidate(set_id)
+    counts["GET /flow/energy-curve/{id}"] = counter.measure(lambda: client.get(f"/api/flow/energy-curve/{set_id}"))
+    counts["POST /flow/optimize-set/{id}"] = counter.measure(lambda: client.post(f"/api/flow/optimize-set/{set_id}"))
+    return counts
+
+
+def main_check() -> int:
+    counter = QueryCounter()
+    with TestClient(main.app) as client:
+        runs = [endpoint_counts(client, counter, size) for size in SIZES]
+
+    failed = False
+    width = max(len(name) for name in runs[0])
+    print(f"{'endpoint':<{width}}  " + "  ".join(f"{size:>4} tracks" for size in SIZES))
+    for name in runs[0]:
+        counts = [run[name] for run in runs]
+        grows = len(set(counts)) > 1
+        failed |= grows
+        print(f"{name:<{width}}  " + "  ".join(f"{count:>11}" for count in counts) + ("  <- grows with size" if grows else ""))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_check())
@@ -0,0 +1,22 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+# A throwaway SQLite database, set before app.database creates its engines
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="dj_tests_"), "tests.db")
+os.environ.setdefault("OPENAI_API_KEY", "unused")
+os.environ.setdefault("LOG_REQUESTS", "0")
+
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+
+    import main
+
+    with TestClient(main.app) as client:
+        yield client
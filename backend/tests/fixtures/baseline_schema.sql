@@ -0,0 +1,141 @@
+-- The schema the pre-migration release's create_all built (SQLite), used to test
+-- adopting such a database into Alembic (app.database.run_migrations)
+CREATE TABLE tracks (
+	id VARCHAR NOT NULL, 
+	title VARCHAR NOT NULL, 
+	artist VARCHAR NOT NULL, 
+	duration INTEGER NOT NULL, 
+	bpm FLOAT, 
+	"key" VARCHAR, 
+	energy FLOAT, 
+	genre VARCHAR, 
+	mood VARCHAR, 
+	file_path VARCHAR, 
+	cover_art VARCHAR, 
+	preview_url VARCHAR, 
+	created_at DATETIME DEFAULT CURRENT_TIMESTAMP, 
+	updated_at DATETIME, 
+	PRIMARY KEY (id)
+);
+CREATE INDEX ix_tracks_id ON tracks (id);
+CREATE TABLE event_types (
+	id VARCHAR NOT NULL, 
+	name VARCHAR NOT NULL, 
+	description TEXT, 
+	min_bpm FLOAT NOT NULL, 
+	max_bpm FLOAT NOT NULL, 
+	energy_curve JSON, 
+	genre_weighting JSON, 
+	vocal_frequency FLOAT NOT NULL, 
+	drop_intensity FLOAT NOT NULL, 
+	created_at DATETIME DEFAULT CURRENT_TIMESTAMP, 
+	updated_at DATETIME, 
+	PRIMARY KEY (id), 
+	UNIQUE (name)
+);
+CREATE INDEX ix_event_types_id ON event_types (id);
+CREATE TABLE dj_personas (
+	id VARCHAR NOT NULL, 
+	name VARCHAR NOT NULL, 
+	description TEXT, 
+	voice_settings JSON, 
+	tone VARCHAR, 
+	accent VARCHAR, 
+	gender VARCHAR, 
+	autotune_level FLOAT NOT NULL, 
+	created_at DATETIME DEFAULT CURRENT_TIMESTAMP, 
+	updated_at DATETIME, 
+	PRIMARY KEY (id), 
+	UNIQUE (name)
+);
+CREATE INDEX ix_dj_personas_id ON dj_personas (id);
+CREATE TABLE playlists (
+	id VARCHAR NOT NULL, 
+	name VARCHAR NOT NULL, 
+	description TEXT, 
+	cover_art VARCHAR, 
+	is_public BOOLEAN NOT NULL, 
+	user_id VARCHAR, 
+	created_at DATETIME DEFAULT CURRENT_TIMESTAMP, 
+	updated_at DATETIME, 
+	PRIMARY KEY (id)
+);
+CREATE INDEX ix_playlists_id ON playlists (id);
+CREATE TABLE sets (
+	id VARCHAR NOT NULL, 
+	name VARCHAR NOT NULL, 
+	description TEXT, 
+	event_type_id VARCHAR, 
+	duration INTEGER NOT NULL, 
+	created_at DATETIME DEFAULT CURRENT_TIMESTAMP, 
+	updated_at DATETIME, 
+	PRIMARY KEY (id), 
+	FOREIGN KEY(event_type_id) REFERENCES event_types (id)
+);
+CREATE INDEX ix_sets_id ON sets (id);
+CREATE TABLE track_analyses (
+	id VARCHAR NOT NULL, 
+	track_id VARCHAR NOT NULL, 
+	analysis_type VARCHAR NOT NULL, 
+	result JSON NOT NULL, 
+	confidence FLOAT, 
+	created_at DATETIME DEFAULT CURRENT_TIMESTAMP, 
+	PRIMARY KEY (id), 
+	FOREIGN KEY(track_id) REFERENCES tracks (id) ON DELETE CASCADE
+);
+CREATE INDEX ix_track_analyses_id ON track_analyses (id);
+CREATE TABLE ai_voice_assets (
+	id VARCHAR NOT NULL, 
+	persona_id VARCHAR, 
+	text TEXT NOT NULL, 
+	audio_url VARCHAR NOT NULL, 
+	voice_type VARCHAR NOT NULL, 
+	bpm FLOAT, 
+	"key" VARCHAR, 
+	autotune BOOLEAN NOT NULL, 
+	created_at DATETIME DEFAULT CURRENT_TIMESTAMP, 
+	PRIMARY KEY (id), 
+	FOREIGN KEY(persona_id) REFERENCES dj_personas (id)
+);
+CREATE INDEX ix_ai_voice_assets_id ON ai_voice_assets (id);
+CREATE TABLE playlist_tracks (
+	id VARCHAR NOT NULL, 
+	playlist_id VARCHAR NOT NULL, 
+	track_id VARCHAR NOT NULL, 
+	position INTEGER NOT NULL, 
+	added_at DATETIME DEFAULT CURRENT_TIMESTAMP, 
+	notes TEXT, 
+	spotify_uri VARCHAR, 
+	PRIMARY KEY (id), 
+	CONSTRAINT uq_playlist_position UNIQUE (playlist_id, position), 
+	FOREIGN KEY(playlist_id) REFERENCES playlists (id) ON DELETE CASCADE, 
+	FOREIGN KEY(track_id) REFERENCES tracks (id)
+);
+CREATE INDEX ix_playlist_tracks_id ON playlist_tracks (id);
+CREATE TABLE set_tracks (
+	id VARCHAR NOT NULL, 
+	set_id VARCHAR NOT NULL, 
+	track_id VARCHAR NOT NULL, 
+	position INTEGER NOT NULL, 
+	transition_bpm FLOAT, 
+	transition_key VARCHAR, 
+	notes TEXT, 
+	created_at DATETIME DEFAULT CURRENT_TIMESTAMP, 
+	PRIMARY KEY (id), 
+	FOREIGN KEY(set_id) REFERENCES sets (id) ON DELETE CASCADE, 
+	FOREIGN KEY(track_id) REFERENCES tracks (id)
+);
+CREATE INDEX ix_set_tracks_id ON set_tracks (id);
+CREATE TABLE performances (
+	id VARCHAR NOT NULL, 
+	set_id VARCHAR NOT NULL, 
+	start_time DATETIME NOT NULL, 
+	end_time DATETIME, 
+	energy_levels JSON, 
+	crowd_vibe VARCHAR, 
+	notes TEXT, 
+	created_at DATETIME DEFAULT CURRENT_TIMESTAMP, 
+	PRIMARY KEY (id), 
+	FOREIGN KEY(set_id) REFERENCES sets (id)
+);
+CREATE INDEX ix_performances_id ON performances (id);
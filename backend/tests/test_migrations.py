@@ -0,0 +1,46 @@
+"""Databases built by create_all before migrations existed must upgrade to head"""
+
+import os
+import sqlite3
+import subprocess
+import sys
+
+from alembic.script import ScriptDirectory
+
+from app.database import BACKEND_DIR, alembic_config
+
+BASELINE_SCHEMA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "baseline_schema.sql")
+
+
+def run_migrations(path: str) -> subprocess.CompletedProcess:
+    """app.database.run_migrations in a fresh process, so its engine points at `path`"""
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{path}")
+    env.pop("ASYNC_DATABASE_URL", None)
+    return subprocess.run(
+        [sys.executable, "-c", "from app.database import run_migrations; run_migrations()"],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True
+    )
+
+
+def test_baseline_schema_upgrades_to_head(tmp_path):
+    path = str(tmp_path / "baseline.db")
+    with sqlite3.connect(path) as connection:
+        with open(BASELINE_SCHEMA) as schema:
+            connection.executescript(schema.read())
+        connection.execute(
+            "INSERT INTO tracks (id, title, artist, duration, bpm, \"key\", energy, genre) "
+            "VALUES ('t1', 'Title', 'Artist', 240, 124, '8A', 0.7, 'house')"
+        )
+
+    result = run_migrations(path)
+    assert result.returncode == 0, result.stderr
+
+    head = ScriptDirectory.from_config(alembic_config()).get_current_head()
+    with sqlite3.connect(path) as connection:
+        assert connection.execute("SELECT version_num FROM alembic_version").fetchone() == (head,)
+        indexes = {row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        assert "ix_tracks_key_code_bpm" in indexes and "ix_tracks_key_code" not in indexes
+        assert connection.execute("SELECT title FROM tracks WHERE id = 't1'").fetchone() == ("Title",)
+
+    # Adopted once: running again is a no-op
+    assert run_migrations(path).returncode == 0
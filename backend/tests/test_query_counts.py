@@ -0,0 +1,80 @@
+"""Each set/playlist/flow endpoint must run the same number of SQL statements
+whether the library (and the set or playlist) holds a few tracks or many.
+
+Counts come from the QueryMetrics tally the middleware keeps per request.
+"""
+
+import pytest
+
+from app.services.query_metrics import QueryMetrics
+from app.services.set_curves import SetCurves
+
+SIZES = (3, 30)
+
+ENDPOINTS = (
+    "POST /playlists/{id}/tracks",
+    "GET /playlists",
+    "GET /playlists/{id}",
+    "GET /playlists/{id}/tracks",
+    "DELETE /playlists/{id}/tracks",
+    "POST /sets",
+    "GET /sets/{id}",
+    "GET /flow/energy-curve/{id}",
+    "POST /flow/optimize-set/{id}",
+    "GET /tracks/{id}/compatible",
+)
+
+
+def queries(call) -> int:
+    """Statements run while serving one request"""
+    QueryMetrics.reset()
+    response = call()
+    assert response.status_code < 400, response.text
+    (stats,) = QueryMetrics.worst_endpoints()
+    return stats["max_queries"]
+
+
+def endpoint_counts(client, size: int):
+    track_ids = [
+        client.post("/api/tracks/", json={
+            "title": f"Track {i}", "artist": "Artist", "duration": 240,
+            "bpm": 120 + i % 8, "key": f"{i % 12 + 1}A", "energy": (i % 10) / 10, "genre": "house"
+        }).json()["id"]
+        for i in range(size)
+    ]
+    playlist_id = client.post("/api/playlists", json={"name": f"Playlist {size}"}).json()["id"]
+
+    counts = {}
+    counts["POST /playlists/{id}/tracks"] = queries(
+        lambda: client.post(f"/api/playlists/{playlist_id}/tracks", json={"track_ids": track_ids})
+    )
+    counts["GET /playlists"] = queries(lambda: client.get("/api/playlists"))
+    counts["GET /playlists/{id}"] = queries(lambda: client.get(f"/api/playlists/{playlist_id}"))
+    counts["GET /playlists/{id}/tracks"] = queries(lambda: client.get(f"/api/playlists/{playlist_id}/tracks"))
+    counts["DELETE /playlists/{id}/tracks"] = queries(
+        lambda: client.request("DELETE", f"/api/playlists/{playlist_id}/tracks", json={"track_ids": track_ids[:2]})
+    )
+
+    set_id = client.post("/api/sets/", json={"name": f"Set {size}", "duration": 60, "track_ids": track_ids}).json()["id"]
+    counts["POST /sets"] = queries(
+        lambda: client.post("/api/sets/", json={"name": "Copy", "duration": 60, "track_ids": track_ids})
+    )
+    counts["GET /sets/{id}"] = queries(lambda: client.get(f"/api/sets/{set_id}"))
+
+    SetCurves.invalidate(set_id)
+    counts["GET /flow/energy-curve/{id}"] = queries(lambda: client.get(f"/api/flow/energy-curve/{set_id}"))
+    counts["POST /flow/optimize-set/{id}"] = queries(lambda: client.post(f"/api/flow/optimize-set/{set_id}"))
+    counts["GET /tracks/{id}/compatible"] = queries(lambda: client.get(f"/api/tracks/{track_ids[0]}/compatible"))
+    return counts
+
+
+@pytest.fixture(scope="module")
+def runs(client):
+    # Tracks accumulate, so the second run also sees a larger library
+    return [endpoint_counts(client, size) for size in SIZES]
+
+
+@pytest.mark.parametrize("endpoint", ENDPOINTS)
+def test_query_count_does_not_grow(runs, endpoint):
+    small, large = (run[endpoint] for run in runs)
+    assert small == large, f"{endpoint}: {small} queries with {SIZES[0]} tracks, {large} with {SIZES[1]}"